@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+"""Discovers every client account under a set of manager accounts.
+
+The hierarchy is crawled one level at a time with customer_client queries, and
+the managers found at each level are expanded concurrently. The resulting tree
+is cached on disk as JSON with a time-to-live, so that reporting runs and other
+tools can look up children, leaf accounts and test accounts without querying
+the API again.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+
+
+_DEFAULT_CACHE_PATH = "./account_hierarchy.json"
+_DEFAULT_TTL_SECONDS = 24 * 60 * 60
+_DEFAULT_MAX_WORKERS = 8
+
+# Selects the manager itself (level 0) and its direct clients (level 1).
+_CHILDREN_QUERY = """
+    SELECT
+      customer_client.id,
+      customer_client.descriptive_name,
+      customer_client.level,
+      customer_client.manager,
+      customer_client.test_account,
+      customer_client.currency_code,
+      customer_client.time_zone
+    FROM customer_client
+    WHERE customer_client.level <= 1"""
+
+
+class AccountHierarchy:
+    """An immutable account tree with fast lookups."""
+
+    def __init__(self, root_ids, accounts, children, created_at=None):
+        """Initializes the hierarchy.
+
+        Args:
+            root_ids: The IDs of the manager accounts the crawl started from.
+            accounts: A dict mapping customer IDs to dicts with the keys
+                "descriptive_name", "manager", "test_account",
+                "currency_code" and "time_zone".
+            children: A dict mapping manager IDs to lists of child IDs.
+            created_at: The Unix time at which the hierarchy was crawled.
+        """
+        self.root_ids = list(root_ids)
+        self.accounts = accounts
+        self.created_at = created_at or time.time()
+        self._children = {
+            manager_id: tuple(child_ids)
+            for manager_id, child_ids in children.items()
+        }
+        self._parents = {}
+        for manager_id, child_ids in self._children.items():
+            for child_id in child_ids:
+                self._parents.setdefault(child_id, []).append(manager_id)
+
+    def children(self, customer_id):
+        """Returns the IDs of the direct clients of a manager account."""
+        return self._children.get(str(customer_id), ())
+
+    def parents(self, customer_id):
+        """Returns the IDs of the managers directly above an account."""
+        return tuple(self._parents.get(str(customer_id), ()))
+
+    def descendants(self, customer_id):
+        """Returns the IDs of every account below an account."""
+        found = []
+        seen = set()
+        stack = list(self.children(customer_id))
+        while stack:
+            child_id = stack.pop()
+            if child_id in seen:
+                continue
+            seen.add(child_id)
+            found.append(child_id)
+            stack.extend(self.children(child_id))
+        return found
+
+    def leaves(self, customer_id=None):
+        """Returns the IDs of client (non-manager) accounts.
+
+        Args:
+            customer_id: If set, only accounts below this account are
+                returned.
+        """
+        candidates = (
+            self.accounts if customer_id is None
+            else self.descendants(customer_id)
+        )
+        return [
+            account_id
+            for account_id in candidates
+            if not self.accounts[account_id]["manager"]
+        ]
+
+    def test_accounts(self):
+        """Returns the IDs of test accounts."""
+        return [
+            account_id
+            for account_id, account in self.accounts.items()
+            if account["test_account"]
+        ]
+
+    def non_test_accounts(self):
+        """Returns the IDs of accounts that are not test accounts."""
+        return [
+            account_id
+            for account_id, account in self.accounts.items()
+            if not account["test_account"]
+        ]
+
+    def is_expired(self, ttl_seconds):
+        """Returns whether the hierarchy is older than ttl_seconds."""
+        return time.time() - self.created_at > ttl_seconds
+
+    def to_dict(self):
+        """Returns a JSON-serializable representation."""
+        return {
+            "created_at": self.created_at,
+            "root_ids": self.root_ids,
+            "accounts": self.accounts,
+            "children": {
+                manager_id: list(child_ids)
+                for manager_id, child_ids in self._children.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates a hierarchy from the output of to_dict."""
+        return cls(
+            data["root_ids"],
+            data["accounts"],
+            data["children"],
+            data["created_at"],
+        )
+
+
+def _query_children(client, manager_id):
+    """Returns the account details of a manager and its direct clients."""
+    googleads_service = client.get_service("GoogleAdsService")
+    stream = googleads_service.search_stream(
+        customer_id=manager_id, query=_CHILDREN_QUERY
+    )
+    rows = []
+    for batch in stream:
+        for row in batch.results:
+            customer_client = row.customer_client
+            rows.append(
+                (
+                    customer_client.level,
+                    str(customer_client.id),
+                    {
+                        "descriptive_name": customer_client.descriptive_name,
+                        "manager": customer_client.manager,
+                        "test_account": customer_client.test_account,
+                        "currency_code": customer_client.currency_code,
+                        "time_zone": customer_client.time_zone,
+                    },
+                )
+            )
+    return rows
+
+
+def crawl_account_hierarchy(
+    client, manager_ids, max_workers=_DEFAULT_MAX_WORKERS
+):
+    """Crawls the account hierarchy below the given manager accounts.
+
+    Every level is expanded with one customer_client query per manager, and
+    the queries of a level run concurrently.
+
+    Args:
+        client: The Google Ads client. Its login customer ID must have access
+            to the manager accounts.
+        manager_ids: The IDs of the manager accounts to start from.
+        max_workers: The maximum number of concurrent queries.
+
+    Returns:
+        An AccountHierarchy.
+    """
+    manager_ids = [str(manager_id) for manager_id in manager_ids]
+    accounts = {}
+    children = {}
+    frontier = list(manager_ids)
+    expanded = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while frontier:
+            expanded.update(frontier)
+            results = executor.map(
+                lambda manager_id: _query_children(client, manager_id),
+                frontier,
+            )
+            next_frontier = []
+            for manager_id, rows in zip(frontier, results):
+                child_ids = []
+                for level, customer_id, account in rows:
+                    accounts.setdefault(customer_id, account)
+                    if level == 0:
+                        continue
+                    child_ids.append(customer_id)
+                    if account["manager"] and customer_id not in expanded:
+                        next_frontier.append(customer_id)
+                        expanded.add(customer_id)
+                children[manager_id] = child_ids
+            frontier = next_frontier
+    return AccountHierarchy(manager_ids, accounts, children)
+
+
+def load_account_hierarchy(
+    client,
+    manager_ids,
+    cache_path=_DEFAULT_CACHE_PATH,
+    ttl_seconds=_DEFAULT_TTL_SECONDS,
+    max_workers=_DEFAULT_MAX_WORKERS,
+    refresh=False,
+):
+    """Returns the cached hierarchy, crawling it again when it is stale.
+
+    Args:
+        client: The Google Ads client.
+        manager_ids: The IDs of the manager accounts to start from.
+        cache_path: The path of the JSON cache file.
+        ttl_seconds: The maximum age of the cached hierarchy.
+        max_workers: The maximum number of concurrent queries.
+        refresh: If true, ignores the cache.
+
+    Returns:
+        An AccountHierarchy.
+    """
+    manager_ids = sorted(str(manager_id) for manager_id in manager_ids)
+    if not refresh and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            hierarchy = AccountHierarchy.from_dict(json.load(f))
+        if (
+            sorted(hierarchy.root_ids) == manager_ids
+            and not hierarchy.is_expired(ttl_seconds)
+        ):
+            return hierarchy
+
+    hierarchy = crawl_account_hierarchy(client, manager_ids, max_workers)
+    # Writes to a temporary file first so readers never see a partial cache.
+    temp_path = f"{cache_path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(hierarchy.to_dict(), f)
+    os.replace(temp_path, cache_path)
+    return hierarchy
+
+
+def print_hierarchy(hierarchy, customer_id, depth=0):
+    """Prints an account and the accounts below it as an indented tree."""
+    account = hierarchy.accounts.get(customer_id, {})
+    test_label = " (test)" if account.get("test_account") else ""
+    print(
+        f"{'-' * (depth * 2)}{customer_id}, "
+        f"{account.get('descriptive_name', '')}{test_label}"
+    )
+    for child_id in hierarchy.children(customer_id):
+        print_hierarchy(hierarchy, child_id, depth + 1)
+
+
+def main(client, manager_ids, cache_path, ttl_seconds, refresh):
+    hierarchy = load_account_hierarchy(
+        client, manager_ids, cache_path, ttl_seconds, refresh=refresh
+    )
+    for manager_id in hierarchy.root_ids:
+        print_hierarchy(hierarchy, manager_id)
+    print(
+        f"Found {len(hierarchy.accounts)} accounts, "
+        f"{len(hierarchy.leaves())} of which are client accounts and "
+        f"{len(hierarchy.test_accounts())} of which are test accounts."
+    )
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description="Lists every account under the given manager accounts."
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-m",
+        "--manager_customer_ids",
+        type=str,
+        nargs="+",
+        required=True,
+        help="The Google Ads customer IDs of the manager accounts.",
+    )
+    parser.add_argument(
+        "--cache_path",
+        type=str,
+        default=_DEFAULT_CACHE_PATH,
+        help="The path of the JSON file the hierarchy is cached in.",
+    )
+    parser.add_argument(
+        "--ttl_seconds",
+        type=int,
+        default=_DEFAULT_TTL_SECONDS,
+        help="The maximum age of the cached hierarchy in seconds.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="If set, crawls the hierarchy even if the cache is fresh.",
+    )
+    args = parser.parse_args()
+
+    try:
+        main(
+            googleads_client,
+            args.manager_customer_ids,
+            args.cache_path,
+            args.ttl_seconds,
+            args.refresh,
+        )
+    except GoogleAdsException as ex:
+        print(
+            f'Request with ID "{ex.request_id}" failed with status '
+            f'"{ex.error.code().name}" and includes the following errors:'
+        )
+        for error in ex.failure.errors:
+            print(f'\tError with message "{error.message}".')
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
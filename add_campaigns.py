@@ -21,28 +21,45 @@ To get campaigns, run get_campaigns.py.
 import argparse
 import datetime
 import sys
+import time
 import uuid
 
 from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
 
+import dry_run
+import profiling
+import rpc_tracing
+
 
 _DATE_FORMAT = "%Y%m%d"
+# Each campaign needs two operations, for its budget and itself.
+_MAX_CAMPAIGNS_PER_DRY_RUN_REQUEST = 2500
+
+
+def main(client, customer_id, dry_run_mode=None, num_campaigns=1):
+    """Adds a campaign, or rehearses adding campaigns.
 
+    Args:
+        client: The Google Ads client.
+        customer_id: The Google Ads customer ID.
+        dry_run_mode: If set, one of dry_run.MODES, and num_campaigns
+            campaigns are rehearsed with rehearse_campaign_creation instead.
+        num_campaigns: The number of campaigns a dry run rehearses.
+    """
+    if dry_run_mode:
+        rehearse_campaign_creation(
+            client, customer_id, dry_run_mode, num_campaigns
+        )
+        return
 
-def main(client, customer_id):
     campaign_budget_service = client.get_service("CampaignBudgetService")
     campaign_service = client.get_service("CampaignService")
 
     # [START add_campaigns]
     # Create a budget, which can be shared by multiple campaigns.
     campaign_budget_operation = client.get_type("CampaignBudgetOperation")
-    campaign_budget = campaign_budget_operation.create
-    campaign_budget.name = f"Interplanetary Budget {uuid.uuid4()}"
-    campaign_budget.delivery_method = (
-        client.enums.BudgetDeliveryMethodEnum.STANDARD
-    )
-    campaign_budget.amount_micros = 1000000
+    set_campaign_budget_fields(client, campaign_budget_operation.create)
 
     # Add budget.
     try:
@@ -56,7 +73,45 @@ def main(client, customer_id):
     # [START add_campaigns_1]
     # Create campaign.
     campaign_operation = client.get_type("CampaignOperation")
-    campaign = campaign_operation.create
+    set_campaign_fields(
+        client,
+        campaign_operation.create,
+        campaign_budget_response.results[0].resource_name,
+    )
+    # [END add_campaigns_1]
+
+    # Add the campaign.
+    try:
+        campaign_response = campaign_service.mutate_campaigns(
+            customer_id=customer_id, operations=[campaign_operation]
+        )
+        print(f"Created campaign {campaign_response.results[0].resource_name}.")
+    except GoogleAdsException as ex:
+        handle_googleads_exception(ex)
+
+
+def set_campaign_budget_fields(client, campaign_budget):
+    """Sets the fields of a new campaign budget.
+
+    Args:
+        client: The Google Ads client.
+        campaign_budget: The CampaignBudget to create.
+    """
+    campaign_budget.name = f"Interplanetary Budget {uuid.uuid4()}"
+    campaign_budget.delivery_method = (
+        client.enums.BudgetDeliveryMethodEnum.STANDARD
+    )
+    campaign_budget.amount_micros = 1000000
+
+
+def set_campaign_fields(client, campaign, campaign_budget_resource_name):
+    """Sets the fields of a new campaign.
+
+    Args:
+        client: The Google Ads client.
+        campaign: The Campaign to create.
+        campaign_budget_resource_name: The resource name of its budget.
+    """
     campaign.name = f"Interplanetary Cruise {uuid.uuid4()}"
     campaign.advertising_channel_type = (
         client.enums.AdvertisingChannelTypeEnum.SEARCH
@@ -69,7 +124,7 @@ def main(client, customer_id):
 
     # Set the bidding strategy and budget.
     campaign.manual_cpc.enhanced_cpc_enabled = True
-    campaign.campaign_budget = campaign_budget_response.results[0].resource_name
+    campaign.campaign_budget = campaign_budget_resource_name
 
     # Set the campaign network options.
     campaign.network_settings.target_google_search = True
@@ -78,7 +133,6 @@ def main(client, customer_id):
     # Enable Display Expansion on Search campaigns. For more details see:
     # https://support.google.com/google-ads/answer/7193800
     campaign.network_settings.target_content_network = True
-    # [END add_campaigns_1]
 
     # Optional: Set the start date.
     start_time = datetime.date.today() + datetime.timedelta(days=1)
@@ -88,14 +142,66 @@ def main(client, customer_id):
     end_time = start_time + datetime.timedelta(weeks=4)
     campaign.end_date = datetime.date.strftime(end_time, _DATE_FORMAT)
 
-    # Add the campaign.
-    try:
-        campaign_response = campaign_service.mutate_campaigns(
-            customer_id=customer_id, operations=[campaign_operation]
+
+def rehearse_campaign_creation(client, customer_id, mode, num_campaigns):
+    """Builds and encodes campaigns without creating them.
+
+    Each campaign and its budget are added in one GoogleAdsService.Mutate
+    request, linked by a temporary budget ID, so that they can be validated
+    together without the budget existing.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The Google Ads customer ID.
+        mode: One of dry_run.MODES. In validate_only mode, every request is
+            sent with validate_only set. In offline mode, nothing is sent.
+        num_campaigns: The number of campaigns to rehearse.
+    """
+    report = dry_run.DryRunReport(mode)
+    googleads_service = client.get_service("GoogleAdsService")
+    campaign_budget_service = client.get_service("CampaignBudgetService")
+
+    for first in range(0, num_campaigns, _MAX_CAMPAIGNS_PER_DRY_RUN_REQUEST):
+        request = client.get_type("MutateGoogleAdsRequest")
+        request.customer_id = customer_id
+        request.validate_only = mode == "validate_only"
+        last = min(first + _MAX_CAMPAIGNS_PER_DRY_RUN_REQUEST, num_campaigns)
+        for index in range(first, last):
+            # Temporary IDs are negative and unique within the request.
+            campaign_budget_resource_name = (
+                campaign_budget_service.campaign_budget_path(
+                    customer_id, -(index + 1)
+                )
+            )
+            budget_operation = client.get_type("MutateOperation")
+            campaign_budget = budget_operation.campaign_budget_operation.create
+            set_campaign_budget_fields(client, campaign_budget)
+            campaign_budget.resource_name = campaign_budget_resource_name
+            campaign_operation = client.get_type("MutateOperation")
+            set_campaign_fields(
+                client,
+                campaign_operation.campaign_operation.create,
+                campaign_budget_resource_name,
+            )
+            request.mutate_operations.extend(
+                [budget_operation, campaign_operation]
+            )
+        report.num_operations += 2 * (last - first)
+
+        if mode == "offline":
+            report.record_request(dry_run.message_size(request))
+            continue
+        start = time.perf_counter()
+        try:
+            googleads_service.mutate(request=request)
+        except GoogleAdsException as ex:
+            handle_googleads_exception(ex)
+        report.record_request(
+            dry_run.message_size(request), time.perf_counter() - start
         )
-        print(f"Created campaign {campaign_response.results[0].resource_name}.")
-    except GoogleAdsException as ex:
-        handle_googleads_exception(ex)
+
+    for line in report.format():
+        print(line)
 
 
 def handle_googleads_exception(exception):
@@ -127,6 +233,24 @@ if __name__ == "__main__":
         required=True,
         help="The Google Ads customer ID.",
     )
+    parser.add_argument(
+        "-n",
+        "--num_campaigns",
+        type=int,
+        default=1,
+        help="The number of campaigns a dry run rehearses.",
+    )
+    dry_run.add_dry_run_argument(parser)
+    profiling.add_profile_argument(parser)
+    rpc_tracing.add_trace_argument(parser)
     args = parser.parse_args()
 
-    main(googleads_client, args.customer_id)
\ No newline at end of file
+    with rpc_tracing.trace_run(
+        googleads_client, args.trace
+    ) as client, profiling.profile_run(args.profile, "add_campaigns"):
+        main(
+            client,
+            args.customer_id,
+            args.dry_run,
+            args.num_campaigns,
+        )
\ No newline at end of file
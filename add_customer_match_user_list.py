@@ -27,7 +27,6 @@ at: https://support.google.com/adspolicy/answer/6299717.
 """
 
 import argparse
-import hashlib
 import sys
 import uuid
 
@@ -36,8 +35,34 @@ from google.ads.googleads.errors import GoogleAdsException
 from google.ads.googleads.v14.enums.types.offline_user_data_job_status import OfflineUserDataJobStatusEnum
 from google.ads.googleads.v14.enums.types.offline_user_data_job_type import OfflineUserDataJobTypeEnum
 
+import audience_file
+import contact_validation
+import dry_run
+import identifier_dedup
+import operation_spool
+import preencoded_requests
+import profiling
+import rpc_tracing
+import sharded_transform
+import transport_profiles
+from identifier_hashing import normalize_and_hash
 
-def main(client, customer_id, run_job, user_list_id, offline_user_data_job_id):
+
+def main(
+        client,
+        customer_id,
+        run_job,
+        user_list_id,
+        offline_user_data_job_id,
+        processes=None,
+        dedup_mode=None,
+        validate=False,
+        prehashed_keys=None,
+        spool_path=None,
+        dry_run_mode=None,
+        audience_path=None,
+        spool_start=None,
+):
     """Uses Customer Match to create and add users to a new user list.
 
     Args:
@@ -49,15 +74,56 @@ def main(client, customer_id, run_job, user_list_id, offline_user_data_job_id):
             created.
         offline_user_data_job_id: ID of an existing OfflineUserDataJob in the
             PENDING state. If None, a new job is created.
+        processes: If set, the number of worker processes used to build the
+            operations. Otherwise, operations are built in this process.
+        dedup_mode: If set, either "exact" or "bloom". Rows whose hashed
+            identifiers were all seen earlier in the upload are dropped.
+        validate: If true, records are validated and repaired before they
+            are hashed, and records without a valid identifier are dropped.
+        prehashed_keys: The keys among "email", "phone", "first_name" and
+            "last_name" whose values are already SHA-256 hashed. These skip
+            normalization and hashing. If None, they are detected from the
+            records.
+        spool_path: If set, the encoded operations are written to a spool
+            file at this path and uploaded from it, so memory use does not
+            grow with the number of operations. The spool is kept for replays.
+        dry_run_mode: If set, one of dry_run.MODES. The upload is rehearsed
+            without creating a user list or job, adding operations or running
+            the job, and a projection of the upload is printed.
+        audience_path: If set, the path of a CSV or TSV file whose rows are
+            uploaded instead of the example records.
+        spool_start: If set, the existing spool at spool_path is uploaded
+            from this request index, without reading or transforming any
+            records. Resuming from a later request needs the
+            offline_user_data_job_id the earlier requests were sent to.
     """
+    if spool_start is not None and not spool_path:
+        raise ValueError("Replaying a spool needs its spool_path.")
+    if spool_start and not offline_user_data_job_id:
+        raise ValueError(
+            "Resuming a spool upload needs the offline user data job the "
+            "earlier requests were sent to."
+        )
+    if dry_run_mode == "validate_only" and not offline_user_data_job_id:
+        raise ValueError(
+            "A validate_only dry run needs an existing offline user data job "
+            "in the PENDING state to validate the operations against."
+        )
     googleads_service = client.get_service("GoogleAdsService")
 
+    # The user list is only needed to create a new job.
+    user_list_resource_name = None
     if not offline_user_data_job_id:
         if user_list_id:
             # Uses the specified Customer Match user list.
             user_list_resource_name = googleads_service.user_list_path(
                 customer_id, user_list_id
             )
+        elif dry_run_mode:
+            # An offline dry run sends nothing, so a placeholder is enough.
+            user_list_resource_name = googleads_service.user_list_path(
+                customer_id, "0"
+            )
         else:
             # Creates a Customer Match user list.
             user_list_resource_name = create_customer_match_user_list(
@@ -70,6 +136,14 @@ def main(client, customer_id, run_job, user_list_id, offline_user_data_job_id):
         user_list_resource_name,
         run_job,
         offline_user_data_job_id,
+        processes,
+        dedup_mode,
+        validate,
+        prehashed_keys,
+        spool_path,
+        dry_run_mode,
+        audience_path,
+        spool_start,
     )
 
 
@@ -128,6 +202,14 @@ def add_users_to_customer_match_user_list(
         user_list_resource_name,
         run_job,
         offline_user_data_job_id,
+        processes=None,
+        dedup_mode=None,
+        validate=False,
+        prehashed_keys=None,
+        spool_path=None,
+        dry_run_mode=None,
+        audience_path=None,
+        spool_start=None,
 ):
     """Uses Customer Match to create and add users to a new user list.
 
@@ -140,7 +222,33 @@ def add_users_to_customer_match_user_list(
             Otherwise, only adds operations to the job.
         offline_user_data_job_id: ID of an existing OfflineUserDataJob in the
             PENDING state. If None, a new job is created.
+        processes: If set, the number of worker processes used to build the
+            operations. Otherwise, operations are built in this process.
+        dedup_mode: If set, either "exact" or "bloom". Rows whose hashed
+            identifiers were all seen earlier in the upload are dropped.
+        validate: If true, records are validated and repaired before they
+            are hashed, and records without a valid identifier are dropped.
+        prehashed_keys: The keys among "email", "phone", "first_name" and
+            "last_name" whose values are already SHA-256 hashed. These skip
+            normalization and hashing. If None, they are detected from the
+            records.
+        spool_path: If set, the encoded operations are written to a spool
+            file at this path and uploaded from it, so memory use does not
+            grow with the number of operations. The spool is kept for replays.
+        dry_run_mode: If set, one of dry_run.MODES. In validate_only mode,
+            offline_user_data_job_id is required and every request is sent
+            with validate_only set. In offline mode, nothing is sent. The job
+            is not run.
+        audience_path: If set, the path of a CSV or TSV file whose rows are
+            uploaded instead of the example records. The file is parsed,
+            validated and hashed range by range in worker processes, and is
+            never loaded as a whole.
+        spool_start: If set, the existing spool at spool_path is uploaded
+            from this request index, without reading or transforming any
+            records.
     """
+    report = dry_run.DryRunReport(dry_run_mode) if dry_run_mode else None
+
     # Creates the OfflineUserDataJobService client.
     offline_user_data_job_service_client = client.get_service(
         "OfflineUserDataJobService"
@@ -151,6 +259,11 @@ def add_users_to_customer_match_user_list(
         offline_user_data_job_resource_name = offline_user_data_job_service_client.offline_user_data_job_path(
             customer_id, offline_user_data_job_id
         )
+    elif dry_run_mode:
+        # An offline dry run sends nothing, so a placeholder is enough.
+        offline_user_data_job_resource_name = offline_user_data_job_service_client.offline_user_data_job_path(
+            customer_id, "0"
+        )
     else:
         # Creates a new offline user data job.
         offline_user_data_job = client.get_type("OfflineUserDataJob")
@@ -172,6 +285,89 @@ def add_users_to_customer_match_user_list(
             f"'{offline_user_data_job_resource_name}'."
         )
 
+    if spool_start is not None:
+        # Replays an existing spool, so the records are neither read nor
+        # transformed again.
+        audience = dedup_stage = None
+        prehashed_keys = frozenset()
+        with profiling.stage("upload"):
+            upload_spooled_operations(
+                client,
+                _create_sender(client, dry_run_mode, report),
+                offline_user_data_job_resource_name,
+                spool_path,
+                spool_start,
+                dry_run_mode == "validate_only",
+            )
+    else:
+        audience, dedup_stage, prehashed_keys = _add_operations(
+            client,
+            offline_user_data_job_service_client,
+            offline_user_data_job_resource_name,
+            processes,
+            dedup_mode,
+            validate,
+            prehashed_keys,
+            spool_path,
+            dry_run_mode,
+            audience_path,
+            report,
+        )
+
+    if audience is not None:
+        print(f"Read {audience.num_rows} rows from '{audience_path}'.")
+        if validate or prehashed_keys:
+            print(contact_validation.format_counts(audience.validation_counts))
+    if dedup_stage:
+        print(dedup_stage.summary())
+    if report:
+        for line in report.format():
+            print(line)
+        return
+    print("The operations are added to the offline user data job.")
+
+    if not run_job:
+        print(
+            "Not running offline user data job "
+            f"'{offline_user_data_job_resource_name}', as requested."
+        )
+        return
+
+    # Issues a request to run the offline user data job for executing all
+    # added operations.
+    with profiling.stage("run_job"):
+        offline_user_data_job_service_client.run_offline_user_data_job(
+            resource_name=offline_user_data_job_resource_name
+        )
+
+    # Retrieves and displays the job status.
+    check_job_status(client, customer_id, offline_user_data_job_resource_name)
+    # [END add_customer_match_user_list]
+
+
+def _add_operations(
+        client,
+        offline_user_data_job_service_client,
+        offline_user_data_job_resource_name,
+        processes,
+        dedup_mode,
+        validate,
+        prehashed_keys,
+        spool_path,
+        dry_run_mode,
+        audience_path,
+        report,
+):
+    """Builds the operations of the records and adds them to the job.
+
+    The arguments are those of add_users_to_customer_match_user_list, and
+    report is its dry_run.DryRunReport or None.
+
+    Returns:
+        A tuple of the audience_file.AudienceFile or None, the
+        identifier_dedup.DeduplicationStage or None, and the frozenset of
+        pre-hashed keys.
+    """
     # Issues a request to add the operations to the offline user data job.
 
     # Best Practice: This example only adds a few operations, so it only sends
@@ -181,17 +377,218 @@ def add_users_to_customer_match_user_list(
     # https://developers.google.com/google-ads/api/docs/remarketing/audience-types/customer-match#customer_match_considerations
     # and https://developers.google.com/google-ads/api/docs/best-practices/quotas#user_data
     # for more information on the per-request limits.
-    request = client.get_type("AddOfflineUserDataJobOperationsRequest")
-    request.resource_name = offline_user_data_job_resource_name
-    for op in build_offline_user_data_job_operations(client):
-        request.operations.add().CopyFrom(op)
-    request.enable_partial_failure = True
+    audience = None
+    with profiling.stage("read"):
+        if audience_path:
+            # The workers read the rows, so only a sample is loaded here.
+            audience = audience_file.AudienceFile(audience_path)
+            raw_records = audience.sample_records()
+        else:
+            raw_records = get_raw_records()
+    if prehashed_keys is None:
+        prehashed_keys = contact_validation.detect_prehashed_keys(raw_records)
+    prehashed_keys = frozenset(prehashed_keys)
+    if prehashed_keys:
+        print(
+            "Passing through the pre-hashed keys: "
+            f"{', '.join(sorted(prehashed_keys))}."
+        )
+    # The rows of an audience file are validated by the workers instead.
+    if audience is None:
+        with profiling.stage("validate"):
+            if validate:
+                raw_records, validation_counts = (
+                    contact_validation.validate_records(
+                        raw_records, prehashed_keys
+                    )
+                )
+                print(contact_validation.format_counts(validation_counts))
+            elif prehashed_keys:
+                # Pre-hashed values are always checked, since they are uploaded
+                # as is.
+                raw_records, validation_counts = (
+                    contact_validation.validate_prehashed_columns(
+                        raw_records, prehashed_keys
+                    )
+                )
+                print(contact_validation.format_counts(validation_counts))
+
+    dedup_stage = None
+    if dedup_mode:
+        expected_items = (
+            audience.estimate_num_rows() if audience else len(raw_records)
+        )
+        dedup_stage = identifier_dedup.DeduplicationStage(
+            identifier_dedup.create_deduplicator(
+                dedup_mode, expected_items=expected_items
+            )
+        )
+
+    if processes or spool_path or dry_run_mode or audience:
+        # Workers normalize, hash and serialize the operations, and the
+        # requests are assembled by concatenating the serialized bytes, so
+        # each operation is encoded exactly once. Dry runs take this path so
+        # that the size of every request is known.
+        if audience is not None:
+            serialized_operations = audience.transform_sharded(
+                processes,
+                with_keys=dedup_stage is not None,
+                prehashed_keys=prehashed_keys,
+                validate=validate,
+            )
+        elif processes:
+            serialized_operations = (
+                sharded_transform.transform_records_sharded(
+                    raw_records,
+                    processes,
+                    with_keys=dedup_stage is not None,
+                    prehashed_keys=prehashed_keys,
+                )
+            )
+        else:
+            serialized_operations = (
+                sharded_transform.serialize_contact_info_records(
+                    raw_records,
+                    with_keys=dedup_stage is not None,
+                    prehashed_keys=prehashed_keys,
+                )
+            )
+        if dedup_stage:
+            serialized_operations = dedup_stage.filter_keyed(
+                serialized_operations
+            )
+        validate_only = dry_run_mode == "validate_only"
+        sender = _create_sender(client, dry_run_mode, report)
+        if report:
+            serialized_operations = report.count_operations(
+                serialized_operations
+            )
+        if spool_path:
+            # The operations are built lazily, so the transform runs while
+            # they are spooled.
+            with profiling.stage("transform"):
+                with operation_spool.OperationSpoolWriter(
+                    spool_path
+                ) as writer:
+                    writer.extend(serialized_operations)
+            print(
+                f"Spooled {writer.num_operations} operations to "
+                f"'{spool_path}'."
+            )
+            with profiling.stage("upload"):
+                upload_spooled_operations(
+                    client,
+                    sender,
+                    offline_user_data_job_resource_name,
+                    spool_path,
+                    validate_only=validate_only,
+                )
+        else:
+            with profiling.stage("transform_and_upload"):
+                for payload in preencoded_requests.iter_encoded_requests(
+                    offline_user_data_job_resource_name,
+                    serialized_operations,
+                    validate_only=validate_only,
+                ):
+                    response = sender.send(
+                        offline_user_data_job_resource_name, payload
+                    )
+                    print_partial_failure(client, response)
+    else:
+        with profiling.stage("transform"):
+            request = client.get_type("AddOfflineUserDataJobOperationsRequest")
+            request.resource_name = offline_user_data_job_resource_name
+            operations = build_offline_user_data_job_operations(
+                client, raw_records, prehashed_keys
+            )
+            if dedup_stage:
+                operations = dedup_stage.filter_operations(operations)
+            for op in operations:
+                request.operations.add().CopyFrom(op)
+            request.enable_partial_failure = True
+
+        # Issues a request to add the operations to the offline user data job.
+        with profiling.stage("upload"):
+            response = offline_user_data_job_service_client.add_offline_user_data_job_operations(
+                request=request
+            )
+        print_partial_failure(client, response)
+
+    return audience, dedup_stage, prehashed_keys
 
-    # Issues a request to add the operations to the offline user data job.
-    response = offline_user_data_job_service_client.add_offline_user_data_job_operations(
-        request=request
-    )
 
+def _create_sender(client, dry_run_mode, report):
+    """Returns the sender of encoded requests for a dry run mode or None."""
+    if dry_run_mode == "offline":
+        return dry_run.DryRunSender(report)
+    sender = preencoded_requests.EncodedRequestSender(client)
+    if dry_run_mode == "validate_only":
+        return dry_run.DryRunSender(report, sender)
+    return sender
+
+
+def upload_spooled_operations(
+        client,
+        sender,
+        offline_user_data_job_resource_name,
+        spool_path,
+        start=0,
+        validate_only=False,
+):
+    """Uploads the requests of a completed spool to an offline user data job.
+
+    If a request fails, the index to resume the upload from is printed.
+
+    Args:
+        client: The Google Ads client.
+        sender: A preencoded_requests.EncodedRequestSender.
+        offline_user_data_job_resource_name: The resource name of the job.
+        spool_path: The path of a spool written by
+            operation_spool.OperationSpoolWriter.
+        start: The index of the first request to send.
+        validate_only: The value of validate_only on each request.
+
+    Raises:
+        ValueError: If start is past the last request of the spool.
+    """
+    with operation_spool.OperationSpool(spool_path) as spool:
+        if not 0 <= start <= len(spool):
+            raise ValueError(
+                f"The spool '{spool_path}' has {len(spool)} requests, so an "
+                f"upload cannot start at request {start}."
+            )
+        next_index = start
+        try:
+            for index, response in operation_spool.upload_spool(
+                sender,
+                offline_user_data_job_resource_name,
+                spool,
+                start,
+                validate_only=validate_only,
+            ):
+                print_partial_failure(client, response)
+                next_index = index + 1
+        except Exception:
+            print(
+                f"The upload stopped at request {next_index} of {len(spool)}. "
+                "To resume it, pass the same spool path, the ID of job "
+                f"'{offline_user_data_job_resource_name}' and --spool_start "
+                f"{next_index}."
+            )
+            raise
+        print(
+            f"Uploaded {len(spool) - start} requests from the spool "
+            f"'{spool_path}'."
+        )
+
+
+def print_partial_failure(client, response):
+    """Prints the partial failure errors in a response, if any.
+
+    Args:
+        client: The Google Ads client.
+        response: An AddOfflineUserDataJobOperationsResponse.
+    """
     # Prints the status message if any partial failure error is returned.
     # Note: the details of each partial failure error are not printed here.
     # Refer to the error_handling/handle_partial_failure.py example to learn
@@ -204,10 +601,16 @@ def add_users_to_customer_match_user_list(
             failure_message = client.get_type("GoogleAdsFailure")
             # Retrieve the class definition of the GoogleAdsFailure instance
             # in order to use the "deserialize" class method to parse the
-            # error_detail string into a protobuf message object.
-            failure_object = type(failure_message).deserialize(
-                error_detail.value
-            )
+            # error_detail string into a protobuf message object. Without
+            # proto-plus, get_type returns the protobuf message itself.
+            if client.use_proto_plus:
+                failure_object = type(failure_message).deserialize(
+                    error_detail.value
+                )
+            else:
+                failure_object = type(failure_message).FromString(
+                    error_detail.value
+                )
 
             for error in failure_object.errors:
                 print(
@@ -217,28 +620,8 @@ def add_users_to_customer_match_user_list(
                     f"Error code: {error.error_code}"
                 )
 
-    print("The operations are added to the offline user data job.")
-
-    if not run_job:
-        print(
-            "Not running offline user data job "
-            f"'{offline_user_data_job_resource_name}', as requested."
-        )
-        return
 
-    # Issues a request to run the offline user data job for executing all
-    # added operations.
-    offline_user_data_job_service_client.run_offline_user_data_job(
-        resource_name=offline_user_data_job_resource_name
-    )
-
-    # Retrieves and displays the job status.
-    check_job_status(client, customer_id, offline_user_data_job_resource_name)
-    # [END add_customer_match_user_list]
-
-
-# [START add_customer_match_user_list_2]
-def build_offline_user_data_job_operations(client):
+def get_raw_records():
     """Creates a raw input list of unhashed user information.
 
     Each element of the list represents a single user and is a dict containing a
@@ -246,11 +629,8 @@ def build_offline_user_data_job_operations(client):
     "country_code", and "postal_code". In your application, this data might come
     from a file or a database.
 
-    Args:
-        client: The Google Ads client.
-
     Returns:
-        A list containing the operations.
+        A list containing the raw records.
     """
     # The first user data has an email address and a phone number.
     raw_record_1 = {
@@ -280,7 +660,27 @@ def build_offline_user_data_job_operations(client):
     raw_record_3 = {"email": "charlie@example.com"}
 
     # Adds the raw records to a raw input list.
-    raw_records = [raw_record_1, raw_record_2, raw_record_3]
+    return [raw_record_1, raw_record_2, raw_record_3]
+
+
+# [START add_customer_match_user_list_2]
+def build_offline_user_data_job_operations(
+        client, raw_records=None, prehashed_keys=frozenset()
+):
+    """Creates operations to add the users in the raw input list.
+
+    Args:
+        client: The Google Ads client.
+        raw_records: A list of raw record dicts. Defaults to the records
+            returned by get_raw_records.
+        prehashed_keys: The keys whose values are already SHA-256 hashed as
+            lowercase hex strings. These are set on the operations as is.
+
+    Returns:
+        A list containing the operations.
+    """
+    if raw_records is None:
+        raw_records = get_raw_records()
 
     operations = []
     # Iterates over the raw input list and creates a UserData object for each
@@ -316,8 +716,9 @@ def build_offline_user_data_job_operations(client):
         # UserIdentifier for it.
         if "email" in record:
             user_identifier = client.get_type("UserIdentifier")
-            user_identifier.hashed_email = normalize_and_hash(
-                record["email"], True
+            user_identifier.hashed_email = (
+                record["email"] if "email" in prehashed_keys
+                else normalize_and_hash(record["email"], True)
             )
             # Adds the hashed email identifier to the UserData object's list.
             user_data.user_identifiers.append(user_identifier)
@@ -326,8 +727,9 @@ def build_offline_user_data_job_operations(client):
         # UserIdentifier for it.
         if "phone" in record:
             user_identifier = client.get_type("UserIdentifier")
-            user_identifier.hashed_phone_number = normalize_and_hash(
-                record["phone"], True
+            user_identifier.hashed_phone_number = (
+                record["phone"] if "phone" in prehashed_keys
+                else normalize_and_hash(record["phone"], True)
             )
             # Adds the hashed phone number identifier to the UserData object's
             # list.
@@ -351,11 +753,13 @@ def build_offline_user_data_job_operations(client):
             else:
                 user_identifier = client.get_type("UserIdentifier")
                 address_info = user_identifier.address_info
-                address_info.hashed_first_name = normalize_and_hash(
-                    record["first_name"], False
+                address_info.hashed_first_name = (
+                    record["first_name"] if "first_name" in prehashed_keys
+                    else normalize_and_hash(record["first_name"], False)
                 )
-                address_info.hashed_last_name = normalize_and_hash(
-                    record["first_last"], False
+                address_info.hashed_last_name = (
+                    record["last_name"] if "last_name" in prehashed_keys
+                    else normalize_and_hash(record["last_name"], False)
                 )
                 address_info.country_code = record["country_code"]
                 address_info.postal_code = record["postal_code"]
@@ -474,31 +878,6 @@ def print_customer_match_user_list_info(
     )
 
 
-def normalize_and_hash(s, remove_all_whitespace):
-    """Normalizes and hashes a string with SHA-256.
-
-    Args:
-        s: The string to perform this operation on.
-        remove_all_whitespace: If true, removes leading, trailing, and
-            intermediate spaces from the string before hashing. If false, only
-            removes leading and trailing spaces from the string before hashing.
-
-    Returns:
-        A normalized (lowercase, remove whitespace) and SHA-256 hashed string.
-    """
-    # Normalizes by first converting all characters to lowercase, then trimming
-    # spaces.
-    if remove_all_whitespace:
-        # Removes leading, trailing, and intermediate whitespace.
-        s = "".join(s.split())
-    else:
-        # Removes only leading and trailing spaces.
-        s = s.strip().lower()
-
-    # Hashes the normalized string using the hashing algorithm.
-    return hashlib.sha256(s.encode()).hexdigest()
-
-
 if __name__ == "__main__":
     # GoogleAdsClient will read the google-ads.yaml configuration file in the
     # home directory if none is specified.
@@ -545,17 +924,123 @@ if __name__ == "__main__":
             "not specified, this example will create a new job."
         ),
     )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        required=False,
+        help=(
+            "The number of worker processes used to normalize, hash and "
+            "serialize the operations. If not specified, the operations are "
+            "built in a single process."
+        ),
+    )
+    parser.add_argument(
+        "-d",
+        "--dedup_mode",
+        choices=("exact", "bloom"),
+        required=False,
+        help=(
+            "Drops rows whose hashed identifiers were all seen earlier in the "
+            "upload. 'exact' remembers every identifier, 'bloom' uses a "
+            "fixed-size Bloom filter for very large lists."
+        ),
+    )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "-v",
+        "--validate",
+        action="store_true",
+        help=(
+            "If set, validates and repairs emails, phone numbers, country "
+            "codes and postal codes before hashing, and drops records "
+            "without a valid identifier."
+        ),
+    )
+    parser.add_argument(
+        "--prehashed_keys",
+        nargs="*",
+        choices=contact_validation.HASHED_KEYS,
+        required=False,
+        help=(
+            "The keys whose values are already SHA-256 hashed, as lowercase "
+            "hex strings. These are uploaded without hashing them again. If "
+            "not specified, they are detected from the records."
+        ),
+    )
+    parser.add_argument(
+        "-s",
+        "--spool_path",
+        type=str,
+        required=False,
+        help=(
+            "The path of a file the encoded operations are spooled to before "
+            "they are uploaded, for jobs too large to hold in memory."
+        ),
+    )
+    parser.add_argument(
+        "--spool_start",
+        type=int,
+        required=False,
+        help=(
+            "If set, uploads the existing spool at --spool_path from this "
+            "request index instead of building the operations again. Use 0 "
+            "to replay the whole spool, or the index printed by a failed "
+            "upload together with its --offline_user_data_job_id to resume "
+            "it."
+        ),
+    )
+    parser.add_argument(
+        "-a",
+        "--audience_path",
+        type=str,
+        required=False,
+        help=(
+            "The path of a CSV or TSV file whose rows are uploaded instead of "
+            "the example users. Its first line names the columns."
+        ),
+    )
 
-    try:
-        main(
+    parser.add_argument(
+        "--transport_profile",
+        choices=sorted(transport_profiles.PROFILES),
+        required=False,
+        help=(
+            "The transport profile of the gRPC channels, for example "
+            "bulk_upload to spread large uploads across several channels."
+        ),
+    )
+    dry_run.add_dry_run_argument(parser)
+    profiling.add_profile_argument(parser)
+    rpc_tracing.add_trace_argument(parser)
+    args = parser.parse_args()
+    if args.transport_profile:
+        googleads_client = transport_profiles.ProfiledClient(
             googleads_client,
-            args.customer_id,
-            args.run_job,
-            args.user_list_id,
-            args.offline_user_data_job_id,
+            transport_profiles.PROFILES[args.transport_profile],
         )
+
+    try:
+        with rpc_tracing.trace_run(
+            googleads_client, args.trace
+        ) as client, profiling.profile_run(
+            args.profile, "add_customer_match_user_list"
+        ):
+            main(
+                client,
+                args.customer_id,
+                args.run_job,
+                args.user_list_id,
+                args.offline_user_data_job_id,
+                args.processes,
+                args.dedup_mode,
+                args.validate,
+                args.prehashed_keys,
+                args.spool_path,
+                args.dry_run,
+                args.audience_path,
+                args.spool_start,
+            )
     except GoogleAdsException as ex:
         print(
             f"Request with ID '{ex.request_id}' failed with status "
@@ -0,0 +1,494 @@
+#!/usr/bin/env python
+"""Asyncio variant of the Customer Match upload flow.
+
+The blocking flow in add_customer_match_user_list.py creates a job, adds the
+operations, runs the job and checks its status one call at a time. This module
+exposes the same steps as coroutines on a grpc.aio channel, so a single event
+loop can drive uploads to many user lists, and other queries, concurrently
+without a thread per call.
+
+Operations are sent pre-encoded (see preencoded_requests.py), so they can come
+straight from the sharded transform without being parsed again.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+import google.auth.transport.grpc
+import google.auth.transport.requests
+import grpc
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v14.enums.types.offline_user_data_job_failure_reason import OfflineUserDataJobFailureReasonEnum
+from google.ads.googleads.v14.enums.types.offline_user_data_job_status import OfflineUserDataJobStatusEnum
+from google.ads.googleads.v14.enums.types.offline_user_data_job_type import OfflineUserDataJobTypeEnum
+from google.ads.googleads.v14.errors.types.errors import GoogleAdsFailure
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsRequest,
+    SearchGoogleAdsResponse,
+)
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    AddOfflineUserDataJobOperationsResponse,
+    CreateOfflineUserDataJobRequest,
+    CreateOfflineUserDataJobResponse,
+    RunOfflineUserDataJobRequest,
+)
+from google.longrunning import operations_pb2
+
+import preencoded_requests
+from add_customer_match_user_list import get_raw_records, print_partial_failure
+from sharded_transform import serialize_contact_info_records
+
+
+_API_VERSION = "v14"
+_DEFAULT_ENDPOINT = "googleads.googleapis.com"
+_FAILURE_KEY = f"google.ads.googleads.{_API_VERSION}.errors.googleadsfailure-bin"
+_MAX_OPERATIONS_PER_REQUEST = 10000
+_JOB_STATUS = OfflineUserDataJobStatusEnum.OfflineUserDataJobStatus
+_JOB_TYPE = OfflineUserDataJobTypeEnum.OfflineUserDataJobType
+_FAILURE_REASON = (
+    OfflineUserDataJobFailureReasonEnum.OfflineUserDataJobFailureReason
+)
+_FINAL_STATUSES = ("SUCCESS", "FAILED")
+
+
+# The paths the generated gRPC transports call. The proto-plus type files
+# define no services, so they cannot be read from their descriptors.
+_SERVICES_PACKAGE = f"google.ads.googleads.{_API_VERSION}.services"
+_CREATE_JOB_METHOD = (
+    f"/{_SERVICES_PACKAGE}.OfflineUserDataJobService/CreateOfflineUserDataJob"
+)
+_ADD_OPERATIONS_METHOD = (
+    f"/{_SERVICES_PACKAGE}.OfflineUserDataJobService/"
+    "AddOfflineUserDataJobOperations"
+)
+_RUN_JOB_METHOD = (
+    f"/{_SERVICES_PACKAGE}.OfflineUserDataJobService/RunOfflineUserDataJob"
+)
+_SEARCH_METHOD = f"/{_SERVICES_PACKAGE}.GoogleAdsService/Search"
+
+
+def create_channel(client, options=None):
+    """Creates a grpc.aio channel authorized with the client's credentials.
+
+    Args:
+        client: The Google Ads client.
+        options: Optional gRPC channel options.
+
+    Returns:
+        A grpc.aio.Channel.
+    """
+    auth_plugin = google.auth.transport.grpc.AuthMetadataPlugin(
+        client.credentials, google.auth.transport.requests.Request()
+    )
+    channel_credentials = grpc.composite_channel_credentials(
+        grpc.ssl_channel_credentials(),
+        grpc.metadata_call_credentials(auth_plugin),
+    )
+    return grpc.aio.secure_channel(
+        client.endpoint or _DEFAULT_ENDPOINT, channel_credentials, options
+    )
+
+
+def _to_google_ads_exception(error):
+    """Converts a grpc.aio.AioRpcError into a GoogleAdsException.
+
+    Returns None if the error does not carry a GoogleAdsFailure.
+    """
+    failure = None
+    request_id = None
+    for key, value in error.trailing_metadata() or ():
+        if key == _FAILURE_KEY:
+            failure = GoogleAdsFailure.pb().FromString(value)
+        elif key == "request-id":
+            request_id = value
+    if failure is None:
+        return None
+    return GoogleAdsException(error, error, failure, request_id)
+
+
+async def _batched(operations, batch_size):
+    """Batches a sync or async iterable of operations."""
+    batch = []
+    if hasattr(operations, "__aiter__"):
+        async for operation in operations:
+            batch.append(operation)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    else:
+        for operation in operations:
+            batch.append(operation)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _serialize(operation):
+    if isinstance(operation, bytes):
+        return operation
+    return operation.SerializeToString()
+
+
+class AsyncCustomerMatchClient:
+    """Runs Customer Match OfflineUserDataJobs with asyncio."""
+
+    def __init__(self, client, channel=None):
+        """Initializes the client.
+
+        Args:
+            client: The Google Ads client, used for its configuration.
+            channel: An optional grpc.aio.Channel. If None, one is created
+                with create_channel.
+        """
+        self.client = client
+        self._channel = channel or create_channel(client)
+        metadata = [("developer-token", client.developer_token)]
+        if client.login_customer_id:
+            metadata.append(
+                ("login-customer-id", str(client.login_customer_id))
+            )
+        if client.linked_customer_id:
+            metadata.append(
+                ("linked-customer-id", str(client.linked_customer_id))
+            )
+        self._metadata = tuple(metadata)
+
+        self._create_job = self._channel.unary_unary(
+            _CREATE_JOB_METHOD,
+            request_serializer=CreateOfflineUserDataJobRequest.pb().SerializeToString,
+            response_deserializer=CreateOfflineUserDataJobResponse.pb().FromString,
+        )
+        # Add requests are assembled from pre-encoded operations, so they are
+        # sent as is.
+        self._add_operations = self._channel.unary_unary(
+            _ADD_OPERATIONS_METHOD,
+            request_serializer=None,
+            response_deserializer=AddOfflineUserDataJobOperationsResponse.pb().FromString,
+        )
+        self._run_job = self._channel.unary_unary(
+            _RUN_JOB_METHOD,
+            request_serializer=RunOfflineUserDataJobRequest.pb().SerializeToString,
+            response_deserializer=operations_pb2.Operation.FromString,
+        )
+        self._search = self._channel.unary_unary(
+            _SEARCH_METHOD,
+            request_serializer=SearchGoogleAdsRequest.pb().SerializeToString,
+            response_deserializer=SearchGoogleAdsResponse.pb().FromString,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes the underlying channel."""
+        await self._channel.close()
+
+    async def _call(self, method, request, routing_params):
+        metadata = self._metadata + (
+            ("x-goog-request-params", routing_params),
+        )
+        try:
+            return await method(request, metadata=metadata)
+        except grpc.aio.AioRpcError as error:
+            exception = _to_google_ads_exception(error)
+            if exception is None:
+                raise
+            raise exception from error
+
+    async def create_job(self, customer_id, user_list_resource_name):
+        """Creates a Customer Match OfflineUserDataJob.
+
+        Args:
+            customer_id: The ID for the customer that owns the user list.
+            user_list_resource_name: The resource name of the user list to
+                which to add users.
+
+        Returns:
+            The resource name of the new offline user data job.
+        """
+        request = CreateOfflineUserDataJobRequest.pb()()
+        request.customer_id = customer_id
+        request.job.type_ = _JOB_TYPE.CUSTOMER_MATCH_USER_LIST
+        request.job.customer_match_user_list_metadata.user_list = (
+            user_list_resource_name
+        )
+        response = await self._call(
+            self._create_job, request, f"customer_id={customer_id}"
+        )
+        return response.resource_name
+
+    async def add_operations(
+        self,
+        resource_name,
+        operations,
+        max_operations_per_request=_MAX_OPERATIONS_PER_REQUEST,
+        enable_partial_failure=True,
+    ):
+        """Streams operations into an offline user data job.
+
+        Requests for the same job are sent one after the other, since
+        concurrent requests to a single job are rejected.
+
+        Args:
+            resource_name: The resource name of the offline user data job.
+            operations: An iterable or async iterable of
+                OfflineUserDataJobOperations, either as messages or already
+                serialized.
+            max_operations_per_request: The maximum number of operations in
+                each request.
+            enable_partial_failure: The value of enable_partial_failure on
+                each request.
+
+        Returns:
+            The list of AddOfflineUserDataJobOperationsResponses.
+        """
+        header = preencoded_requests.encode_request_header(
+            resource_name, enable_partial_failure
+        )
+        responses = []
+        async for batch in _batched(operations, max_operations_per_request):
+            payload = header + b"".join(
+                preencoded_requests.encode_operation_field(_serialize(op))
+                for op in batch
+            )
+            responses.append(
+                await self.send_encoded_request(resource_name, payload)
+            )
+        return responses
+
+    async def send_encoded_request(self, resource_name, payload):
+        """Sends one pre-encoded AddOfflineUserDataJobOperationsRequest.
+
+        Args:
+            resource_name: The resource name of the offline user data job the
+                payload was encoded for.
+            payload: A serialized AddOfflineUserDataJobOperationsRequest, for
+                example from preencoded_requests.iter_encoded_requests.
+
+        Returns:
+            The AddOfflineUserDataJobOperationsResponse.
+        """
+        return await self._call(
+            self._add_operations, payload, f"resource_name={resource_name}"
+        )
+
+    async def run_job(self, resource_name):
+        """Runs an offline user data job.
+
+        Args:
+            resource_name: The resource name of the offline user data job.
+
+        Returns:
+            The name of the long-running operation of the job.
+        """
+        request = RunOfflineUserDataJobRequest.pb()()
+        request.resource_name = resource_name
+        operation = await self._call(
+            self._run_job, request, f"resource_name={resource_name}"
+        )
+        return operation.name
+
+    async def get_job_status(self, customer_id, resource_name):
+        """Returns the status name of an offline user data job.
+
+        Args:
+            customer_id: The ID for the customer that owns the job.
+            resource_name: The resource name of the offline user data job.
+
+        Returns:
+            A tuple of the status name, for example "RUNNING", and the
+            failure reason name.
+
+        Raises:
+            ValueError: If the job was not found.
+        """
+        request = SearchGoogleAdsRequest.pb()()
+        request.customer_id = customer_id
+        request.query = f"""
+            SELECT
+              offline_user_data_job.status,
+              offline_user_data_job.failure_reason
+            FROM offline_user_data_job
+            WHERE offline_user_data_job.resource_name = '{resource_name}'
+            LIMIT 1"""
+        response = await self._call(
+            self._search, request, f"customer_id={customer_id}"
+        )
+        if not response.results:
+            raise ValueError(
+                f"Offline user data job '{resource_name}' was not found."
+            )
+        job = response.results[0].offline_user_data_job
+        return (
+            _JOB_STATUS(job.status).name,
+            _FAILURE_REASON(job.failure_reason).name,
+        )
+
+    async def wait_for_completion(
+        self,
+        customer_id,
+        resource_name,
+        poll_interval=30,
+        max_poll_interval=600,
+        timeout=None,
+    ):
+        """Polls an offline user data job until it succeeds or fails.
+
+        Offline user data jobs may take 6 hours or more to complete, so the
+        poll interval doubles after every check up to max_poll_interval.
+
+        Args:
+            customer_id: The ID for the customer that owns the job.
+            resource_name: The resource name of the offline user data job.
+            poll_interval: The initial number of seconds between checks.
+            max_poll_interval: The maximum number of seconds between checks.
+            timeout: The number of seconds after which to give up, or None to
+                wait indefinitely.
+
+        Returns:
+            A tuple of the final status name and the failure reason name.
+
+        Raises:
+            asyncio.TimeoutError: If the job is not done within timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status, failure_reason = await self.get_job_status(
+                customer_id, resource_name
+            )
+            if status in _FINAL_STATUSES:
+                return status, failure_reason
+            if deadline is not None and time.monotonic() >= deadline:
+                raise asyncio.TimeoutError(
+                    f"Offline user data job '{resource_name}' is still "
+                    f"{status} after {timeout} seconds."
+                )
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+
+
+async def upload_to_user_list(
+    async_client, customer_id, user_list_resource_name, operations, run_job
+):
+    """Runs the full Customer Match flow for one user list.
+
+    Args:
+        async_client: An AsyncCustomerMatchClient.
+        customer_id: The ID for the customer that owns the user list.
+        user_list_resource_name: The resource name of the user list to which
+            to add users.
+        operations: An iterable or async iterable of operations.
+        run_job: If true, runs the job and waits for it to complete.
+
+    Returns:
+        The final status name of the job, or "PENDING" if it was not run.
+    """
+    resource_name = await async_client.create_job(
+        customer_id, user_list_resource_name
+    )
+    print(
+        "Created an offline user data job with resource name: "
+        f"'{resource_name}'."
+    )
+    responses = await async_client.add_operations(resource_name, operations)
+    for response in responses:
+        print_partial_failure(async_client.client, response)
+    if not run_job:
+        return "PENDING"
+    await async_client.run_job(resource_name)
+    status, failure_reason = await async_client.wait_for_completion(
+        customer_id, resource_name
+    )
+    print(f"Offline user data job '{resource_name}' has status: {status}")
+    if status == "FAILED":
+        print(f"\tFailure Reason: {failure_reason}")
+    return status
+
+
+async def main(client, customer_id, user_list_ids, run_job):
+    """Uploads the example records to several user lists concurrently.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The ID for the customer that owns the user lists.
+        user_list_ids: IDs of existing Customer Match user lists.
+        run_job: If true, runs the jobs and waits for them to complete.
+    """
+    serialized_operations = serialize_contact_info_records(get_raw_records())
+    async with AsyncCustomerMatchClient(client) as async_client:
+        await asyncio.gather(
+            *(
+                upload_to_user_list(
+                    async_client,
+                    customer_id,
+                    f"customers/{customer_id}/userLists/{user_list_id}",
+                    serialized_operations,
+                    run_job,
+                )
+                for user_list_id in user_list_ids
+            )
+        )
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version=_API_VERSION)
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Adds users to several Customer Match user lists concurrently."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-c",
+        "--customer_id",
+        type=str,
+        required=True,
+        help="The ID for the customer that owns the user lists.",
+    )
+    parser.add_argument(
+        "-u",
+        "--user_list_ids",
+        type=str,
+        nargs="+",
+        required=True,
+        help="The IDs of existing Customer Match user lists.",
+    )
+    parser.add_argument(
+        "-r",
+        "--run_job",
+        action="store_true",
+        help="If set, runs the jobs and waits for them to complete.",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(
+            main(
+                googleads_client,
+                args.customer_id,
+                args.user_list_ids,
+                args.run_job,
+            )
+        )
+    except GoogleAdsException as ex:
+        print(
+            f"Request with ID '{ex.request_id}' failed with status "
+            f"'{ex.error.code().name}' and includes the following errors:"
+        )
+        for error in ex.failure.errors:
+            print(f"\tError with message '{error.message}'.")
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
@@ -0,0 +1,221 @@
+"""Reads large CSV and TSV audience files in parallel.
+
+Audience exports staged as multi-gigabyte files are too large to load into a
+table before building operations. AudienceFile memory-maps the file and splits
+it into byte ranges that start and end on line boundaries. Worker processes
+map the same file, parse the rows of their own ranges and normalize, hash and
+serialize them with sharded_transform.serialize_contact_info_records, so only
+the serialized operations travel back to the parent and the full table is
+never built.
+
+The first line of the file names the columns. Column names are lowercased and
+their spaces replaced with underscores, so "First Name" becomes the record key
+"first_name". Since ranges are split on newlines, quoted values must not
+contain line breaks.
+"""
+
+import collections
+import csv
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import contact_validation
+from sharded_transform import serialize_contact_info_records
+
+
+_DEFAULT_CHUNK_SIZE = 16 * 2 ** 20
+_DEFAULT_SAMPLE_SIZE = 1000
+
+
+def _column_key(name):
+    return name.strip().lower().replace(" ", "_")
+
+
+def _parse_records(data, fieldnames, delimiter):
+    """Parses complete lines into record dicts without empty values."""
+    records = []
+    for row in csv.reader(io.StringIO(data.decode()), delimiter=delimiter):
+        record = {
+            key: value
+            for key, value in zip(fieldnames, row)
+            if value
+        }
+        if record:
+            records.append(record)
+    return records
+
+
+def _transform_range(
+    path, start, end, fieldnames, delimiter, with_keys, prehashed_keys, validate
+):
+    """Parses, validates and serializes the rows of one byte range.
+
+    This is the unit of work executed by each worker process.
+
+    Returns:
+        A tuple of the serialized operations, as returned by
+        serialize_contact_info_records, the validation counts and the number
+        of rows read.
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            records = _parse_records(mapped[start:end], fieldnames, delimiter)
+    num_rows = len(records)
+    counts = collections.Counter()
+    if validate:
+        records, counts = contact_validation.validate_records(
+            records, prehashed_keys
+        )
+    elif prehashed_keys:
+        # Pre-hashed values are always checked, since they are uploaded as is.
+        records, counts = contact_validation.validate_prehashed_columns(
+            records, prehashed_keys
+        )
+    serialized = serialize_contact_info_records(
+        records, with_keys, prehashed_keys
+    )
+    return serialized, counts, num_rows
+
+
+class AudienceFile:
+    """A memory-mapped CSV or TSV file of contact information."""
+
+    def __init__(self, path, delimiter=None):
+        """Opens the file and reads its header.
+
+        Args:
+            path: The path of the file.
+            delimiter: The field delimiter. Defaults to a tab for files
+                ending in .tsv and to a comma otherwise.
+
+        Raises:
+            ValueError: If the file has no header line.
+        """
+        self.path = path
+        if delimiter is None:
+            delimiter = "\t" if path.lower().endswith(".tsv") else ","
+        self.delimiter = delimiter
+        self.validation_counts = collections.Counter()
+        self.num_rows = 0
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            header = f.readline()
+        if not header.strip():
+            raise ValueError(f"'{path}' has no header line.")
+        # The header is the only line that may start with a byte order mark.
+        self.fieldnames = [
+            _column_key(name)
+            for name in next(
+                csv.reader([header.decode("utf-8-sig")], delimiter=delimiter)
+            )
+        ]
+        self.data_start = len(header)
+
+    def byte_ranges(self, chunk_size=_DEFAULT_CHUNK_SIZE):
+        """Splits the rows of the file into ranges of whole lines.
+
+        Args:
+            chunk_size: The approximate number of bytes in each range.
+
+        Returns:
+            A list of (start, end) byte offsets covering every row once, in
+            file order.
+        """
+        if self.size <= self.data_start:
+            return []
+        ranges = []
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                start = self.data_start
+                while start < self.size:
+                    # Ends each range just past the next newline.
+                    end = mapped.find(b"\n", start + chunk_size - 1)
+                    end = self.size if end == -1 else end + 1
+                    ranges.append((start, end))
+                    start = end
+        return ranges
+
+    def sample_records(self, sample_size=_DEFAULT_SAMPLE_SIZE):
+        """Returns the first rows of the file as record dicts.
+
+        The sample can be used to detect pre-hashed columns with
+        contact_validation.detect_prehashed_keys.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(self.data_start)
+            lines = b"".join(
+                line for _, line in zip(range(sample_size), f)
+            )
+        return _parse_records(lines, self.fieldnames, self.delimiter)
+
+    def estimate_num_rows(self, sample_size=_DEFAULT_SAMPLE_SIZE):
+        """Estimates the number of rows from the length of the first rows."""
+        with open(self.path, "rb") as f:
+            f.seek(self.data_start)
+            lengths = [len(line) for _, line in zip(range(sample_size), f)]
+        if not lengths:
+            return 0
+        average_length = sum(lengths) / len(lengths)
+        return round((self.size - self.data_start) / average_length)
+
+    def transform_sharded(
+        self,
+        processes=None,
+        chunk_size=_DEFAULT_CHUNK_SIZE,
+        with_keys=False,
+        prehashed_keys=frozenset(),
+        validate=False,
+    ):
+        """Serializes contact-info operations for every row in a process pool.
+
+        Ranges are submitted with a bounded window, so memory use does not
+        grow with the size of the file, and results are yielded in file
+        order. As ranges complete, the number of rows read is added to
+        num_rows and the validation counts to validation_counts.
+
+        Args:
+            processes: The number of worker processes. Defaults to the number
+                of CPUs.
+            chunk_size: The approximate number of bytes parsed per task.
+            with_keys: If true, yields (keys, serialized operation) tuples so
+                that the parent can deduplicate without parsing the
+                operations.
+            prehashed_keys: Keys whose values are already SHA-256 hashed.
+                These are checked even if validate is false.
+            validate: If true, records are validated and repaired with
+                contact_validation.validate_records before they are hashed.
+
+        Yields:
+            Serialized OfflineUserDataJobOperation messages, or (keys,
+            serialized operation) tuples if with_keys is set.
+        """
+        processes = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = collections.deque()
+
+            def collect():
+                serialized, counts, num_rows = pending.popleft().result()
+                self.validation_counts.update(counts)
+                self.num_rows += num_rows
+                return serialized
+
+            for start, end in self.byte_ranges(chunk_size):
+                pending.append(
+                    executor.submit(
+                        _transform_range,
+                        self.path,
+                        start,
+                        end,
+                        self.fieldnames,
+                        self.delimiter,
+                        with_keys,
+                        prehashed_keys,
+                        validate,
+                    )
+                )
+                if len(pending) >= processes * 2:
+                    yield from collect()
+            while pending:
+                yield from collect()
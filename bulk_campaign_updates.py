@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+"""Applies desired campaign statuses and budget amounts in bulk.
+
+The desired states are diffed against the current states, read either with a
+fresh GAQL query or from the local entity mirror (see entity_mirror.py). Only
+campaigns and budgets that actually change get an update operation, each with
+a field mask naming only the changed field, and all operations are sent
+through GoogleAdsService.Mutate in as few requests as possible.
+
+The desired states are read from a JSON file mapping campaign IDs to objects
+with an optional "status" ("PAUSED" or "ENABLED") and an optional
+"budget_amount_micros":
+
+    {"1234": {"status": "PAUSED"}, "5678": {"budget_amount_micros": 5000000}}
+"""
+
+import argparse
+import json
+import sys
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v14.enums.types.campaign_status import CampaignStatusEnum
+
+from entity_mirror import EntityMirror
+
+
+_MAX_OPERATIONS_PER_REQUEST = 10000
+# UNSPECIFIED and UNKNOWN cannot be set on a campaign, and REMOVED can only be
+# reached with a remove operation, not with an update.
+_STATUSES = tuple(
+    name
+    for name in CampaignStatusEnum.CampaignStatus.__members__
+    if name not in ("UNSPECIFIED", "UNKNOWN", "REMOVED")
+)
+
+
+def read_desired_states(path):
+    """Reads desired campaign states from a JSON file and validates them.
+
+    Args:
+        path: The path of the JSON file.
+
+    Returns:
+        A dict mapping campaign IDs to dicts with optional "status" and
+        "budget_amount_micros" keys.
+
+    Raises:
+        ValueError: If an entry is invalid.
+    """
+    with open(path) as f:
+        desired_states = json.load(f)
+    validate_desired_states(desired_states)
+    return desired_states
+
+
+def validate_desired_states(desired_states):
+    """Checks desired campaign states before any request is sent.
+
+    Args:
+        desired_states: A dict mapping campaign IDs to dicts with optional
+            "status" and "budget_amount_micros" keys.
+
+    Raises:
+        ValueError: If an entry is invalid. The message names the campaign
+            ID of the entry.
+    """
+    if not isinstance(desired_states, dict):
+        raise ValueError(
+            "The desired states must map campaign IDs to objects."
+        )
+    for campaign_id, desired in desired_states.items():
+        if not str(campaign_id).isdigit():
+            raise ValueError(f"'{campaign_id}' is not a campaign ID.")
+        if not isinstance(desired, dict):
+            raise ValueError(
+                f"The desired state of campaign {campaign_id} is not an "
+                "object."
+            )
+        status = desired.get("status")
+        if status is not None and status not in _STATUSES:
+            raise ValueError(
+                f"Campaign {campaign_id} has the unknown status '{status}', "
+                f"expected one of {', '.join(_STATUSES)}."
+            )
+        amount_micros = desired.get("budget_amount_micros")
+        if amount_micros is not None and (
+            type(amount_micros) is not int or amount_micros < 0
+        ):
+            raise ValueError(
+                f"Campaign {campaign_id} has the invalid budget amount "
+                f"'{amount_micros}', expected a non-negative integer of "
+                "micros."
+            )
+
+
+def read_current_states(client, customer_id, campaign_ids):
+    """Reads the current status and budget of campaigns with GAQL.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The Google Ads customer ID.
+        campaign_ids: The IDs of the campaigns to read.
+
+    Returns:
+        A dict mapping campaign IDs to dicts with the keys "status",
+        "campaign_budget" and "budget_amount_micros".
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    states = {}
+    campaign_ids = sorted(set(str(campaign_id) for campaign_id in campaign_ids))
+    for i in range(0, len(campaign_ids), 1000):
+        query = f"""
+            SELECT
+              campaign.id,
+              campaign.status,
+              campaign.campaign_budget,
+              campaign_budget.amount_micros
+            FROM campaign
+            WHERE campaign.id IN ({', '.join(campaign_ids[i:i + 1000])})"""
+        stream = googleads_service.search_stream(
+            customer_id=customer_id, query=query
+        )
+        for batch in stream:
+            for row in batch.results:
+                states[str(row.campaign.id)] = {
+                    "status": CampaignStatusEnum.CampaignStatus(
+                        row.campaign.status
+                    ).name,
+                    "campaign_budget": row.campaign.campaign_budget,
+                    "budget_amount_micros": row.campaign_budget.amount_micros,
+                }
+    return states
+
+
+def read_mirrored_states(mirror, customer_id, campaign_ids):
+    """Reads the current status and budget of campaigns from the mirror.
+
+    Args:
+        mirror: An EntityMirror that was synced recently.
+        customer_id: The Google Ads customer ID.
+        campaign_ids: The IDs of the campaigns to read.
+
+    Returns:
+        A dict in the same format as read_current_states.
+    """
+    campaign_ids = set(str(campaign_id) for campaign_id in campaign_ids)
+    states = {}
+    for campaign_id, _, status, campaign_budget in mirror.get_campaigns(
+        customer_id, include_removed=True
+    ):
+        if str(campaign_id) not in campaign_ids:
+            continue
+        budget = mirror.get_campaign_budget(customer_id, campaign_budget)
+        states[str(campaign_id)] = {
+            "status": status,
+            "campaign_budget": campaign_budget,
+            "budget_amount_micros": budget[1] if budget else None,
+        }
+    return states
+
+
+def diff_states(desired_states, current_states):
+    """Computes the changes needed to reach the desired states.
+
+    Args:
+        desired_states: A dict mapping campaign IDs to dicts with optional
+            "status" and "budget_amount_micros" keys.
+        current_states: A dict as returned by read_current_states.
+
+    Returns:
+        A tuple of two dicts. The first maps campaign IDs to their new status,
+        and the second maps campaign budget resource names to their new
+        amount in micros.
+
+    Raises:
+        ValueError: If a campaign does not exist, or if campaigns sharing a
+            budget ask for different amounts.
+    """
+    status_changes = {}
+    budget_changes = {}
+    requested_amounts = {}
+    for campaign_id, desired in desired_states.items():
+        campaign_id = str(campaign_id)
+        current = current_states.get(campaign_id)
+        if current is None:
+            raise ValueError(f"Campaign with ID {campaign_id} was not found.")
+
+        status = desired.get("status")
+        if status is not None and status != current["status"]:
+            status_changes[campaign_id] = status
+
+        amount_micros = desired.get("budget_amount_micros")
+        if amount_micros is None:
+            continue
+        budget = current["campaign_budget"]
+        if requested_amounts.setdefault(budget, amount_micros) != amount_micros:
+            raise ValueError(
+                f"Campaigns sharing the budget '{budget}' ask for different "
+                "amounts."
+            )
+        if amount_micros != current["budget_amount_micros"]:
+            budget_changes[budget] = amount_micros
+    return status_changes, budget_changes
+
+
+def build_mutate_operations(
+    client, customer_id, status_changes, budget_changes
+):
+    """Creates update operations with minimal field masks.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The Google Ads customer ID.
+        status_changes: A dict mapping campaign IDs to their new status name.
+        budget_changes: A dict mapping campaign budget resource names to their
+            new amount in micros.
+
+    Returns:
+        A list of MutateOperations. Budget updates come first so that a
+        campaign is never enabled before its new budget applies.
+    """
+    campaign_service = client.get_service("CampaignService")
+    operations = []
+    for resource_name, amount_micros in sorted(budget_changes.items()):
+        mutate_operation = client.get_type("MutateOperation")
+        budget_operation = mutate_operation.campaign_budget_operation
+        budget_operation.update.resource_name = resource_name
+        budget_operation.update.amount_micros = amount_micros
+        budget_operation.update_mask.paths.append("amount_micros")
+        operations.append(mutate_operation)
+
+    for campaign_id, status in sorted(status_changes.items()):
+        mutate_operation = client.get_type("MutateOperation")
+        campaign_operation = mutate_operation.campaign_operation
+        campaign_operation.update.resource_name = campaign_service.campaign_path(
+            customer_id, campaign_id
+        )
+        campaign_operation.update.status = getattr(
+            client.enums.CampaignStatusEnum, status
+        )
+        campaign_operation.update_mask.paths.append("status")
+        operations.append(mutate_operation)
+    return operations
+
+
+def apply_desired_states(client, customer_id, desired_states, mirror=None):
+    """Diffs and applies desired campaign states.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The Google Ads customer ID.
+        desired_states: A dict mapping campaign IDs to dicts with optional
+            "status" and "budget_amount_micros" keys.
+        mirror: An optional EntityMirror to read the current states from
+            instead of querying the API.
+
+    Returns:
+        A dict with the number of campaigns and budgets that were updated,
+        the number of desired states that needed no change, and the number of
+        mutate requests sent.
+
+    Raises:
+        ValueError: If a desired state is invalid, see
+            validate_desired_states, or cannot be applied, see diff_states.
+    """
+    validate_desired_states(desired_states)
+    if mirror is not None:
+        current_states = read_mirrored_states(
+            mirror, customer_id, desired_states
+        )
+    else:
+        current_states = read_current_states(
+            client, customer_id, desired_states
+        )
+    status_changes, budget_changes = diff_states(
+        desired_states, current_states
+    )
+    operations = build_mutate_operations(
+        client, customer_id, status_changes, budget_changes
+    )
+
+    googleads_service = client.get_service("GoogleAdsService")
+    requests = 0
+    for i in range(0, len(operations), _MAX_OPERATIONS_PER_REQUEST):
+        googleads_service.mutate(
+            customer_id=customer_id,
+            mutate_operations=operations[i:i + _MAX_OPERATIONS_PER_REQUEST],
+        )
+        requests += 1
+
+    changed_campaigns = set(status_changes)
+    changed_budgets = set(budget_changes)
+    unchanged = sum(
+        1
+        for campaign_id in desired_states
+        if str(campaign_id) not in changed_campaigns
+        and current_states[str(campaign_id)]["campaign_budget"]
+        not in changed_budgets
+    )
+    return {
+        "campaigns_updated": len(status_changes),
+        "budgets_updated": len(budget_changes),
+        "unchanged": unchanged,
+        "mutate_requests": requests,
+    }
+
+
+def main(client, customer_id, desired_states_path, database_path):
+    desired_states = read_desired_states(desired_states_path)
+
+    mirror = None
+    if database_path:
+        mirror = EntityMirror(client, database_path)
+        mirror.sync(customer_id)
+    try:
+        result = apply_desired_states(
+            client, customer_id, desired_states, mirror
+        )
+    finally:
+        if mirror is not None:
+            mirror.close()
+    print(
+        f"Updated {result['campaigns_updated']} campaigns and "
+        f"{result['budgets_updated']} budgets in "
+        f"{result['mutate_requests']} mutate requests; "
+        f"{result['unchanged']} campaigns were already up to date."
+    )
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Updates the status and budget of campaigns for specified "
+            "customer, sending only real changes."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-c",
+        "--customer_id",
+        type=str,
+        required=True,
+        help="The Google Ads customer ID.",
+    )
+    parser.add_argument(
+        "-f",
+        "--desired_states_path",
+        type=str,
+        required=True,
+        help="The path of the JSON file with the desired campaign states.",
+    )
+    parser.add_argument(
+        "--database_path",
+        type=str,
+        required=False,
+        help=(
+            "The path of an entity mirror database. If specified, the mirror "
+            "is synced and used for the current states instead of a full "
+            "campaign query."
+        ),
+    )
+    args = parser.parse_args()
+
+    try:
+        main(
+            googleads_client,
+            args.customer_id,
+            args.desired_states_path,
+            args.database_path,
+        )
+    except GoogleAdsException as ex:
+        print(
+            f'Request with ID "{ex.request_id}" failed with status '
+            f'"{ex.error.code().name}" and includes the following errors:'
+        )
+        for error in ex.failure.errors:
+            print(f'\tError with message "{error.message}".')
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+"""Answers campaign lookups from an indexed in-memory catalog.
+
+Tools that need campaign metadata otherwise stream every campaign, as
+get_campaigns.py does, and scan the rows for each lookup. CampaignCatalog
+loads the campaigns of a customer once, from the API or from an
+entity_mirror.py database, and answers lookups by ID, by exact name, by name
+prefix and by budget without further calls.
+
+The campaigns are stored column by column: IDs in an integer array, every name
+in one string with an array of offsets, and statuses and budgets as small
+integer codes into tables of their distinct values. The ID, name and budget
+indexes map hashes to row numbers, so they hold no copies of the names. A
+background thread can reload the catalog periodically. Each load builds a new
+snapshot, and lookups keep reading the previous one until it is swapped in.
+"""
+
+import argparse
+import array
+import bisect
+import sys
+import threading
+import time
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v14.enums.types.campaign_status import CampaignStatusEnum
+
+from entity_mirror import EntityMirror
+
+
+def load_campaigns_from_api(client, customer_id):
+    """Fetches the campaigns of a customer that are not removed.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The Google Ads customer ID.
+
+    Returns:
+        A list of (id, name, status, campaign_budget) tuples, as returned by
+        EntityMirror.get_campaigns.
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    query = """
+        SELECT
+          campaign.id,
+          campaign.name,
+          campaign.status,
+          campaign.campaign_budget
+        FROM campaign
+        WHERE campaign.status != 'REMOVED'
+        ORDER BY campaign.id"""
+    stream = googleads_service.search_stream(
+        customer_id=customer_id, query=query
+    )
+    campaigns = []
+    for batch in stream:
+        for row in batch.results:
+            campaign = row.campaign
+            campaigns.append(
+                (
+                    campaign.id,
+                    campaign.name,
+                    CampaignStatusEnum.CampaignStatus(campaign.status).name,
+                    campaign.campaign_budget,
+                )
+            )
+    return campaigns
+
+
+def load_campaigns_from_mirror(client, customer_id, database_path):
+    """Reads the campaigns of a customer that are not removed from a mirror.
+
+    The mirror is opened on every call, so a catalog refresh sees the
+    campaigns of the latest entity_mirror.py sync.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The Google Ads customer ID.
+        database_path: The path of the entity_mirror.py database.
+
+    Returns:
+        A list of (id, name, status, campaign_budget) tuples.
+    """
+    mirror = EntityMirror(client, database_path)
+    try:
+        return mirror.get_campaigns(customer_id)
+    finally:
+        mirror.close()
+
+
+def _add_to_index(index, key, row):
+    # Most keys map to a single row, which is stored without a container.
+    rows = index.get(key)
+    if rows is None:
+        index[key] = row
+    elif isinstance(rows, int):
+        index[key] = (rows, row)
+    else:
+        index[key] = rows + (row,)
+
+
+def _index_rows(index, key):
+    rows = index.get(key, ())
+    return (rows,) if isinstance(rows, int) else rows
+
+
+class _FoldedNames:
+    """The case-folded names of a snapshot in name order, for bisect.
+
+    This avoids bisect's key argument, which needs Python 3.10. Each name is
+    folded when it is read, so no copies of the names are kept.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return len(self._snapshot.name_order)
+
+    def __getitem__(self, position):
+        snapshot = self._snapshot
+        return snapshot.name(snapshot.name_order[position]).casefold()
+
+
+class _Snapshot:
+    """The columns and indexes of one load of the catalog."""
+
+    def __init__(self, campaigns):
+        self.ids = array.array("q")
+        self.name_offsets = array.array("q", [0])
+        self.status_codes = array.array("B")
+        self.budget_codes = array.array("L")
+        self.statuses = []
+        self.budgets = []
+        self.by_id = {}
+        self.by_name = {}
+        self.by_budget = {}
+        status_codes = {}
+        budget_codes = {}
+        names = []
+        for row, (campaign_id, name, status, budget) in enumerate(campaigns):
+            self.ids.append(campaign_id)
+            names.append(name)
+            self.name_offsets.append(self.name_offsets[-1] + len(name))
+            if status not in status_codes:
+                status_codes[status] = len(self.statuses)
+                self.statuses.append(status)
+            self.status_codes.append(status_codes[status])
+            if budget not in budget_codes:
+                budget_codes[budget] = len(self.budgets)
+                self.budgets.append(budget)
+            self.budget_codes.append(budget_codes[budget])
+            self.by_id[campaign_id] = row
+            _add_to_index(self.by_name, hash(name), row)
+            _add_to_index(self.by_budget, budget_codes[budget], row)
+        self.names = "".join(names)
+        self.budget_codes_by_name = budget_codes
+        # Rows ordered by case-folded name, for prefix search.
+        self.name_order = array.array(
+            "L", sorted(range(len(names)), key=lambda i: names[i].casefold())
+        )
+
+    def name(self, row):
+        return self.names[self.name_offsets[row]:self.name_offsets[row + 1]]
+
+    def campaign(self, row):
+        return (
+            self.ids[row],
+            self.name(row),
+            self.statuses[self.status_codes[row]],
+            self.budgets[self.budget_codes[row]],
+        )
+
+
+class CampaignCatalog:
+    """An indexed in-memory catalog of the campaigns of one customer."""
+
+    def __init__(self, load_campaigns):
+        """Loads the catalog.
+
+        Args:
+            load_campaigns: A function without arguments returning a list of
+                (id, name, status, campaign_budget) tuples, for example a
+                functools.partial of load_campaigns_from_api.
+        """
+        self._load_campaigns = load_campaigns
+        self._stopped = threading.Event()
+        self._thread = None
+        self.refresh()
+
+    def refresh(self):
+        """Reloads the campaigns and swaps in the new snapshot."""
+        snapshot = _Snapshot(self._load_campaigns())
+        self._snapshot = snapshot
+        self.loaded_at = time.time()
+
+    def start_background_refresh(self, interval_seconds):
+        """Reloads the catalog every interval_seconds on a daemon thread.
+
+        A failed reload is printed and the previous snapshot is kept.
+        """
+        def run():
+            while not self._stopped.wait(interval_seconds):
+                try:
+                    self.refresh()
+                except Exception as ex:
+                    print(f"Failed to refresh the campaign catalog: {ex!r}")
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background refresh."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __len__(self):
+        return len(self._snapshot.ids)
+
+    def get(self, campaign_id):
+        """Returns a campaign as an (id, name, status, campaign_budget) tuple.
+
+        Returns None if the catalog has no campaign with the ID.
+        """
+        snapshot = self._snapshot
+        row = snapshot.by_id.get(int(campaign_id))
+        return None if row is None else snapshot.campaign(row)
+
+    def find_by_name(self, name):
+        """Returns the campaigns with exactly the given name."""
+        snapshot = self._snapshot
+        return [
+            snapshot.campaign(row)
+            for row in _index_rows(snapshot.by_name, hash(name))
+            # Different names may share a hash.
+            if snapshot.name(row) == name
+        ]
+
+    def find_by_budget(self, campaign_budget):
+        """Returns the campaigns that use a budget.
+
+        Args:
+            campaign_budget: The resource name of the campaign budget.
+        """
+        snapshot = self._snapshot
+        code = snapshot.budget_codes_by_name.get(campaign_budget)
+        if code is None:
+            return []
+        return [
+            snapshot.campaign(row)
+            for row in _index_rows(snapshot.by_budget, code)
+        ]
+
+    def search_prefix(self, prefix, limit=None):
+        """Returns the campaigns whose names start with a prefix.
+
+        The match ignores case, and the campaigns are ordered by name.
+
+        Args:
+            prefix: The start of the campaign names.
+            limit: If set, the maximum number of campaigns returned.
+        """
+        snapshot = self._snapshot
+        prefix = prefix.casefold()
+        order = snapshot.name_order
+        position = bisect.bisect_left(_FoldedNames(snapshot), prefix)
+        campaigns = []
+        while position < len(order):
+            row = order[position]
+            if not snapshot.name(row).casefold().startswith(prefix):
+                break
+            if limit is not None and len(campaigns) >= limit:
+                break
+            campaigns.append(snapshot.campaign(row))
+            position += 1
+        return campaigns
+
+
+def _print_campaign(campaign):
+    campaign_id, name, status, campaign_budget = campaign
+    print(
+        f"Campaign with ID {campaign_id} and name \"{name}\" is {status} and "
+        f"uses budget {campaign_budget}."
+    )
+
+
+def main(client, customer_id, database_path, prefixes, campaign_ids):
+    if database_path:
+        catalog = CampaignCatalog(
+            lambda: load_campaigns_from_mirror(
+                client, customer_id, database_path
+            )
+        )
+    else:
+        catalog = CampaignCatalog(
+            lambda: load_campaigns_from_api(client, customer_id)
+        )
+    print(f"Loaded {len(catalog)} campaigns.")
+    for prefix in prefixes:
+        start = time.perf_counter()
+        campaigns = catalog.search_prefix(prefix)
+        microseconds = (time.perf_counter() - start) * 1e6
+        print(
+            f"Found {len(campaigns)} campaigns starting with '{prefix}' in "
+            f"{microseconds:.0f} microseconds."
+        )
+        for campaign in campaigns:
+            _print_campaign(campaign)
+    for campaign_id in campaign_ids:
+        start = time.perf_counter()
+        campaign = catalog.get(campaign_id)
+        microseconds = (time.perf_counter() - start) * 1e6
+        if campaign is None:
+            print(f"No campaign with ID {campaign_id} found.")
+        else:
+            _print_campaign(campaign)
+        print(
+            f"Looked up ID {campaign_id} in {microseconds:.1f} microseconds."
+        )
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Loads the campaigns of specified customer into an in-memory "
+            "catalog and looks them up by name prefix and ID."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-c",
+        "--customer_id",
+        type=str,
+        required=True,
+        help="The Google Ads customer ID.",
+    )
+    parser.add_argument(
+        "-p",
+        "--prefixes",
+        type=str,
+        nargs="+",
+        default=[""],
+        help="The name prefixes to search for. By default, every campaign.",
+    )
+    parser.add_argument(
+        "-i",
+        "--campaign_ids",
+        type=int,
+        nargs="+",
+        default=[],
+        help="The IDs of campaigns to look up.",
+    )
+    parser.add_argument(
+        "--database_path",
+        type=str,
+        required=False,
+        help=(
+            "If set, the campaigns are loaded from this entity_mirror.py "
+            "database instead of the API."
+        ),
+    )
+    args = parser.parse_args()
+
+    try:
+        main(
+            googleads_client,
+            args.customer_id,
+            args.database_path,
+            args.prefixes,
+            args.campaign_ids,
+        )
+    except GoogleAdsException as ex:
+        print(
+            f'Request with ID "{ex.request_id}" failed with status '
+            f'"{ex.error.code().name}" and includes the following errors:'
+        )
+        for error in ex.failure.errors:
+            print(f'\tError with message "{error.message}".')
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
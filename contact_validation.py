@@ -0,0 +1,324 @@
+"""Validates and repairs contact-info records before they are hashed.
+
+Malformed emails, phone numbers that are not in E.164 format, and unknown
+country or postal codes are otherwise only reported by the API as partial
+failures after the operations were uploaded. The checks here run locally, one
+column at a time, so each rule is a single pass with a precompiled pattern over
+a plain list of values:
+
+* Keys are matched against the known contact-info keys, and close misspellings
+  such as "last_mame" are renamed.
+* Emails are trimmed and lowercased, then checked for a valid syntax.
+* Phone numbers are stripped of spaces and punctuation, a leading "00" is
+  replaced by "+", and the result must be in E.164 format.
+* Country codes are uppercased and must be ISO 3166-1 alpha-2 codes.
+* Postal codes are uppercased and checked against the format of their country
+  where it is known.
+
+Columns that already hold SHA-256 hashes, such as hashed emails exported by
+another system, skip the email and phone rules. They are instead checked to be
+64-character lowercase hex strings, and can be detected from a sample of the
+records with detect_prehashed_keys.
+
+None, NaN (as read from a data frame) and blank strings count as empty values
+and are dropped before any rule runs.
+
+Invalid values are removed from their record; an invalid country or postal code
+removes the whole mailing address. Records left without any identifier are
+rejected. Every repair and rejection is counted per rule.
+"""
+
+import collections
+import difflib
+import math
+import re
+
+
+CONTACT_INFO_KEYS = (
+    "email",
+    "phone",
+    "first_name",
+    "last_name",
+    "country_code",
+    "postal_code",
+)
+_ADDRESS_KEYS = ("first_name", "last_name", "country_code", "postal_code")
+# The keys whose values are hashed before they are uploaded.
+HASHED_KEYS = ("email", "phone", "first_name", "last_name")
+
+_EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[a-z]{2,}")
+_E164_PATTERN = re.compile(r"\+[1-9]\d{7,14}")
+_PHONE_PUNCTUATION = re.compile(r"[\s().\-]")
+_SHA256_HEX_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+_ISO_COUNTRY_CODES = frozenset(
+    """
+    AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ
+    BL BM BN BO BQ BR BS BT BV BW BY BZ CA CC CD CF CG CH CI CK CL CM CN CO CR
+    CU CV CW CX CY CZ DE DJ DK DM DO DZ EC EE EG EH ER ES ET FI FJ FK FM FO FR
+    GA GB GD GE GF GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM HN HR HT HU
+    ID IE IL IM IN IO IQ IR IS IT JE JM JO JP KE KG KH KI KM KN KP KR KW KY KZ
+    LA LB LC LI LK LR LS LT LU LV LY MA MC MD ME MF MG MH MK ML MM MN MO MP MQ
+    MR MS MT MU MV MW MX MY MZ NA NC NE NF NG NI NL NO NP NR NU NZ OM PA PE PF
+    PG PH PK PL PM PN PR PS PT PW PY QA RE RO RS RU RW SA SB SC SD SE SG SH SI
+    SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM TN TO TR
+    TT TV TW TZ UA UG UM US UY UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW
+    """.split()
+)
+
+_POSTAL_CODE_PATTERNS = {
+    country_code: re.compile(pattern)
+    for country_code, pattern in {
+        "AU": r"\d{4}",
+        "BR": r"\d{5}-?\d{3}",
+        "CA": r"[A-Z]\d[A-Z] ?\d[A-Z]\d",
+        "DE": r"\d{5}",
+        "ES": r"\d{5}",
+        "FR": r"\d{5}",
+        "GB": r"[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}",
+        "IN": r"\d{6}",
+        "IT": r"\d{5}",
+        "JP": r"\d{3}-?\d{4}",
+        "MX": r"\d{5}",
+        "NL": r"\d{4} ?[A-Z]{2}",
+        "US": r"\d{5}(-\d{4})?",
+    }.items()
+}
+_GENERIC_POSTAL_CODE_PATTERN = re.compile(r"[A-Z0-9][A-Z0-9 \-]{1,9}")
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    return isinstance(value, str) and not value.strip()
+
+
+def _columns(records):
+    """Transposes records into columns, renaming misspelled keys."""
+    counts = collections.Counter()
+    columns = {key: [None] * len(records) for key in CONTACT_INFO_KEYS}
+    renames = {}
+    for index, record in enumerate(records):
+        for key, value in record.items():
+            if key not in renames:
+                if key in columns:
+                    renames[key] = key
+                else:
+                    matches = difflib.get_close_matches(
+                        key, CONTACT_INFO_KEYS, n=1, cutoff=0.8
+                    )
+                    renames[key] = matches[0] if matches else None
+            target = renames[key]
+            if target is None:
+                counts["keys.unknown"] += 1
+                continue
+            if target != key:
+                counts["keys.renamed"] += 1
+            if not _is_empty(value):
+                columns[target][index] = value
+    return columns, counts
+
+
+def _validate_emails(column, counts):
+    for index, value in enumerate(column):
+        if value is None:
+            continue
+        repaired = str(value).strip().lower()
+        if not _EMAIL_PATTERN.fullmatch(repaired):
+            counts["email.invalid"] += 1
+            repaired = None
+        elif repaired != value:
+            counts["email.repaired"] += 1
+        column[index] = repaired
+
+
+def _validate_phones(column, counts):
+    for index, value in enumerate(column):
+        if value is None:
+            continue
+        repaired = _PHONE_PUNCTUATION.sub("", str(value))
+        if repaired.startswith("00"):
+            repaired = "+" + repaired[2:]
+        if not _E164_PATTERN.fullmatch(repaired):
+            counts["phone.invalid"] += 1
+            repaired = None
+        elif repaired != value:
+            counts["phone.repaired"] += 1
+        column[index] = repaired
+
+
+def _validate_hashes(key, column, counts):
+    for index, value in enumerate(column):
+        if _is_empty(value):
+            column[index] = None
+            continue
+        repaired = str(value).strip().lower()
+        if not _SHA256_HEX_PATTERN.fullmatch(repaired):
+            counts[f"{key}.invalid_hash"] += 1
+            repaired = None
+        elif repaired != value:
+            counts[f"{key}.repaired_hash"] += 1
+        column[index] = repaired
+
+
+def detect_prehashed_keys(records, sample_size=1000):
+    """Detects which hashable columns already hold SHA-256 hashes.
+
+    A column is considered pre-hashed when every non-empty value in the first
+    sample_size records is a 64-character hex string. A column in which most,
+    but not all, values are hashes is ambiguous: hashing it would hash its
+    hashes a second time, and passing it through would upload raw values. It
+    is reported instead of guessed, so that the caller declares the
+    pre-hashed keys explicitly.
+
+    Args:
+        records: A list of raw record dicts.
+        sample_size: The number of records to inspect.
+
+    Returns:
+        A frozenset of the pre-hashed keys among HASHED_KEYS.
+
+    Raises:
+        ValueError: If most, but not all, of a column's values are hashes.
+    """
+    sample = records[:sample_size]
+    prehashed_keys = set()
+    for key in HASHED_KEYS:
+        values = [
+            str(record[key]).strip().lower()
+            for record in sample
+            if not _is_empty(record.get(key))
+        ]
+        num_hashes = sum(
+            1 for value in values if _SHA256_HEX_PATTERN.fullmatch(value)
+        )
+        if values and num_hashes == len(values):
+            prehashed_keys.add(key)
+        elif num_hashes * 2 > len(values):
+            raise ValueError(
+                f"{num_hashes} of {len(values)} sampled '{key}' values are "
+                f"SHA-256 hashes, but {len(values) - num_hashes} are not. "
+                "Declare the pre-hashed keys explicitly."
+            )
+    return frozenset(prehashed_keys)
+
+
+def validate_prehashed_columns(records, prehashed_keys):
+    """Checks that pre-hashed columns hold lowercase SHA-256 hex strings.
+
+    Unlike validate_records, the other columns are only stripped of empty
+    values. Uppercase hashes are lowercased, and other values are removed
+    from their record.
+
+    Args:
+        records: A list of record dicts, modified in place.
+        prehashed_keys: Keys whose values are already SHA-256 hashed.
+
+    Returns:
+        A tuple of the list of records that still have at least one
+        identifier and a collections.Counter of the values affected.
+    """
+    counts = collections.Counter()
+    for key in prehashed_keys:
+        column = [record.get(key) for record in records]
+        _validate_hashes(key, column, counts)
+        for record, value in zip(records, column):
+            if value is None:
+                record.pop(key, None)
+            else:
+                record[key] = value
+
+    valid_records = []
+    for record in records:
+        for key in [key for key, value in record.items() if _is_empty(value)]:
+            del record[key]
+        if "email" in record or "phone" in record or "last_name" in record:
+            valid_records.append(record)
+        else:
+            counts["rows.rejected"] += 1
+    return valid_records, counts
+
+
+def _validate_addresses(columns, counts):
+    country_codes = columns["country_code"]
+    postal_codes = columns["postal_code"]
+    for index, country_code in enumerate(country_codes):
+        if country_code is None:
+            continue
+        repaired = str(country_code).strip().upper()
+        if repaired not in _ISO_COUNTRY_CODES:
+            counts["country_code.invalid"] += 1
+            repaired = None
+        elif repaired != country_code:
+            counts["country_code.repaired"] += 1
+        country_codes[index] = repaired
+
+    for index, postal_code in enumerate(postal_codes):
+        if postal_code is None:
+            continue
+        repaired = str(postal_code).strip().upper()
+        pattern = _POSTAL_CODE_PATTERNS.get(
+            country_codes[index], _GENERIC_POSTAL_CODE_PATTERN
+        )
+        if not pattern.fullmatch(repaired):
+            counts["postal_code.invalid"] += 1
+            repaired = None
+        elif repaired != postal_code:
+            counts["postal_code.repaired"] += 1
+        postal_codes[index] = repaired
+
+    # A mailing address is only usable with all four elements, so an address
+    # missing any of them is removed as a whole.
+    for index in range(len(country_codes)):
+        values = [columns[key][index] for key in _ADDRESS_KEYS]
+        if any(values) and not all(values):
+            counts["address.incomplete"] += 1
+            for key in _ADDRESS_KEYS:
+                columns[key][index] = None
+
+
+def validate_records(records, prehashed_keys=()):
+    """Validates and repairs contact-info records.
+
+    Args:
+        records: A list of raw record dicts.
+        prehashed_keys: Keys among HASHED_KEYS whose values are already
+            SHA-256 hashed. These are only checked to be lowercase hex.
+
+    Returns:
+        A tuple of the list of valid, repaired records and a
+        collections.Counter of the number of values affected by each rule,
+        keyed by names such as "email.invalid" or "phone.repaired".
+    """
+    columns, counts = _columns(records)
+    for key in prehashed_keys:
+        _validate_hashes(key, columns[key], counts)
+    if "email" not in prehashed_keys:
+        _validate_emails(columns["email"], counts)
+    if "phone" not in prehashed_keys:
+        _validate_phones(columns["phone"], counts)
+    _validate_addresses(columns, counts)
+
+    valid_records = []
+    for index in range(len(records)):
+        record = {
+            key: columns[key][index]
+            for key in CONTACT_INFO_KEYS
+            if columns[key][index] is not None
+        }
+        if "email" in record or "phone" in record or "last_name" in record:
+            valid_records.append(record)
+        else:
+            counts["rows.rejected"] += 1
+    return valid_records, counts
+
+
+def format_counts(counts):
+    """Formats per-rule counts as a single line."""
+    if not counts:
+        return "Validation found no problems."
+    return "Validation results: " + ", ".join(
+        f"{rule}={count}" for rule, count in sorted(counts.items())
+    )
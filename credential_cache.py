@@ -0,0 +1,306 @@
+"""Shares secrets and OAuth access tokens between processes.
+
+Every BigQueryToGoogleAdsCustomerMatchTask in demo2.py fetches its client
+secret, refresh token and developer token from Secret Manager, and every
+process then exchanges the refresh token for its own access token. With many
+parallel tasks, the same secrets are fetched and the same token is refreshed
+hundreds of times per run.
+
+CredentialCache keeps fetched secrets and access tokens in a cache directory
+readable only by the current user, by default under $XDG_CACHE_HOME (or
+~/.cache) so that the plaintext entries never land in a checkout. Entries carry an expiry time, and an entry
+is only fetched or refreshed by one process at a time under an exclusive file
+lock; the others wait and then read the result. Access tokens are refreshed
+shortly before they expire.
+
+Secrets come from a secret source. SecretManagerSource reads Google Cloud
+Secret Manager, and LocalSecretSource reads a JSON file, which stands in for
+Secret Manager in tests and local runs.
+"""
+
+import contextlib
+import datetime
+import fcntl
+import hashlib
+import json
+import os
+import time
+
+import google.auth.transport.requests
+import google.oauth2.credentials
+from google.ads.googleads.client import GoogleAdsClient
+
+
+_CACHE_DIR_NAME = "google-ads-credentials"
+_DEFAULT_SECRET_TTL_SECONDS = 60 * 60
+# Access tokens are refreshed this long before they expire, so that a token
+# read from the cache is still valid for the requests that use it.
+_TOKEN_EXPIRY_MARGIN_SECONDS = 5 * 60
+_TOKEN_URI = "https://oauth2.googleapis.com/token"
+_LOCAL_SECRETS_PATH_ENV = "LOCAL_SECRETS_PATH"
+
+
+class SecretManagerSource:
+    """Reads secrets from Google Cloud Secret Manager."""
+
+    def __init__(self):
+        # Imported here, since the library is only needed for this source.
+        from google.cloud import secretmanager
+
+        self._client = secretmanager.SecretManagerServiceClient()
+
+    def get(self, secret_id):
+        """Returns the value of a secret version.
+
+        Args:
+            secret_id: The resource name of the secret version, for example
+                "projects/1/secrets/name/versions/latest".
+        """
+        response = self._client.access_secret_version(name=secret_id)
+        return response.payload.data.decode()
+
+
+class LocalSecretSource:
+    """Reads secrets from a JSON file mapping secret IDs to values."""
+
+    def __init__(self, path):
+        """Initializes the source.
+
+        Args:
+            path: The path of the JSON file.
+        """
+        self.path = path
+
+    def get(self, secret_id):
+        """Returns the value of a secret.
+
+        Raises:
+            KeyError: If the file has no such secret.
+        """
+        with open(self.path) as f:
+            return json.load(f)[secret_id]
+
+
+def default_secret_source():
+    """Returns a LocalSecretSource if LOCAL_SECRETS_PATH is set.
+
+    Otherwise returns a SecretManagerSource.
+    """
+    path = os.environ.get(_LOCAL_SECRETS_PATH_ENV)
+    if path:
+        return LocalSecretSource(path)
+    return SecretManagerSource()
+
+
+def default_cache_dir():
+    """Returns the per-user cache directory for credentials.
+
+    This is google-ads-credentials under $XDG_CACHE_HOME, or under ~/.cache
+    if the variable is not set.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, _CACHE_DIR_NAME)
+
+
+def _cache_key(*parts):
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class CredentialCache:
+    """A file-locked cache of secrets and access tokens."""
+
+    def __init__(
+        self,
+        cache_dir=None,
+        secret_source=None,
+        secret_ttl_seconds=_DEFAULT_SECRET_TTL_SECONDS,
+    ):
+        """Initializes the cache.
+
+        Args:
+            cache_dir: The directory the cache entries are kept in. Defaults
+                to default_cache_dir(). The directory and the files in it are
+                made readable only by the current user, also if they already
+                existed.
+            secret_source: An object with a get(secret_id) method. If None,
+                default_secret_source is used on the first fetch.
+            secret_ttl_seconds: How long fetched secrets are reused.
+        """
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.secret_ttl_seconds = secret_ttl_seconds
+        self._secret_source = secret_source
+        self._entries = {}
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        # makedirs does not change the mode of an existing directory.
+        os.chmod(self.cache_dir, 0o700)
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.chmod(os.path.join(self.cache_dir, name), 0o600)
+            except FileNotFoundError:
+                # Another process replaced a temporary file meanwhile.
+                pass
+
+    @contextlib.contextmanager
+    def _locked(self, key):
+        fd = os.open(
+            os.path.join(self.cache_dir, f"{key}.lock"),
+            os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+            0o600,
+        )
+        with os.fdopen(fd, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read(self, key, margin_seconds=0):
+        """Returns a cached value that is still valid, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            try:
+                with open(os.path.join(self.cache_dir, f"{key}.json")) as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            self._entries[key] = entry
+        if entry["expires_at"] - margin_seconds <= time.time():
+            return None
+        return entry["value"]
+
+    def _write(self, key, value, expires_at):
+        entry = {"value": value, "expires_at": expires_at}
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        # Writes to a temporary file first so readers never see a partial
+        # entry.
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        # The mode only applies if the file is created, so a leftover
+        # temporary file is fixed here.
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, path)
+        self._entries[key] = entry
+
+    def _get_or_fetch(self, key, fetch, margin_seconds=0):
+        """Returns a valid cached value, fetching it under the lock if needed.
+
+        Args:
+            key: The cache key.
+            fetch: A function returning a tuple of the value and the Unix time
+                at which it expires.
+            margin_seconds: How long before its expiry a value is fetched
+                again.
+        """
+        value = self._read(key, margin_seconds)
+        if value is not None:
+            return value
+        with self._locked(key):
+            # Another process may have fetched the value while this one
+            # waited for the lock.
+            self._entries.pop(key, None)
+            value = self._read(key, margin_seconds)
+            if value is None:
+                value, expires_at = fetch()
+                self._write(key, value, expires_at)
+        return value
+
+    def get_secret(self, secret_id):
+        """Returns a secret, fetching it at most once per TTL.
+
+        Args:
+            secret_id: The ID of the secret in the secret source.
+        """
+        def fetch():
+            if self._secret_source is None:
+                self._secret_source = default_secret_source()
+            return (
+                self._secret_source.get(secret_id),
+                time.time() + self.secret_ttl_seconds,
+            )
+
+        return self._get_or_fetch(_cache_key("secret", secret_id), fetch)
+
+    def get_access_token(self, client_id, client_secret, refresh_token):
+        """Returns an access token shared by every process using the cache.
+
+        The token is only refreshed once it is about to expire, and then by a
+        single process.
+
+        Args:
+            client_id: The OAuth client ID.
+            client_secret: The OAuth client secret.
+            refresh_token: The OAuth refresh token.
+
+        Returns:
+            A tuple of the access token and its expiry as a naive UTC
+            datetime, as used by google.oauth2.credentials.Credentials.
+        """
+        def fetch():
+            credentials = google.oauth2.credentials.Credentials(
+                None,
+                refresh_token=refresh_token,
+                client_id=client_id,
+                client_secret=client_secret,
+                token_uri=_TOKEN_URI,
+            )
+            credentials.refresh(google.auth.transport.requests.Request())
+            expires_at = credentials.expiry.replace(
+                tzinfo=datetime.timezone.utc
+            ).timestamp()
+            return credentials.token, expires_at
+
+        key = _cache_key("token", client_id, refresh_token)
+        token = self._get_or_fetch(key, fetch, _TOKEN_EXPIRY_MARGIN_SECONDS)
+        expiry = datetime.datetime.fromtimestamp(
+            self._entries[key]["expires_at"], datetime.timezone.utc
+        ).replace(tzinfo=None)
+        return token, expiry
+
+    def get_credentials(self, client_id, client_secret, refresh_token):
+        """Returns OAuth credentials holding the shared access token.
+
+        The credentials can still refresh themselves if the process outlives
+        the token.
+        """
+        token, expiry = self.get_access_token(
+            client_id, client_secret, refresh_token
+        )
+        return google.oauth2.credentials.Credentials(
+            token,
+            refresh_token=refresh_token,
+            client_id=client_id,
+            client_secret=client_secret,
+            token_uri=_TOKEN_URI,
+            expiry=expiry,
+        )
+
+
+def load_client(config, cache, version="v14", client_class=GoogleAdsClient):
+    """Creates a GoogleAdsClient that uses the shared access token.
+
+    Args:
+        config: A dict with the keys "client_id", "client_secret",
+            "refresh_token", "developer_token" and optionally
+            "login_customer_id" and "use_proto_plus", as in google-ads.yaml.
+        cache: A CredentialCache.
+        version: The API version of the client.
+        client_class: GoogleAdsClient or a subclass of it to create.
+
+    Returns:
+        An instance of client_class.
+    """
+    credentials = cache.get_credentials(
+        config["client_id"], config["client_secret"], config["refresh_token"]
+    )
+    return client_class(
+        credentials,
+        config["developer_token"],
+        login_customer_id=config.get("login_customer_id"),
+        use_proto_plus=str(config.get("use_proto_plus", True)).lower()
+        == "true",
+        version=version,
+    )
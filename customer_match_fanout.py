@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+"""Uploads one audience to many Customer Match user lists with one hash pass.
+
+The same source records often feed several user lists, possibly owned by
+different customers. Instead of reading, normalizing and hashing the records
+once per list, the records are transformed once, the operations of each
+request are encoded once, and every encoded batch is then streamed into one
+OfflineUserDataJob per target list concurrently. Only the small request header
+holding the job resource name differs between the jobs.
+
+Each job has a bounded queue of encoded batches, so at most a few batches are
+held in memory at a time and the transform pauses when the slowest job falls
+behind. A job whose requests fail stops uploading without holding up the
+others.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+
+import preencoded_requests
+from add_customer_match_user_list import get_raw_records
+from async_customer_match import AsyncCustomerMatchClient
+from sharded_transform import transform_records_sharded
+
+
+_MAX_OPERATIONS_PER_REQUEST = 10000
+_DEFAULT_MAX_BUFFERED_BATCHES = 4
+
+
+def parse_target(value):
+    """Parses a "customer_id:user_list_id" command line target.
+
+    Args:
+        value: The target, for example "1234567890:987654".
+
+    Returns:
+        A tuple of the customer ID and the user list resource name.
+
+    Raises:
+        argparse.ArgumentTypeError: If the target is malformed.
+    """
+    customer_id, separator, user_list_id = value.partition(":")
+    if not separator or not customer_id or not user_list_id:
+        raise argparse.ArgumentTypeError(
+            f"Target '{value}' is not in the form customer_id:user_list_id."
+        )
+    return (
+        customer_id,
+        f"customers/{customer_id}/userLists/{user_list_id}",
+    )
+
+
+async def _upload_batches(
+    async_client, resource_name, header, queue, enable_partial_failure
+):
+    """Sends the batches of one job until the end of the queue.
+
+    Any exception stops the uploads of this job, but the queue is still
+    drained so that the producer never waits on it.
+
+    Returns:
+        A tuple of the number of requests sent and the exception that
+        stopped the job, or None.
+    """
+    requests = 0
+    error = None
+    while True:
+        encoded_operations = await queue.get()
+        if encoded_operations is None:
+            return requests, error
+        if error is not None:
+            continue
+        try:
+            response = await async_client.send_encoded_request(
+                resource_name, header + encoded_operations
+            )
+            requests += 1
+            if enable_partial_failure and response.partial_failure_error.code:
+                print(
+                    f"Job '{resource_name}' reported a partial failure: "
+                    f"{response.partial_failure_error.message}"
+                )
+        except Exception as ex:
+            # Not only API errors: a consumer that stopped reading would
+            # block the producer on this job's full queue.
+            error = ex
+
+
+async def fan_out_upload(
+    async_client,
+    targets,
+    serialized_operations,
+    run_job=False,
+    max_operations_per_request=_MAX_OPERATIONS_PER_REQUEST,
+    max_buffered_batches=_DEFAULT_MAX_BUFFERED_BATCHES,
+    enable_partial_failure=True,
+):
+    """Streams the same operations into one job per target user list.
+
+    Args:
+        async_client: An AsyncCustomerMatchClient.
+        targets: A list of (customer_id, user_list_resource_name) tuples.
+        serialized_operations: An iterable of serialized
+            OfflineUserDataJobOperation messages, for example from
+            sharded_transform.transform_records_sharded. It is consumed once,
+            in a worker thread, so it may block.
+        run_job: If true, runs every job that received all its operations and
+            waits for them to complete.
+        max_operations_per_request: The maximum number of operations in each
+            request.
+        max_buffered_batches: The maximum number of encoded batches waiting
+            to be sent per job.
+        enable_partial_failure: The value of enable_partial_failure on each
+            request.
+
+    Returns:
+        A dict mapping each target to a dict with the keys "resource_name",
+        "requests", "status" and "error". The status is the final job status
+        name, "PENDING" if the job was not run, or None if it failed.
+    """
+    results = {
+        target: {
+            "resource_name": None,
+            "requests": 0,
+            "status": None,
+            "error": None,
+        }
+        for target in targets
+    }
+
+    created = await asyncio.gather(
+        *(
+            async_client.create_job(customer_id, user_list_resource_name)
+            for customer_id, user_list_resource_name in targets
+        ),
+        return_exceptions=True,
+    )
+    jobs = []
+    for target, resource_name in zip(targets, created):
+        if isinstance(resource_name, Exception):
+            results[target]["error"] = resource_name
+            continue
+        print(
+            "Created an offline user data job with resource name: "
+            f"'{resource_name}'."
+        )
+        results[target]["resource_name"] = resource_name
+        jobs.append((target, resource_name))
+
+    queues = [asyncio.Queue(max_buffered_batches) for _ in jobs]
+    uploads = [
+        asyncio.create_task(
+            _upload_batches(
+                async_client,
+                resource_name,
+                preencoded_requests.encode_request_header(
+                    resource_name, enable_partial_failure
+                ),
+                queue,
+                enable_partial_failure,
+            )
+        )
+        for (_, resource_name), queue in zip(jobs, queues)
+    ]
+
+    # The transform and the encoding run in a worker thread, one batch at a
+    # time, so the event loop keeps sending while the next batch is built.
+    loop = asyncio.get_running_loop()
+    batches = preencoded_requests.iter_encoded_operation_batches(
+        serialized_operations, max_operations_per_request
+    )
+    try:
+        while True:
+            encoded_operations = await loop.run_in_executor(
+                None, next, batches, None
+            )
+            if encoded_operations is None:
+                break
+            for queue in queues:
+                await queue.put(encoded_operations)
+    finally:
+        for queue in queues:
+            await queue.put(None)
+
+    for (target, _), (requests, error) in zip(
+        jobs, await asyncio.gather(*uploads)
+    ):
+        results[target]["requests"] = requests
+        results[target]["error"] = error
+
+    completed = [
+        (target, resource_name)
+        for target, resource_name in jobs
+        if results[target]["error"] is None
+    ]
+    if not run_job:
+        for target, _ in completed:
+            results[target]["status"] = "PENDING"
+        return results
+
+    async def run_and_wait(customer_id, resource_name):
+        await async_client.run_job(resource_name)
+        return await async_client.wait_for_completion(
+            customer_id, resource_name
+        )
+
+    outcomes = await asyncio.gather(
+        *(
+            run_and_wait(target[0], resource_name)
+            for target, resource_name in completed
+        ),
+        return_exceptions=True,
+    )
+    for (target, _), outcome in zip(completed, outcomes):
+        if isinstance(outcome, Exception):
+            results[target]["error"] = outcome
+        else:
+            results[target]["status"] = outcome[0]
+    return results
+
+
+async def main(client, targets, processes, run_job):
+    """Uploads the example records to several user lists concurrently.
+
+    Args:
+        client: The Google Ads client. Its login customer ID must have access
+            to every target customer.
+        targets: A list of (customer_id, user_list_resource_name) tuples.
+        processes: The number of worker processes used to build the
+            operations.
+        run_job: If true, runs the jobs and waits for them to complete.
+    """
+    serialized_operations = transform_records_sharded(
+        get_raw_records(), processes
+    )
+    async with AsyncCustomerMatchClient(client) as async_client:
+        results = await fan_out_upload(
+            async_client, targets, serialized_operations, run_job
+        )
+
+    for (customer_id, user_list_resource_name), result in results.items():
+        if result["error"] is not None:
+            print(
+                f"Upload to user list '{user_list_resource_name}' failed: "
+                f"{result['error']}"
+            )
+        else:
+            print(
+                f"Sent {result['requests']} requests to offline user data job "
+                f"'{result['resource_name']}', which has status: "
+                f"{result['status']}"
+            )
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Hashes users once and adds them to several Customer Match user "
+            "lists, possibly of different customers, concurrently."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-t",
+        "--targets",
+        type=parse_target,
+        nargs="+",
+        required=True,
+        help=(
+            "The user lists to add users to, each as "
+            "customer_id:user_list_id."
+        ),
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        required=False,
+        help=(
+            "The number of worker processes used to normalize, hash and "
+            "serialize the operations. Defaults to the number of CPUs."
+        ),
+    )
+    parser.add_argument(
+        "-r",
+        "--run_job",
+        action="store_true",
+        help="If set, runs the jobs and waits for them to complete.",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(
+            main(
+                googleads_client,
+                list(dict.fromkeys(args.targets)),
+                args.processes,
+                args.run_job,
+            )
+        )
+    except GoogleAdsException as ex:
+        print(
+            f"Request with ID '{ex.request_id}' failed with status "
+            f"'{ex.error.code().name}' and includes the following errors:"
+        )
+        for error in ex.failure.errors:
+            print(f"\tError with message '{error.message}'.")
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
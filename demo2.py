@@ -1,8 +1,18 @@
 import hashlib
-from typing import Dict
+from typing import Dict, Iterable, Optional
 
 from google.ads.googleads.client import GoogleAdsClient
 
+import contact_validation
+from credential_cache import CredentialCache, load_client
+from identifier_hashing import normalize_and_hash
+
+
+# Shared by every task in this process, and through its cache directory by
+# every other worker, so each secret is fetched once per TTL and the refresh
+# token is exchanged once per access token lifetime.
+_CREDENTIAL_CACHE = CredentialCache()
+
 
 class BigQueryToGoogleAdsCustomerMatchTask:
     def __init__(
@@ -11,19 +21,31 @@ class BigQueryToGoogleAdsCustomerMatchTask:
             customer_id: str,
             user_list_id: str,
             query: str,
+            prehashed_keys: Optional[Iterable[str]] = (
+                contact_validation.HASHED_KEYS
+            ),
             **kwargs,
     ):
         self.customer_id = customer_id
         self.user_list_id = user_list_id
         self.query = query
+        # The columns the query returns already hashed, by default all of
+        # HASHED_KEYS since the export hashes them. None detects them from the
+        # records, which raises if a column is only partly hashed.
+        self.prehashed_keys = prehashed_keys
 
         super(BigQueryToGoogleAdsCustomerMatchTask, self).__init__(
             project=project,
             query=self.query,
         )
 
-        serialized = self.get_credential()
-        self.client = GoogleAdsApiClient.load_from_storage("./google-ads.yaml")
+        # GoogleAdsApiClient is a GoogleAdsClient, so it can be created
+        # around the shared access token.
+        self.client = load_client(
+            self.get_credential(),
+            _CREDENTIAL_CACHE,
+            client_class=GoogleAdsApiClient,
+        )
 
 
     @staticmethod
@@ -46,9 +68,11 @@ class BigQueryToGoogleAdsCustomerMatchTask:
         return {
             "client_id": client_id,
             "use_proto_plus": "False",
-            "client_secret": get_gcp_secret(client_secret_id),
-            "refresh_token": get_gcp_secret(refresh_token_id),
-            "developer_token": get_gcp_secret(developer_token_id),
+            "client_secret": _CREDENTIAL_CACHE.get_secret(client_secret_id),
+            "refresh_token": _CREDENTIAL_CACHE.get_secret(refresh_token_id),
+            "developer_token": _CREDENTIAL_CACHE.get_secret(
+                developer_token_id
+            ),
             "login_customer_id": login_customer_id,
         }
 
@@ -91,8 +115,27 @@ class BigQueryToGoogleAdsCustomerMatchTask:
         Transform raw records to google-ads api operations.
         The record is contact info type including "email", "phone",
         "first_name", "last_name", "country_code", and "postal_code".
+        Columns in prehashed_keys must hold lowercase SHA-256 hex strings and
+        are passed through; the other columns are normalized and hashed.
+        Empty values, including NaN, are dropped first.
         """
         self.logger.info("Transform records to contact info operations.")
+        prehashed_keys = self.prehashed_keys
+        if prehashed_keys is None:
+            prehashed_keys = contact_validation.detect_prehashed_keys(
+                records_from_bq
+            )
+        prehashed_keys = frozenset(prehashed_keys)
+        records_from_bq, counts = contact_validation.validate_prehashed_columns(
+            records_from_bq, prehashed_keys
+        )
+        self.logger.info(contact_validation.format_counts(counts))
+
+        def hashed(record, key, remove_all_whitespace):
+            if key in prehashed_keys:
+                return record[key]
+            return normalize_and_hash(record[key], remove_all_whitespace)
+
         operations = []
         # Iterates over the raw input list and creates a UserData object for each
         # record.
@@ -102,7 +145,7 @@ class BigQueryToGoogleAdsCustomerMatchTask:
 
             if "email" in record:
                 user_identifier = self.client.get_type("UserIdentifier")
-                user_identifier.hashed_email = record["email"]
+                user_identifier.hashed_email = hashed(record, "email", True)
                 # Adds the hashed email identifier to the UserData object's list.
                 user_data.user_identifiers.append(user_identifier)
 
@@ -110,7 +153,9 @@ class BigQueryToGoogleAdsCustomerMatchTask:
             # UserIdentifier for it.
             if "phone" in record:
                 user_identifier = self.client.get_type("UserIdentifier")
-                user_identifier.hashed_phone_number = record["phone"]
+                user_identifier.hashed_phone_number = hashed(
+                    record, "phone", True
+                )
                 # Adds the hashed phone number identifier to the UserData object's
                 # list.
                 user_data.user_identifiers.append(user_identifier)
@@ -133,7 +178,12 @@ class BigQueryToGoogleAdsCustomerMatchTask:
                 else:
                     user_identifier = self.client.get_type("UserIdentifier")
                     address_info = user_identifier.address_info
-                    address_info.hashed_last_name = record["last_name"]
+                    address_info.hashed_first_name = hashed(
+                        record, "first_name", False
+                    )
+                    address_info.hashed_last_name = hashed(
+                        record, "last_name", False
+                    )
                     address_info.country_code = record["country_code"]
                     address_info.postal_code = record["postal_code"]
                     user_data.user_identifiers.append(user_identifier)
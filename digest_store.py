@@ -0,0 +1,195 @@
+"""Compact storage for SHA-256 hashed identifiers.
+
+A hashed identifier held as a 64-character hex str costs over 100 bytes once
+Python object overhead is included. The classes in this module keep raw 32-byte
+digests back to back in a single bytearray instead, so large dedup indexes and
+sync states cost little more than 32 bytes per identifier:
+
+* DigestArray is an append-only, ordered sequence of digests.
+* DigestSet is an open-addressing hash set of digests.
+
+Both can be written to and read from files holding the concatenated digests.
+"""
+
+DIGEST_SIZE = 32
+
+_EMPTY_SLOT = bytes(DIGEST_SIZE)
+_MAX_LOAD_FACTOR = 0.7
+
+
+def _check_digest(digest):
+    if len(digest) != DIGEST_SIZE:
+        raise ValueError(
+            f"Expected a {DIGEST_SIZE}-byte digest, got {len(digest)} bytes."
+        )
+
+
+class DigestArray:
+    """An ordered sequence of 32-byte digests stored contiguously."""
+
+    def __init__(self, data=b""):
+        """Initializes the array.
+
+        Args:
+            data: Concatenated digests to start with.
+        """
+        if len(data) % DIGEST_SIZE:
+            raise ValueError(
+                f"The data length must be a multiple of {DIGEST_SIZE}."
+            )
+        self._data = bytearray(data)
+
+    def __len__(self):
+        return len(self._data) // DIGEST_SIZE
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("DigestArray index out of range")
+        offset = index * DIGEST_SIZE
+        return bytes(self._data[offset:offset + DIGEST_SIZE])
+
+    def __iter__(self):
+        view = memoryview(self._data)
+        for offset in range(0, len(self._data), DIGEST_SIZE):
+            yield bytes(view[offset:offset + DIGEST_SIZE])
+
+    def append(self, digest):
+        """Appends a digest.
+
+        Args:
+            digest: A 32-byte digest.
+        """
+        _check_digest(digest)
+        self._data += digest
+
+    def extend(self, digests):
+        """Appends several digests.
+
+        Args:
+            digests: An iterable of 32-byte digests.
+        """
+        for digest in digests:
+            self.append(digest)
+
+    def hex(self, index):
+        """Returns the digest at index as a lowercase hex string."""
+        return self[index].hex()
+
+    def save(self, path):
+        """Writes the concatenated digests to a file."""
+        with open(path, "wb") as f:
+            f.write(self._data)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a file written by save."""
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+
+class DigestSet:
+    """A hash set of 32-byte digests backed by a single bytearray.
+
+    SHA-256 digests are uniformly distributed, so the first eight bytes are used
+    directly as the hash and the table is probed linearly. The all-zero digest
+    marks an empty slot and is tracked separately.
+    """
+
+    def __init__(self, capacity=1024):
+        """Initializes the set.
+
+        Args:
+            capacity: The number of digests the set can hold before growing.
+        """
+        slots = 8
+        while slots * _MAX_LOAD_FACTOR < capacity:
+            slots *= 2
+        self._allocate(slots)
+        self._size = 0
+        self._has_empty_digest = False
+
+    def _allocate(self, slots):
+        self._slots = slots
+        self._mask = slots - 1
+        self._table = bytearray(slots * DIGEST_SIZE)
+
+    def _find(self, digest):
+        """Returns the offset of the digest or of the empty slot it maps to."""
+        table = self._table
+        index = int.from_bytes(digest[:8], "little") & self._mask
+        while True:
+            offset = index * DIGEST_SIZE
+            stored = table[offset:offset + DIGEST_SIZE]
+            if stored == digest or stored == _EMPTY_SLOT:
+                return offset
+            index = (index + 1) & self._mask
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, digest):
+        if digest == _EMPTY_SLOT:
+            return self._has_empty_digest
+        offset = self._find(digest)
+        return self._table[offset:offset + DIGEST_SIZE] == digest
+
+    def __iter__(self):
+        if self._has_empty_digest:
+            yield _EMPTY_SLOT
+        view = memoryview(self._table)
+        for offset in range(0, len(self._table), DIGEST_SIZE):
+            digest = bytes(view[offset:offset + DIGEST_SIZE])
+            if digest != _EMPTY_SLOT:
+                yield digest
+
+    def add(self, digest):
+        """Adds a digest.
+
+        Args:
+            digest: A 32-byte digest.
+
+        Returns:
+            True if the digest was not in the set before, otherwise False.
+        """
+        _check_digest(digest)
+        if digest == _EMPTY_SLOT:
+            is_new = not self._has_empty_digest
+            self._has_empty_digest = True
+            self._size += is_new
+            return is_new
+
+        offset = self._find(digest)
+        if self._table[offset:offset + DIGEST_SIZE] == digest:
+            return False
+        self._table[offset:offset + DIGEST_SIZE] = digest
+        self._size += 1
+        if self._size > self._slots * _MAX_LOAD_FACTOR:
+            self._grow()
+        return True
+
+    def _grow(self):
+        old_table = self._table
+        self._allocate(self._slots * 2)
+        view = memoryview(old_table)
+        for offset in range(0, len(old_table), DIGEST_SIZE):
+            digest = view[offset:offset + DIGEST_SIZE]
+            if digest != _EMPTY_SLOT:
+                new_offset = self._find(digest)
+                self._table[new_offset:new_offset + DIGEST_SIZE] = digest
+
+    def save(self, path):
+        """Writes the digests in the set to a file, concatenated."""
+        with open(path, "wb") as f:
+            for digest in self:
+                f.write(digest)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a file written by save or DigestArray.save."""
+        digests = DigestArray.load(path)
+        digest_set = cls(len(digests))
+        for digest in digests:
+            digest_set.add(digest)
+        return digest_set
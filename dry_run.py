@@ -0,0 +1,181 @@
+"""Rehearses uploads and mutations without changing any account.
+
+add_customer_match_user_list.py and add_campaigns.py accept --dry_run MODE.
+The run reads, validates, hashes, builds and encodes everything at full
+speed, and then either:
+
+* validate_only: sends every request with validate_only set, so the API
+  checks the requests and measures their latency without applying them.
+* offline: skips the network entirely, and each request is assumed to take
+  a fixed latency.
+
+Either way the run ends with a DryRunReport of the operations, requests and
+bytes it would send and a projected duration, which can be compared between
+runs to plan capacity and catch regressions. validate_only requests are not
+applied, so their measured latency is a lower bound for real requests.
+"""
+
+import time
+
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    AddOfflineUserDataJobOperationsResponse,
+)
+
+
+MODES = ("validate_only", "offline")
+# The latency assumed for each request in offline mode.
+_DEFAULT_REQUEST_LATENCY_SECONDS = 1.0
+
+_RESPONSE_PB = AddOfflineUserDataJobOperationsResponse.pb()
+
+
+def message_size(message):
+    """Returns the serialized size of a protobuf or proto-plus message.
+
+    Already serialized messages, such as pre-encoded requests, are bytes.
+    """
+    if isinstance(message, bytes):
+        return len(message)
+    if hasattr(message, "ByteSize"):
+        return message.ByteSize()
+    return type(message).pb(message).ByteSize()
+
+
+class DryRunReport:
+    """Counts what a dry run would send and projects its duration."""
+
+    def __init__(
+        self,
+        mode,
+        request_latency_seconds=_DEFAULT_REQUEST_LATENCY_SECONDS,
+    ):
+        """Initializes the report and starts its clock.
+
+        Args:
+            mode: One of MODES.
+            request_latency_seconds: The latency assumed for each request in
+                offline mode. In validate_only mode the measured latency is
+                used instead.
+
+        Raises:
+            ValueError: If the mode is unknown.
+        """
+        if mode not in MODES:
+            raise ValueError(
+                f"Unknown dry run mode '{mode}', expected one of {MODES}."
+            )
+        self.mode = mode
+        self.request_latency_seconds = request_latency_seconds
+        self.num_operations = 0
+        self.num_requests = 0
+        self.request_bytes = 0
+        self.max_request_bytes = 0
+        self.network_seconds = 0.0
+        self._start = time.perf_counter()
+
+    def count_operations(self, operations):
+        """Passes operations through, counting them."""
+        for operation in operations:
+            self.num_operations += 1
+            yield operation
+
+    def record_request(self, request_bytes, network_seconds=0.0):
+        """Records one request.
+
+        Args:
+            request_bytes: The serialized size of the request.
+            network_seconds: How long sending the request took, if it was
+                sent.
+        """
+        self.num_requests += 1
+        self.request_bytes += request_bytes
+        self.max_request_bytes = max(self.max_request_bytes, request_bytes)
+        self.network_seconds += network_seconds
+
+    def summary(self):
+        """Returns the counts and the projected duration as a dict.
+
+        The projected duration is the time spent outside the network, plus
+        the latency of every request sent one after the other.
+        """
+        elapsed_seconds = time.perf_counter() - self._start
+        if self.mode == "validate_only" and self.num_requests:
+            request_latency_seconds = self.network_seconds / self.num_requests
+        else:
+            request_latency_seconds = self.request_latency_seconds
+        pipeline_seconds = elapsed_seconds - self.network_seconds
+        return {
+            "mode": self.mode,
+            "num_operations": self.num_operations,
+            "num_requests": self.num_requests,
+            "request_bytes": self.request_bytes,
+            "max_request_bytes": self.max_request_bytes,
+            "pipeline_seconds": pipeline_seconds,
+            "request_latency_seconds": request_latency_seconds,
+            "projected_seconds": (
+                pipeline_seconds + self.num_requests * request_latency_seconds
+            ),
+        }
+
+    def format(self):
+        """Returns the summary as printable lines."""
+        summary = self.summary()
+        return [
+            f"Dry run ({summary['mode']}): {summary['num_operations']} "
+            f"operations in {summary['num_requests']} requests, "
+            f"{summary['request_bytes'] / 2 ** 20:.1f} MiB in total, "
+            f"{summary['max_request_bytes'] / 2 ** 20:.2f} MiB at most per "
+            "request.",
+            f"The pipeline took {summary['pipeline_seconds']:.2f} seconds. "
+            f"At {summary['request_latency_seconds']:.3f} seconds per "
+            f"request, the run would take {summary['projected_seconds']:.1f} "
+            "seconds.",
+        ]
+
+
+class DryRunSender:
+    """Stands in for a preencoded_requests.EncodedRequestSender.
+
+    Every request is recorded in a DryRunReport. With a sender, the requests
+    are sent through it and timed, so they should be encoded with
+    validate_only set. Without one, nothing is sent and an empty response is
+    returned.
+    """
+
+    def __init__(self, report, sender=None):
+        """Initializes the sender.
+
+        Args:
+            report: A DryRunReport.
+            sender: An EncodedRequestSender, or None to skip the network.
+        """
+        self.report = report
+        self._sender = sender
+
+    def send(self, resource_name, payload):
+        """Records, and if there is a sender sends, one encoded request."""
+        if self._sender is None:
+            self.report.record_request(len(payload))
+            return _RESPONSE_PB()
+        start = time.perf_counter()
+        response = self._sender.send(resource_name, payload)
+        self.report.record_request(
+            len(payload), time.perf_counter() - start
+        )
+        return response
+
+
+def add_dry_run_argument(parser):
+    """Adds the --dry_run argument to an entry point's parser."""
+    parser.add_argument(
+        "--dry_run",
+        type=str,
+        choices=MODES,
+        required=False,
+        help=(
+            "If set, rehearses the run without changing the account: "
+            "validate_only sends every request with validate_only set, and "
+            "offline sends nothing. Reports the projected requests, bytes "
+            "and duration."
+        ),
+    )
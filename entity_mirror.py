@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+"""Keeps a local SQLite mirror of campaigns, budgets and user lists.
+
+The first sync downloads every entity. Later syncs only fetch what changed
+since the last sync watermark:
+
+* Campaigns are found through the change_status resource.
+* Campaign budgets are not tracked by change_status, so they are found through
+  change_event, which reports CAMPAIGN_BUDGET changes.
+* User lists are tracked by neither, and are small enough to be refreshed in
+  full on every sync.
+
+change_status only covers the last 90 days and change_event the last 30, so a
+mirror whose watermark is older than that falls back to a full sync.
+
+Listing tools can then answer their queries with indexed local lookups, such as
+get_campaigns, instead of streaming every campaign from the API.
+"""
+
+import argparse
+import datetime
+import sqlite3
+import sys
+import zoneinfo
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v14.enums.types.advertising_channel_type import AdvertisingChannelTypeEnum
+from google.ads.googleads.v14.enums.types.budget_delivery_method import BudgetDeliveryMethodEnum
+from google.ads.googleads.v14.enums.types.budget_status import BudgetStatusEnum
+from google.ads.googleads.v14.enums.types.campaign_status import CampaignStatusEnum
+from google.ads.googleads.v14.enums.types.customer_match_upload_key_type import CustomerMatchUploadKeyTypeEnum
+from google.ads.googleads.v14.enums.types.user_list_membership_status import UserListMembershipStatusEnum
+
+
+_DEFAULT_DATABASE_PATH = "./entity_mirror.sqlite"
+_DATE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_CHANGE_EVENT_MAX_AGE = datetime.timedelta(days=29)
+# Both change_status and change_event require a LIMIT of at most 10000.
+_CHANGE_LIMIT = 10000
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS campaign (
+        customer_id TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        name TEXT,
+        status TEXT,
+        advertising_channel_type TEXT,
+        campaign_budget TEXT,
+        start_date TEXT,
+        end_date TEXT,
+        removed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (customer_id, id)
+    );
+    CREATE INDEX IF NOT EXISTS campaign_name ON campaign (customer_id, name);
+    CREATE INDEX IF NOT EXISTS campaign_budget_name
+        ON campaign (customer_id, campaign_budget);
+
+    CREATE TABLE IF NOT EXISTS campaign_budget (
+        customer_id TEXT NOT NULL,
+        resource_name TEXT NOT NULL,
+        name TEXT,
+        amount_micros INTEGER,
+        delivery_method TEXT,
+        status TEXT,
+        PRIMARY KEY (customer_id, resource_name)
+    );
+
+    CREATE TABLE IF NOT EXISTS user_list (
+        customer_id TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        resource_name TEXT,
+        name TEXT,
+        membership_status TEXT,
+        upload_key_type TEXT,
+        size_for_display INTEGER,
+        size_for_search INTEGER,
+        PRIMARY KEY (customer_id, id)
+    );
+
+    CREATE TABLE IF NOT EXISTS sync_state (
+        customer_id TEXT PRIMARY KEY,
+        watermark TEXT NOT NULL
+    );
+"""
+
+_CAMPAIGN_FIELDS = """
+          campaign.id,
+          campaign.name,
+          campaign.status,
+          campaign.advertising_channel_type,
+          campaign.campaign_budget,
+          campaign.start_date,
+          campaign.end_date"""
+
+_CAMPAIGN_BUDGET_FIELDS = """
+          campaign_budget.resource_name,
+          campaign_budget.name,
+          campaign_budget.amount_micros,
+          campaign_budget.delivery_method,
+          campaign_budget.status"""
+
+_USER_LIST_QUERY = """
+        SELECT
+          user_list.id,
+          user_list.resource_name,
+          user_list.name,
+          user_list.membership_status,
+          user_list.crm_based_user_list.upload_key_type,
+          user_list.size_for_display,
+          user_list.size_for_search
+        FROM user_list"""
+
+
+def _quoted_list(values):
+    return ", ".join(f"'{value}'" for value in values)
+
+
+def _chunks(values, size):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class EntityMirror:
+    """A SQLite mirror of the campaigns, budgets and user lists of customers."""
+
+    def __init__(self, client, database_path=_DEFAULT_DATABASE_PATH):
+        """Opens or creates the mirror.
+
+        Args:
+            client: The Google Ads client.
+            database_path: The path of the SQLite database file.
+        """
+        self._client = client
+        self._googleads_service = client.get_service("GoogleAdsService")
+        self.connection = sqlite3.connect(database_path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+    def _search(self, customer_id, query):
+        stream = self._googleads_service.search_stream(
+            customer_id=customer_id, query=query
+        )
+        for batch in stream:
+            yield from batch.results
+
+    def get_watermark(self, customer_id):
+        """Returns the time of the last sync of a customer, or None."""
+        row = self.connection.execute(
+            "SELECT watermark FROM sync_state WHERE customer_id = ?",
+            (customer_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return datetime.datetime.strptime(row[0], _DATE_TIME_FORMAT)
+
+    def sync(self, customer_id, full=False):
+        """Brings the mirror of a customer up to date.
+
+        Args:
+            customer_id: The Google Ads customer ID.
+            full: If true, downloads every entity even if an incremental sync
+                is possible.
+
+        Returns:
+            A dict with the number of campaigns, budgets and user lists that
+            were fetched.
+        """
+        # The new watermark is taken before any query is issued, so that
+        # changes made during the sync are picked up by the next one. The
+        # change resources report times in the account time zone, which the
+        # API also uses to interpret the watermark, so no conversion is made.
+        new_watermark = self._account_now(customer_id)
+        watermark = None if full else self.get_watermark(customer_id)
+        if watermark and new_watermark - watermark > _CHANGE_EVENT_MAX_AGE:
+            watermark = None
+
+        with self.connection:
+            if watermark is None:
+                counts = {
+                    "campaigns": self._sync_campaigns(customer_id),
+                    "campaign_budgets": self._sync_campaign_budgets(
+                        customer_id
+                    ),
+                }
+            else:
+                counts = self._sync_changes(
+                    customer_id, watermark, new_watermark
+                )
+            counts["user_lists"] = self._sync_user_lists(customer_id)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?)",
+                (customer_id, new_watermark.strftime(_DATE_TIME_FORMAT)),
+            )
+        return counts
+
+    def _account_now(self, customer_id):
+        row = next(
+            self._search(
+                customer_id, "SELECT customer.time_zone FROM customer"
+            )
+        )
+        try:
+            time_zone = zoneinfo.ZoneInfo(row.customer.time_zone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            time_zone = None
+        return datetime.datetime.now(time_zone).replace(
+            tzinfo=None, microsecond=0
+        )
+
+    def _sync_changes(self, customer_id, watermark, until):
+        since = watermark.strftime(_DATE_TIME_FORMAT)
+        until = until.strftime(_DATE_TIME_FORMAT)
+        campaign_change_query = f"""
+            SELECT
+              change_status.campaign,
+              change_status.resource_type,
+              change_status.last_change_date_time
+            FROM change_status
+            WHERE change_status.last_change_date_time >= '{since}'
+              AND change_status.last_change_date_time <= '{until}'
+              AND change_status.resource_type = 'CAMPAIGN'
+            ORDER BY change_status.last_change_date_time
+            LIMIT {_CHANGE_LIMIT}"""
+        budget_change_query = f"""
+            SELECT
+              change_event.change_resource_name,
+              change_event.change_date_time
+            FROM change_event
+            WHERE change_event.change_date_time >= '{since}'
+              AND change_event.change_date_time <= '{until}'
+              AND change_event.change_resource_type = 'CAMPAIGN_BUDGET'
+            ORDER BY change_event.change_date_time
+            LIMIT {_CHANGE_LIMIT}"""
+        campaign_changes = list(
+            self._search(customer_id, campaign_change_query)
+        )
+        budget_changes = list(self._search(customer_id, budget_change_query))
+
+        # Hitting the LIMIT means some changes may be missing, in which case
+        # the entity is synced in full instead.
+        if len(campaign_changes) >= _CHANGE_LIMIT:
+            campaigns = self._sync_campaigns(customer_id)
+        else:
+            campaign_ids = {
+                row.change_status.campaign.split("/")[-1]
+                for row in campaign_changes
+            }
+            campaigns = 0
+            for chunk in _chunks(campaign_ids, 1000):
+                campaigns += self._sync_campaigns(
+                    customer_id, f"campaign.id IN ({', '.join(chunk)})"
+                )
+
+        if len(budget_changes) >= _CHANGE_LIMIT:
+            campaign_budgets = self._sync_campaign_budgets(customer_id)
+        else:
+            budget_resource_names = {
+                row.change_event.change_resource_name for row in budget_changes
+            }
+            campaign_budgets = 0
+            for chunk in _chunks(budget_resource_names, 1000):
+                campaign_budgets += self._sync_campaign_budgets(
+                    customer_id,
+                    "campaign_budget.resource_name IN "
+                    f"({_quoted_list(chunk)})",
+                )
+        return {"campaigns": campaigns, "campaign_budgets": campaign_budgets}
+
+    def _sync_campaigns(self, customer_id, condition=None):
+        query = f"SELECT {_CAMPAIGN_FIELDS} FROM campaign"
+        if condition:
+            query += f" WHERE {condition}"
+        else:
+            # A full sync replaces every row, so campaigns that no longer
+            # exist are dropped.
+            self.connection.execute(
+                "DELETE FROM campaign WHERE customer_id = ?", (customer_id,)
+            )
+        count = 0
+        for row in self._search(customer_id, query):
+            campaign = row.campaign
+            status = CampaignStatusEnum.CampaignStatus(campaign.status).name
+            self.connection.execute(
+                "INSERT OR REPLACE INTO campaign VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    customer_id,
+                    campaign.id,
+                    campaign.name,
+                    status,
+                    AdvertisingChannelTypeEnum.AdvertisingChannelType(
+                        campaign.advertising_channel_type
+                    ).name,
+                    campaign.campaign_budget,
+                    campaign.start_date,
+                    campaign.end_date,
+                    status == "REMOVED",
+                ),
+            )
+            count += 1
+        return count
+
+    def _sync_campaign_budgets(self, customer_id, condition=None):
+        query = f"SELECT {_CAMPAIGN_BUDGET_FIELDS} FROM campaign_budget"
+        if condition:
+            query += f" WHERE {condition}"
+        else:
+            self.connection.execute(
+                "DELETE FROM campaign_budget WHERE customer_id = ?",
+                (customer_id,),
+            )
+        count = 0
+        for row in self._search(customer_id, query):
+            budget = row.campaign_budget
+            self.connection.execute(
+                "INSERT OR REPLACE INTO campaign_budget VALUES "
+                "(?, ?, ?, ?, ?, ?)",
+                (
+                    customer_id,
+                    budget.resource_name,
+                    budget.name,
+                    budget.amount_micros,
+                    BudgetDeliveryMethodEnum.BudgetDeliveryMethod(
+                        budget.delivery_method
+                    ).name,
+                    BudgetStatusEnum.BudgetStatus(budget.status).name,
+                ),
+            )
+            count += 1
+        return count
+
+    def _sync_user_lists(self, customer_id):
+        self.connection.execute(
+            "DELETE FROM user_list WHERE customer_id = ?", (customer_id,)
+        )
+        count = 0
+        for row in self._search(customer_id, _USER_LIST_QUERY):
+            user_list = row.user_list
+            self.connection.execute(
+                "INSERT INTO user_list VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    customer_id,
+                    user_list.id,
+                    user_list.resource_name,
+                    user_list.name,
+                    UserListMembershipStatusEnum.UserListMembershipStatus(
+                        user_list.membership_status
+                    ).name,
+                    CustomerMatchUploadKeyTypeEnum.CustomerMatchUploadKeyType(
+                        user_list.crm_based_user_list.upload_key_type
+                    ).name,
+                    user_list.size_for_display,
+                    user_list.size_for_search,
+                ),
+            )
+            count += 1
+        return count
+
+    def get_campaigns(self, customer_id, include_removed=False):
+        """Returns the mirrored campaigns of a customer ordered by ID.
+
+        Args:
+            customer_id: The Google Ads customer ID.
+            include_removed: If true, removed campaigns are included.
+
+        Returns:
+            A list of (id, name, status, campaign_budget) tuples.
+        """
+        query = (
+            "SELECT id, name, status, campaign_budget FROM campaign "
+            "WHERE customer_id = ?"
+        )
+        if not include_removed:
+            query += " AND NOT removed"
+        return self.connection.execute(
+            query + " ORDER BY id", (customer_id,)
+        ).fetchall()
+
+    def find_campaigns_by_name(self, customer_id, name):
+        """Returns the IDs of the campaigns of a customer with a given name."""
+        return [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT id FROM campaign WHERE customer_id = ? AND name = ?",
+                (customer_id, name),
+            )
+        ]
+
+    def get_campaign_budget(self, customer_id, resource_name):
+        """Returns a mirrored budget as a tuple, or None.
+
+        The tuple holds the name, amount_micros, delivery_method and status.
+        """
+        return self.connection.execute(
+            "SELECT name, amount_micros, delivery_method, status "
+            "FROM campaign_budget WHERE customer_id = ? AND resource_name = ?",
+            (customer_id, resource_name),
+        ).fetchone()
+
+    def get_user_lists(self, customer_id):
+        """Returns the mirrored user lists of a customer ordered by ID."""
+        return self.connection.execute(
+            "SELECT id, resource_name, name, membership_status, "
+            "upload_key_type, size_for_display, size_for_search "
+            "FROM user_list WHERE customer_id = ? ORDER BY id",
+            (customer_id,),
+        ).fetchall()
+
+
+def main(client, customer_id, database_path, full):
+    mirror = EntityMirror(client, database_path)
+    try:
+        counts = mirror.sync(customer_id, full)
+        print(
+            f"Fetched {counts['campaigns']} campaigns, "
+            f"{counts['campaign_budgets']} campaign budgets and "
+            f"{counts['user_lists']} user lists."
+        )
+        for campaign_id, name, _, _ in mirror.get_campaigns(customer_id):
+            print(
+                f"Campaign with ID {campaign_id} and name "
+                f'"{name}" was found.'
+            )
+    finally:
+        mirror.close()
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Syncs the campaigns, budgets and user lists of specified "
+            "customer into a local SQLite mirror."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-c",
+        "--customer_id",
+        type=str,
+        required=True,
+        help="The Google Ads customer ID.",
+    )
+    parser.add_argument(
+        "--database_path",
+        type=str,
+        default=_DEFAULT_DATABASE_PATH,
+        help="The path of the SQLite database file.",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="If set, downloads every entity instead of only the changes.",
+    )
+    args = parser.parse_args()
+
+    try:
+        main(googleads_client, args.customer_id, args.database_path, args.full)
+    except GoogleAdsException as ex:
+        print(
+            f'Request with ID "{ex.request_id}" failed with status '
+            f'"{ex.error.code().name}" and includes the following errors:'
+        )
+        for error in ex.failure.errors:
+            print(f'\tError with message "{error.message}".')
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
@@ -0,0 +1,245 @@
+"""Drops duplicate users before their operations are uploaded.
+
+Each row is keyed by its hashed identifiers (email, phone number and mailing
+address), held as raw 32-byte SHA-256 digests. A row is dropped when every one
+of its identifiers has already been seen earlier in the same upload, so
+repeated emails and phone numbers, within a source or across joined sources,
+never leave the process.
+
+Two deduplicators are available:
+
+* ExactDeduplicator keeps every key in a compact DigestSet and never drops a
+  new row.
+* BloomDeduplicator keeps a fixed-size Bloom filter, so memory stays bounded
+  for very large lists at the cost of dropping a small, configurable fraction
+  of new rows as false positives.
+"""
+
+import hashlib
+import math
+
+from digest_store import DigestSet
+
+
+def _address_key(first_name, last_name, country_code, postal_code):
+    # The address elements are combined into a single digest so that every
+    # key has the same fixed size.
+    return hashlib.sha256(
+        b"\0".join(
+            (first_name, last_name, country_code.encode(), postal_code.encode())
+        )
+    ).digest()
+
+
+def identifier_keys(hashed_record):
+    """Returns the deduplication keys of a hashed record.
+
+    Args:
+        hashed_record: A dict as returned by
+            sharded_transform.hash_contact_info_record.
+
+    Returns:
+        A tuple of 32-byte digest keys, one per identifier.
+    """
+    keys = []
+    if "email" in hashed_record:
+        keys.append(hashed_record["email"])
+    if "phone" in hashed_record:
+        keys.append(hashed_record["phone"])
+    if "address" in hashed_record:
+        keys.append(_address_key(*hashed_record["address"]))
+    return tuple(keys)
+
+
+def operation_identifier_keys(operation):
+    """Returns the deduplication keys of an OfflineUserDataJobOperation.
+
+    Args:
+        operation: An OfflineUserDataJobOperation with a create UserData.
+
+    Returns:
+        A tuple of 32-byte digest keys, one per user identifier.
+    """
+    keys = []
+    for user_identifier in operation.create.user_identifiers:
+        if user_identifier.hashed_email:
+            keys.append(bytes.fromhex(user_identifier.hashed_email))
+        elif user_identifier.hashed_phone_number:
+            keys.append(bytes.fromhex(user_identifier.hashed_phone_number))
+        elif user_identifier.address_info.hashed_last_name:
+            address_info = user_identifier.address_info
+            keys.append(
+                _address_key(
+                    bytes.fromhex(address_info.hashed_first_name),
+                    bytes.fromhex(address_info.hashed_last_name),
+                    address_info.country_code,
+                    address_info.postal_code,
+                )
+            )
+    return tuple(keys)
+
+
+class ExactDeduplicator:
+    """Remembers every key in a DigestSet."""
+
+    def __init__(self, expected_items=1024):
+        """Initializes the deduplicator.
+
+        Args:
+            expected_items: The expected number of distinct keys, used to
+                presize the set.
+        """
+        self._seen = DigestSet(expected_items)
+
+    def add(self, key):
+        """Records a key.
+
+        Args:
+            key: The 32-byte digest key to record.
+
+        Returns:
+            True if the key was not seen before, otherwise False.
+        """
+        return self._seen.add(key)
+
+
+class BloomDeduplicator:
+    """Remembers keys in a Bloom filter of fixed size."""
+
+    def __init__(self, expected_items, false_positive_rate=0.001):
+        """Sizes the filter.
+
+        Args:
+            expected_items: The expected number of distinct keys.
+            false_positive_rate: The target probability that a new key is
+                reported as already seen once expected_items keys are stored.
+        """
+        expected_items = max(expected_items, 1)
+        self._num_bits = max(
+            8,
+            math.ceil(
+                -expected_items
+                * math.log(false_positive_rate)
+                / math.log(2) ** 2
+            ),
+        )
+        self._num_hashes = max(
+            1, round(self._num_bits / expected_items * math.log(2))
+        )
+        self._bits = bytearray((self._num_bits + 7) // 8)
+
+    def add(self, key):
+        """Records a key.
+
+        Args:
+            key: The 32-byte digest key to record.
+
+        Returns:
+            True if the key was not seen before, otherwise False. New keys
+            may be reported as seen with the configured false positive rate.
+        """
+        # Keys are SHA-256 digests and therefore uniformly distributed, so
+        # double hashing can take its two 64-bit values straight from the key.
+        first = int.from_bytes(key[:8], "little")
+        second = int.from_bytes(key[8:16], "little") | 1
+        is_new = False
+        for i in range(self._num_hashes):
+            position = (first + i * second) % self._num_bits
+            byte_index, mask = position >> 3, 1 << (position & 7)
+            if not self._bits[byte_index] & mask:
+                self._bits[byte_index] |= mask
+                is_new = True
+        return is_new
+
+
+def create_deduplicator(mode, expected_items=None, false_positive_rate=0.001):
+    """Creates a deduplicator.
+
+    Args:
+        mode: Either "exact" or "bloom".
+        expected_items: The expected number of distinct keys. Required for
+            the "bloom" mode.
+        false_positive_rate: The target false positive rate of the "bloom"
+            mode.
+
+    Returns:
+        An ExactDeduplicator or a BloomDeduplicator.
+
+    Raises:
+        ValueError: If the mode is unknown or expected_items is missing for
+            the "bloom" mode.
+    """
+    if mode == "exact":
+        return ExactDeduplicator(expected_items or 1024)
+    if mode == "bloom":
+        if not expected_items:
+            raise ValueError("expected_items is required for the bloom mode.")
+        return BloomDeduplicator(expected_items, false_positive_rate)
+    raise ValueError(f"Unknown deduplication mode: '{mode}'.")
+
+
+class DeduplicationStage:
+    """Filters out rows whose identifiers have all been seen before."""
+
+    def __init__(self, deduplicator):
+        """Initializes the stage.
+
+        Args:
+            deduplicator: An ExactDeduplicator or a BloomDeduplicator.
+        """
+        self._deduplicator = deduplicator
+        self.rows_seen = 0
+        self.rows_dropped = 0
+
+    def is_duplicate(self, keys):
+        """Records the keys of a row and checks whether the row is new.
+
+        Args:
+            keys: The identifier keys of the row.
+
+        Returns:
+            True if the row has no identifier that was not seen before.
+        """
+        self.rows_seen += 1
+        # Every key is recorded, so that a partially new row still marks all
+        # of its identifiers as seen.
+        new_keys = [key for key in keys if self._deduplicator.add(key)]
+        if new_keys:
+            return False
+        self.rows_dropped += 1
+        return True
+
+    def filter_operations(self, operations):
+        """Drops duplicate OfflineUserDataJobOperations.
+
+        Args:
+            operations: An iterable of OfflineUserDataJobOperations.
+
+        Yields:
+            The operations that are not duplicates.
+        """
+        for operation in operations:
+            if not self.is_duplicate(operation_identifier_keys(operation)):
+                yield operation
+
+    def filter_keyed(self, keyed_items):
+        """Drops duplicates from (keys, item) pairs.
+
+        Args:
+            keyed_items: An iterable of (keys, item) tuples, for example the
+                output of sharded_transform.transform_records_sharded with
+                with_keys set.
+
+        Yields:
+            The items that are not duplicates.
+        """
+        for keys, item in keyed_items:
+            if not self.is_duplicate(keys):
+                yield item
+
+    def summary(self):
+        """Returns a one-line description of the rows dropped so far."""
+        return (
+            f"Deduplication dropped {self.rows_dropped} of {self.rows_seen} "
+            "rows."
+        )
@@ -0,0 +1,52 @@
+"""Normalizes and hashes user identifiers for Customer Match.
+
+This module only depends on the standard library, so that the scripts and
+the worker modules that build operations can all import it without importing
+each other.
+"""
+
+import hashlib
+
+
+def normalize_and_hash(s, remove_all_whitespace):
+    """Normalizes and hashes a string with SHA-256.
+
+    Args:
+        s: The string to perform this operation on.
+        remove_all_whitespace: If true, removes leading, trailing, and
+            intermediate spaces from the string before hashing. If false, only
+            removes leading and trailing spaces from the string before hashing.
+
+    Returns:
+        A normalized (lowercase, remove whitespace) and SHA-256 hashed string.
+    """
+    return normalize_and_digest(s, remove_all_whitespace).hex()
+
+
+def normalize_and_digest(s, remove_all_whitespace):
+    """Normalizes and hashes a string with SHA-256, returning the raw digest.
+
+    The 32-byte digest takes less than half the memory of the hex string
+    returned by normalize_and_hash, so it is the form to keep in memory. Hex
+    should only be produced when the identifier is set on an operation.
+
+    Args:
+        s: The string to perform this operation on.
+        remove_all_whitespace: If true, removes leading, trailing, and
+            intermediate spaces from the string before hashing. If false, only
+            removes leading and trailing spaces from the string before hashing.
+
+    Returns:
+        The 32-byte SHA-256 digest of the normalized string.
+    """
+    # Normalizes by first converting all characters to lowercase, then trimming
+    # spaces.
+    if remove_all_whitespace:
+        # Removes leading, trailing, and intermediate whitespace.
+        s = "".join(s.split())
+    else:
+        # Removes only leading and trailing spaces.
+        s = s.strip().lower()
+
+    # Hashes the normalized string using the hashing algorithm.
+    return hashlib.sha256(s.encode()).digest()
@@ -24,6 +24,9 @@ import sys
 from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
 
+import profiling
+import rpc_tracing
+
 
 def main(client, customer_id):
     ga_service = client.get_service("GoogleAdsService")
@@ -73,10 +76,15 @@ if __name__ == "__main__":
         required=True,
         help="The Google Ads customer ID.",
     )
+    profiling.add_profile_argument(parser)
+    rpc_tracing.add_trace_argument(parser)
     args = parser.parse_args()
 
     try:
-        main(googleads_client, args.customer_id)
+        with rpc_tracing.trace_run(
+            googleads_client, args.trace
+        ) as client, profiling.profile_run(args.profile, "main"):
+            main(client, args.customer_id)
     except GoogleAdsException as ex:
         print(
             f'Request with ID "{ex.request_id}" failed with status '
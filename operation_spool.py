@@ -0,0 +1,262 @@
+"""Spools encoded Customer Match operations to disk for jobs larger than RAM.
+
+Operations are appended to a spool file as they are produced, already encoded
+as length-prefixed entries of the repeated operations field of an
+AddOfflineUserDataJobOperationsRequest (see preencoded_requests.py). The byte
+offset at which each request starts is kept in a small index file next to it.
+
+The uploader maps the spool file into memory and sends each request as a
+header followed by a slice of the file, so memory use stays at about one
+request however many operations the job has. The spool is kept after the
+upload, so a failed or interrupted upload can be replayed from any request
+without transforming the records again.
+"""
+
+import array
+import mmap
+import os
+import time
+
+import grpc
+from google.ads.googleads.errors import GoogleAdsException
+
+import preencoded_requests
+import retries
+
+
+# The suffix of the index file written next to a completed spool.
+INDEX_SUFFIX = ".idx"
+_MAX_OPERATIONS_PER_REQUEST = 10000
+_DEFAULT_MAX_ATTEMPTS = 3
+
+
+def _decode_varint(buffer, position):
+    """Returns the varint at position and the position after it."""
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class OperationSpoolWriter:
+    """Appends serialized operations to a spool file."""
+
+    def __init__(
+        self, path, max_operations_per_request=_MAX_OPERATIONS_PER_REQUEST
+    ):
+        """Initializes the writer, truncating any existing spool.
+
+        The index of an existing spool is removed first, so that it is never
+        paired with the new data if the writer does not complete.
+
+        Args:
+            path: The path of the spool file. The index is written to the
+                same path with an ".idx" suffix when the writer is closed.
+            max_operations_per_request: The maximum number of operations in
+                each request read back from the spool.
+        """
+        self.path = path
+        self.num_operations = 0
+        self._max_operations_per_request = max_operations_per_request
+        try:
+            os.remove(f"{path}{INDEX_SUFFIX}")
+        except FileNotFoundError:
+            pass
+        self._file = open(path, "wb")
+        self._offsets = array.array("Q", [0])
+        self._position = 0
+        self._operations_in_request = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self.abort()
+
+    def append(self, serialized_operation):
+        """Appends one serialized OfflineUserDataJobOperation."""
+        if self._operations_in_request == self._max_operations_per_request:
+            self._offsets.append(self._position)
+            self._operations_in_request = 0
+        entry = preencoded_requests.encode_operation_field(
+            serialized_operation
+        )
+        self._file.write(entry)
+        self._position += len(entry)
+        self._operations_in_request += 1
+        self.num_operations += 1
+
+    def extend(self, serialized_operations):
+        """Appends an iterable of serialized operations."""
+        for serialized_operation in serialized_operations:
+            self.append(serialized_operation)
+
+    def close(self):
+        """Flushes the spool and writes its index.
+
+        The index is written last, so a spool without an index was not
+        completed and is never read back.
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        if self.num_operations:
+            self._offsets.append(self._position)
+        temp_path = f"{self.path}{INDEX_SUFFIX}.tmp"
+        with open(temp_path, "wb") as f:
+            self._offsets.tofile(f)
+        os.replace(temp_path, f"{self.path}{INDEX_SUFFIX}")
+
+    def abort(self):
+        """Closes the spool without writing its index.
+
+        Used when producing the operations failed, so the partial spool is
+        never read back as a completed one.
+        """
+        self._file.close()
+
+
+class OperationSpool:
+    """Reads the requests of a completed spool file through a memory map."""
+
+    def __init__(self, path):
+        """Opens a spool written by OperationSpoolWriter.
+
+        Args:
+            path: The path of the spool file.
+        """
+        self.path = path
+        index_path = f"{path}{INDEX_SUFFIX}"
+        self._offsets = array.array("Q")
+        with open(index_path, "rb") as f:
+            self._offsets.fromfile(
+                f, os.path.getsize(index_path) // self._offsets.itemsize
+            )
+        self._file = open(path, "rb")
+        # Empty files cannot be memory-mapped.
+        self._mmap = None
+        if os.path.getsize(path):
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """Returns the number of requests in the spool."""
+        return max(len(self._offsets) - 1, 0)
+
+    def close(self):
+        """Closes the memory map and the spool file."""
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def encoded_operations(self, index):
+        """Returns the encoded operations of one request.
+
+        Args:
+            index: The index of the request, from 0 to len(self) - 1.
+
+        Returns:
+            The bytes of the operations field entries of the request.
+        """
+        return self._mmap[self._offsets[index]:self._offsets[index + 1]]
+
+    def iter_operations(self):
+        """Yields the serialized operations of the spool in order.
+
+        Each operation is read from the memory map on demand, so the spool
+        can be scanned without loading it.
+        """
+        if self._mmap is None:
+            return
+        position = 0
+        end = self._offsets[-1]
+        while position < end:
+            # Skips the field tag, then reads the length prefix.
+            _, position = _decode_varint(self._mmap, position)
+            size, position = _decode_varint(self._mmap, position)
+            yield self._mmap[position:position + size]
+            position += size
+
+    def iter_requests(
+        self,
+        resource_name,
+        start=0,
+        enable_partial_failure=True,
+        validate_only=False,
+    ):
+        """Encodes the requests of the spool for an offline user data job.
+
+        Args:
+            resource_name: The resource name of the offline user data job.
+            start: The index of the first request, used to resume an upload.
+            enable_partial_failure: The value of enable_partial_failure on
+                each request.
+            validate_only: The value of validate_only on each request.
+
+        Yields:
+            Tuples of the request index and the serialized
+            AddOfflineUserDataJobOperationsRequest.
+        """
+        header = preencoded_requests.encode_request_header(
+            resource_name, enable_partial_failure, validate_only
+        )
+        for index in range(start, len(self)):
+            yield index, header + self.encoded_operations(index)
+
+
+def upload_spool(
+    sender,
+    resource_name,
+    spool,
+    start=0,
+    max_attempts=_DEFAULT_MAX_ATTEMPTS,
+    enable_partial_failure=True,
+    validate_only=False,
+):
+    """Uploads the requests of a spool, retrying each on transient errors.
+
+    A retried request is read again from the spool. If a request still fails,
+    the upload can be resumed later by passing the index of that request as
+    start.
+
+    Args:
+        sender: A preencoded_requests.EncodedRequestSender.
+        resource_name: The resource name of the offline user data job.
+        spool: An OperationSpool.
+        start: The index of the first request to send.
+        max_attempts: The maximum number of attempts per request.
+        enable_partial_failure: The value of enable_partial_failure on each
+            request.
+        validate_only: The value of validate_only on each request.
+
+    Yields:
+        Tuples of the request index and its
+        AddOfflineUserDataJobOperationsResponse.
+    """
+    for index, payload in spool.iter_requests(
+        resource_name, start, enable_partial_failure, validate_only
+    ):
+        for attempt in range(1, max_attempts + 1):
+            try:
+                response = sender.send(resource_name, payload)
+                break
+            except (GoogleAdsException, grpc.RpcError) as ex:
+                if attempt == max_attempts or not retries.is_retryable(ex):
+                    raise
+                time.sleep(2 ** attempt)
+        yield index, response
@@ -0,0 +1,192 @@
+"""Assembles AddOfflineUserDataJobOperations requests from pre-encoded bytes.
+
+A protobuf repeated message field is encoded as one (tag, length, payload)
+record per element, and fields may appear in any order on the wire. A request
+can therefore be produced by encoding its scalar fields once and appending the
+already serialized OfflineUserDataJobOperation messages, without building,
+copying or re-encoding any message objects. The resulting payloads are sent on
+the service's own channel with an identity request serializer, so they are
+encoded exactly once end to end.
+"""
+
+import itertools
+import urllib.parse
+
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    AddOfflineUserDataJobOperationsRequest,
+    AddOfflineUserDataJobOperationsResponse,
+)
+
+
+_REQUEST_PB = AddOfflineUserDataJobOperationsRequest.pb()
+_RESPONSE_PB = AddOfflineUserDataJobOperationsResponse.pb()
+
+# The path the generated gRPC transport calls. The proto-plus type files
+# define no services, so it cannot be read from their descriptors.
+_METHOD_PATH = (
+    "/google.ads.googleads.v14.services.OfflineUserDataJobService/"
+    "AddOfflineUserDataJobOperations"
+)
+
+_MAX_OPERATIONS_PER_REQUEST = 10000
+
+
+def _encode_varint(value):
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+_OPERATIONS_FIELD_NUMBER = _REQUEST_PB.DESCRIPTOR.fields_by_name[
+    "operations"
+].number
+# Wire type 2 is used for length-delimited fields such as embedded messages.
+_OPERATIONS_TAG = _encode_varint(_OPERATIONS_FIELD_NUMBER << 3 | 2)
+
+
+def encode_operation_field(serialized_operation):
+    """Encodes a serialized operation as an element of request.operations.
+
+    Args:
+        serialized_operation: A serialized OfflineUserDataJobOperation.
+
+    Returns:
+        The bytes of the operations field entry, ready to be concatenated onto
+        an encoded request.
+    """
+    return b"".join(
+        (
+            _OPERATIONS_TAG,
+            _encode_varint(len(serialized_operation)),
+            serialized_operation,
+        )
+    )
+
+
+def encode_request_header(
+    resource_name, enable_partial_failure=True, validate_only=False
+):
+    """Encodes every field of the request except the operations.
+
+    Args:
+        resource_name: The resource name of the offline user data job.
+        enable_partial_failure: The value of enable_partial_failure.
+        validate_only: The value of validate_only.
+
+    Returns:
+        The encoded scalar fields of an AddOfflineUserDataJobOperationsRequest.
+    """
+    request = _REQUEST_PB()
+    request.resource_name = resource_name
+    request.enable_partial_failure = enable_partial_failure
+    request.validate_only = validate_only
+    return request.SerializeToString()
+
+
+def iter_encoded_operation_batches(
+    serialized_operations,
+    max_operations_per_request=_MAX_OPERATIONS_PER_REQUEST,
+):
+    """Encodes serialized operations as request.operations entries in batches.
+
+    The batches do not depend on the job, so they can be encoded once and
+    prefixed with the header of any number of jobs.
+
+    Args:
+        serialized_operations: An iterable of serialized
+            OfflineUserDataJobOperation messages.
+        max_operations_per_request: The maximum number of operations in each
+            batch.
+
+    Yields:
+        The encoded operations field entries of one request at a time.
+    """
+    iterator = iter(serialized_operations)
+    while True:
+        batch = list(itertools.islice(iterator, max_operations_per_request))
+        if not batch:
+            return
+        yield b"".join(map(encode_operation_field, batch))
+
+
+def iter_encoded_requests(
+    resource_name,
+    serialized_operations,
+    max_operations_per_request=_MAX_OPERATIONS_PER_REQUEST,
+    enable_partial_failure=True,
+    validate_only=False,
+):
+    """Encodes AddOfflineUserDataJobOperationsRequests from serialized ops.
+
+    Args:
+        resource_name: The resource name of the offline user data job.
+        serialized_operations: An iterable of serialized
+            OfflineUserDataJobOperation messages.
+        max_operations_per_request: The maximum number of operations in each
+            request.
+        enable_partial_failure: The value of enable_partial_failure on each
+            request.
+        validate_only: The value of validate_only on each request.
+
+    Yields:
+        Serialized AddOfflineUserDataJobOperationsRequest messages.
+    """
+    header = encode_request_header(
+        resource_name, enable_partial_failure, validate_only
+    )
+    for encoded_operations in iter_encoded_operation_batches(
+        serialized_operations, max_operations_per_request
+    ):
+        yield header + encoded_operations
+
+
+class EncodedRequestSender:
+    """Sends pre-encoded AddOfflineUserDataJobOperationsRequests.
+
+    The call goes through the channel of an OfflineUserDataJobService client
+    created by the Google Ads client, so the same credentials, metadata and
+    exception interceptors apply as for regular calls. If the client spreads
+    the service across several channels, as a transport_profiles
+    ProfiledClient does, requests are sent round-robin across them.
+    """
+
+    def __init__(self, client):
+        """Initializes the sender.
+
+        Args:
+            client: The Google Ads client.
+        """
+        service = client.get_service("OfflineUserDataJobService")
+        # A None request serializer makes gRPC send the payload bytes as is.
+        self._calls = itertools.cycle(
+            [
+                channel_service.transport.grpc_channel.unary_unary(
+                    _METHOD_PATH,
+                    request_serializer=None,
+                    response_deserializer=_RESPONSE_PB.FromString,
+                )
+                for channel_service in getattr(service, "services", [service])
+            ]
+        )
+
+    def send(self, resource_name, payload):
+        """Sends one encoded request.
+
+        Args:
+            resource_name: The resource name of the offline user data job the
+                payload was encoded for.
+            payload: A serialized AddOfflineUserDataJobOperationsRequest.
+
+        Returns:
+            The AddOfflineUserDataJobOperationsResponse.
+        """
+        # Mirrors the routing header the generated client attaches.
+        routing_header = urllib.parse.urlencode(
+            {"resource_name": resource_name}, safe="/"
+        )
+        return next(self._calls)(
+            payload, metadata=(("x-goog-request-params", routing_header),)
+        )
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""Opt-in CPU and memory profiling of the example scripts.
+
+Every entry point accepts --profile DIR. When it is set, the run is profiled
+stage by stage. The whole run is the "main" stage, and pipeline code marks its
+own stages with:
+
+    with profiling.stage("transform"):
+        ...
+
+stage is a no-op unless a profiled run is active, so it can stay in the code.
+For every stage, the run writes to DIR:
+
+* {run}.{stage}.prof, a cProfile dump that can be read with pstats or
+  snakeviz.
+* {run}.{stage}.tracemalloc, a tracemalloc snapshot taken when the stage ends,
+  which can be diffed against another run's with Snapshot.compare_to.
+* {run}.summary.json, the wall time, CPU time, call count and peak traced
+  memory of every stage.
+
+Nested stages are profiled separately: while an inner stage runs, the outer
+stage's profile is paused. Only the thread that started the run is profiled.
+
+Two summaries can be compared with:
+
+    python profiling.py old.summary.json new.summary.json
+"""
+
+import argparse
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+_active_run = None
+
+
+class _StageStats:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_memory_bytes = 0
+        self.memory_delta_bytes = 0
+
+
+class ProfiledRun:
+    """Collects per-stage profiles and memory statistics of one run."""
+
+    def __init__(self, output_dir, name):
+        """Initializes the run.
+
+        Args:
+            output_dir: The directory the profiles are written to.
+            name: The name of the entry point. The time the run starts is
+                appended to it, so runs never overwrite each other.
+        """
+        self.output_dir = output_dir
+        self.run_name = (
+            f"{name}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        )
+        self.stages = {}
+        self._stack = []
+        self._thread = threading.current_thread()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Profiles the enclosed code as the named stage."""
+        if threading.current_thread() is not self._thread:
+            yield
+            return
+        stats = self.stages.setdefault(name, _StageStats())
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None:
+            parent.profile.disable()
+            parent.peak_memory_bytes = max(
+                parent.peak_memory_bytes, tracemalloc.get_traced_memory()[1]
+            )
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        self._stack.append(stats)
+        stats.profile.enable()
+        try:
+            yield
+        finally:
+            stats.profile.disable()
+            self._stack.pop()
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            stats.calls += 1
+            stats.wall_seconds += time.perf_counter() - start_wall
+            stats.cpu_seconds += time.process_time() - start_cpu
+            stats.peak_memory_bytes = max(stats.peak_memory_bytes, peak_memory)
+            stats.memory_delta_bytes += current_memory - start_memory
+            tracemalloc.take_snapshot().dump(self._path(f"{name}.tracemalloc"))
+            if parent is not None:
+                # The peak was reset for this stage, so the parent's peak is
+                # at least as high as this stage's.
+                parent.peak_memory_bytes = max(
+                    parent.peak_memory_bytes, stats.peak_memory_bytes
+                )
+                tracemalloc.reset_peak()
+                parent.profile.enable()
+
+    def _path(self, suffix):
+        return os.path.join(self.output_dir, f"{self.run_name}.{suffix}")
+
+    def summary(self):
+        """Returns the statistics of every stage as a dict."""
+        return {
+            name: {
+                "calls": stats.calls,
+                "wall_seconds": stats.wall_seconds,
+                "cpu_seconds": stats.cpu_seconds,
+                "peak_memory_bytes": stats.peak_memory_bytes,
+                "memory_delta_bytes": stats.memory_delta_bytes,
+            }
+            for name, stats in self.stages.items()
+        }
+
+    def write(self):
+        """Writes the profiles of every stage and the summary.
+
+        Returns:
+            The path of the summary file.
+        """
+        for name, stats in self.stages.items():
+            stats.profile.dump_stats(self._path(f"{name}.prof"))
+        summary_path = self._path("summary.json")
+        with open(summary_path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return summary_path
+
+
+@contextlib.contextmanager
+def profile_run(output_dir, name):
+    """Profiles the enclosed code as the "main" stage of a run.
+
+    Args:
+        output_dir: The directory the profiles are written to, or None to run
+            without profiling.
+        name: The name of the entry point.
+    """
+    global _active_run
+    if not output_dir:
+        yield
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    _active_run = ProfiledRun(output_dir, name)
+    tracemalloc.start()
+    try:
+        with _active_run.stage("main"):
+            yield
+    finally:
+        tracemalloc.stop()
+        summary_path = _active_run.write()
+        _active_run = None
+        print(f"Wrote profiles to '{output_dir}', summary: '{summary_path}'.")
+
+
+def stage(name):
+    """Marks a pipeline stage of the active profiled run, if any."""
+    if _active_run is None:
+        return contextlib.nullcontext()
+    return _active_run.stage(name)
+
+
+def add_profile_argument(parser):
+    """Adds the --profile argument to an entry point's parser."""
+    parser.add_argument(
+        "--profile",
+        type=str,
+        metavar="DIR",
+        required=False,
+        help=(
+            "If set, writes cProfile dumps, tracemalloc snapshots and a "
+            "summary of every stage of the run to this directory."
+        ),
+    )
+
+
+def compare_summaries(old_summary, new_summary):
+    """Compares the stages of two runs.
+
+    Args:
+        old_summary: A dict as written to a summary file.
+        new_summary: A dict as written to a summary file.
+
+    Returns:
+        A list of lines, one per stage, with the change in wall time, CPU
+        time and peak memory.
+    """
+    lines = []
+    for name in sorted(set(old_summary) | set(new_summary)):
+        old = old_summary.get(name)
+        new = new_summary.get(name)
+        if old is None or new is None:
+            run = "new" if old is None else "old"
+            lines.append(f"Stage {name} only ran in the {run} run.")
+            continue
+        lines.append(
+            f"Stage {name}: wall {old['wall_seconds']:.3f}s -> "
+            f"{new['wall_seconds']:.3f}s, CPU {old['cpu_seconds']:.3f}s -> "
+            f"{new['cpu_seconds']:.3f}s, peak memory "
+            f"{old['peak_memory_bytes'] / 2 ** 20:.1f} MiB -> "
+            f"{new['peak_memory_bytes'] / 2 ** 20:.1f} MiB."
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compares the stage summaries of two profiled runs."
+    )
+    parser.add_argument(
+        "old_summary_path", type=str, help="The summary of the earlier run."
+    )
+    parser.add_argument(
+        "new_summary_path", type=str, help="The summary of the later run."
+    )
+    args = parser.parse_args()
+
+    with open(args.old_summary_path) as f:
+        old_summary = json.load(f)
+    with open(args.new_summary_path) as f:
+        new_summary = json.load(f)
+    for line in compare_summaries(old_summary, new_summary):
+        print(line)
@@ -0,0 +1,33 @@
+"""Classifies Google Ads API errors that are worth retrying.
+
+Shared by the modules that retry a request or a stream on their own, such as
+operation_spool.py and sharded_report.py.
+"""
+
+import grpc
+from google.ads.googleads.errors import GoogleAdsException
+
+
+RETRYABLE_STATUS_CODES = (
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.UNAVAILABLE,
+)
+
+
+def is_retryable(exception):
+    """Returns whether an exception is a transient API error.
+
+    Args:
+        exception: An exception raised by a service call.
+
+    Returns:
+        True if the exception is a GoogleAdsException or grpc.RpcError with
+        one of RETRYABLE_STATUS_CODES.
+    """
+    if isinstance(exception, GoogleAdsException):
+        return exception.error.code() in RETRYABLE_STATUS_CODES
+    if isinstance(exception, grpc.RpcError):
+        return exception.code() in RETRYABLE_STATUS_CODES
+    return False
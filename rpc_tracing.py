@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+"""Traces every gRPC call made through Google Ads service clients.
+
+RpcTracer provides a client interceptor that records the method, customer ID,
+request size, latency, status and request ID of every call. Latencies go into
+log-scale histograms per method and per customer, so slow methods and slow
+customers stand out, and p99 latencies can be compared before and after an
+SDK upgrade. Each call can also be appended as one JSON line to a span log.
+
+Pass the interceptor when creating services:
+
+    tracer = RpcTracer(span_log_path="spans.jsonl")
+    service = client.get_service(
+        "GoogleAdsService", interceptors=[tracer.interceptor]
+    )
+
+or wrap the client in a TracedClient so that every service it creates is
+traced. Entry points accept --trace, which does this for the whole run and
+prints the latency report at the end:
+
+    python get_campaigns.py -c 1234567890 --trace spans.jsonl
+"""
+
+import argparse
+import bisect
+import contextlib
+import json
+import re
+import sys
+import threading
+import time
+
+import grpc
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+
+import dry_run
+
+
+_REQUEST_ID_KEY = "request-id"
+_CUSTOMER_ID_PATTERN = re.compile(r"customers/(\d+)")
+# Bucket upper bounds in milliseconds, growing by 2 ** 0.25 (about 19%) from
+# 1 millisecond to about 18 minutes.
+_BUCKET_BOUNDS_MS = tuple(2 ** (i / 4) for i in range(81))
+
+
+class LatencyHistogram:
+    """A log-scale histogram of latencies in milliseconds."""
+
+    def __init__(self):
+        # The last bucket counts latencies above every bound.
+        self.counts = [0] * (len(_BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency_ms):
+        """Adds one latency."""
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS_MS, latency_ms)] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket holding a percentile.
+
+        Args:
+            percent: The percentile, from 0 to 100.
+
+        Returns:
+            The latency in milliseconds, within about 19% of the exact
+            value, or 0.0 if the histogram is empty.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if index == len(_BUCKET_BOUNDS_MS):
+                    return self.max_ms
+                return min(_BUCKET_BOUNDS_MS[index], self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        """Returns the count, mean, p50, p90, p99 and max as a dict."""
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_ms,
+        }
+
+
+def _customer_id(request):
+    customer_id = getattr(request, "customer_id", None)
+    if customer_id:
+        return str(customer_id)
+    resource_name = getattr(request, "resource_name", None)
+    if resource_name:
+        match = _CUSTOMER_ID_PATTERN.match(resource_name)
+        if match:
+            return match.group(1)
+    return ""
+
+
+def _request_id(metadata):
+    for key, value in metadata or ():
+        if key == _REQUEST_ID_KEY:
+            return value
+    return None
+
+
+def _trailing_metadata(call):
+    try:
+        return call.trailing_metadata()
+    except Exception:
+        return None
+
+
+class _TracedStream:
+    """Wraps a streaming response and records the call once it ends."""
+
+    def __init__(self, response, finish):
+        self._response = response
+        self._iterator = iter(response)
+        self._finish = finish
+        self._finished = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._end("OK", _request_id(_trailing_metadata(self._response)))
+            raise
+        except GoogleAdsException as ex:
+            self._end(ex.error.code().name, ex.request_id)
+            raise
+        except grpc.RpcError as ex:
+            self._end(ex.code().name, _request_id(_trailing_metadata(ex)))
+            raise
+
+    def _end(self, status, request_id):
+        if not self._finished:
+            self._finished = True
+            self._finish(status, request_id)
+
+
+class _TracingInterceptor(
+    grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor
+):
+    def __init__(self, tracer):
+        self._tracer = tracer
+
+    def _start(self, client_call_details, request):
+        method = client_call_details.method
+        customer_id = _customer_id(request)
+        request_bytes = dry_run.message_size(request)
+        start = time.perf_counter()
+
+        def finish(status, request_id):
+            self._tracer.record(
+                method,
+                customer_id,
+                request_bytes,
+                (time.perf_counter() - start) * 1000,
+                status,
+                request_id,
+            )
+
+        return finish
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        finish = self._start(client_call_details, request)
+        try:
+            response = continuation(client_call_details, request)
+        except GoogleAdsException as ex:
+            finish(ex.error.code().name, ex.request_id)
+            raise
+        except grpc.RpcError as ex:
+            finish(ex.code().name, _request_id(_trailing_metadata(ex)))
+            raise
+        finish("OK", _request_id(_trailing_metadata(response)))
+        return response
+
+    def intercept_unary_stream(
+        self, continuation, client_call_details, request
+    ):
+        finish = self._start(client_call_details, request)
+        try:
+            response = continuation(client_call_details, request)
+        except GoogleAdsException as ex:
+            finish(ex.error.code().name, ex.request_id)
+            raise
+        except grpc.RpcError as ex:
+            finish(ex.code().name, _request_id(_trailing_metadata(ex)))
+            raise
+        return _TracedStream(response, finish)
+
+
+class RpcTracer:
+    """Collects latency histograms and spans of gRPC calls."""
+
+    def __init__(self, span_log_path=None):
+        """Initializes the tracer.
+
+        Args:
+            span_log_path: If set, every call is appended to this file as a
+                JSON line.
+        """
+        self.interceptor = _TracingInterceptor(self)
+        self.by_method = {}
+        self.by_customer = {}
+        self._lock = threading.Lock()
+        self._span_log = open(span_log_path, "a") if span_log_path else None
+
+    def close(self):
+        """Closes the span log."""
+        if self._span_log is not None:
+            self._span_log.close()
+
+    def record(
+        self, method, customer_id, request_bytes, latency_ms, status, request_id
+    ):
+        """Records one call. Called by the interceptor."""
+        with self._lock:
+            for histograms, key in (
+                (self.by_method, method),
+                (self.by_customer, customer_id),
+            ):
+                if key not in histograms:
+                    histograms[key] = LatencyHistogram()
+                histograms[key].record(latency_ms)
+            if self._span_log is not None:
+                self._span_log.write(
+                    json.dumps(
+                        {
+                            "time": time.time(),
+                            "method": method,
+                            "customer_id": customer_id,
+                            "request_bytes": request_bytes,
+                            "latency_ms": round(latency_ms, 3),
+                            "status": status,
+                            "request_id": request_id,
+                        }
+                    )
+                    + "\n"
+                )
+                self._span_log.flush()
+
+    def report(self):
+        """Returns lines summarizing latencies by method and by customer."""
+        lines = []
+        with self._lock:
+            for title, histograms in (
+                ("Method", self.by_method),
+                ("Customer", self.by_customer),
+            ):
+                # Slowest first, by p99.
+                for key, histogram in sorted(
+                    histograms.items(),
+                    key=lambda item: item[1].percentile(99),
+                    reverse=True,
+                ):
+                    summary = histogram.summary()
+                    lines.append(
+                        f"{title} {key or '-'}: {summary['count']} calls, "
+                        f"mean {summary['mean_ms']:.1f} ms, "
+                        f"p50 {summary['p50_ms']:.1f} ms, "
+                        f"p90 {summary['p90_ms']:.1f} ms, "
+                        f"p99 {summary['p99_ms']:.1f} ms, "
+                        f"max {summary['max_ms']:.1f} ms."
+                    )
+        return lines
+
+
+class TracedClient:
+    """Wraps a GoogleAdsClient so that every service it creates is traced.
+
+    Every other attribute is taken from the wrapped client.
+    """
+
+    def __init__(self, client, tracer):
+        """Initializes the wrapper.
+
+        Args:
+            client: The Google Ads client.
+            tracer: An RpcTracer.
+        """
+        self._client = client
+        self.tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def get_service(self, name, version=None, interceptors=None):
+        """Returns a service client whose calls are traced.
+
+        Without a version, the wrapped client's default version is used.
+        """
+        kwargs = {} if version is None else {"version": version}
+        return self._client.get_service(
+            name,
+            interceptors=[self.tracer.interceptor] + list(interceptors or []),
+            **kwargs,
+        )
+
+
+@contextlib.contextmanager
+def trace_run(client, span_log_path):
+    """Traces every call made through a client in the enclosed code.
+
+    The latency report is printed when the code exits.
+
+    Args:
+        client: The Google Ads client.
+        span_log_path: None to run without tracing, an empty string to trace
+            without a span log, or the path of the span log.
+
+    Yields:
+        A TracedClient wrapping the client, or the client itself if
+        span_log_path is None.
+    """
+    if span_log_path is None:
+        yield client
+        return
+    tracer = RpcTracer(span_log_path or None)
+    try:
+        yield TracedClient(client, tracer)
+    finally:
+        for line in tracer.report():
+            print(line)
+        tracer.close()
+
+
+def add_trace_argument(parser):
+    """Adds the --trace argument to an entry point's parser."""
+    parser.add_argument(
+        "--trace",
+        type=str,
+        nargs="?",
+        const="",
+        metavar="SPAN_LOG",
+        required=False,
+        help=(
+            "If set, traces every gRPC call and prints the latency of every "
+            "method and customer at the end. If a path is given, every call "
+            "is also appended to it as a JSON line."
+        ),
+    )
+
+
+def main(client, customer_ids, span_log_path):
+    with trace_run(client, span_log_path or "") as traced_client:
+        googleads_service = traced_client.get_service("GoogleAdsService")
+        query = """
+            SELECT
+              campaign.id,
+              campaign.name
+            FROM campaign
+            ORDER BY campaign.id"""
+        for customer_id in customer_ids:
+            stream = googleads_service.search_stream(
+                customer_id=customer_id, query=query
+            )
+            rows = sum(len(batch.results) for batch in stream)
+            print(f"Found {rows} campaigns for customer {customer_id}.")
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Lists campaigns for specified customers and reports the latency "
+            "of every call."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-c",
+        "--customer_ids",
+        type=str,
+        nargs="+",
+        required=True,
+        help="The Google Ads customer IDs.",
+    )
+    parser.add_argument(
+        "--span_log_path",
+        type=str,
+        required=False,
+        help="The path of a file each call is appended to as a JSON line.",
+    )
+    args = parser.parse_args()
+
+    try:
+        main(googleads_client, args.customer_ids, args.span_log_path)
+    except GoogleAdsException as ex:
+        print(
+            f'Request with ID "{ex.request_id}" failed with status '
+            f'"{ex.error.code().name}" and includes the following errors:'
+        )
+        for error in ex.failure.errors:
+            print(f'\tError with message "{error.message}".')
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
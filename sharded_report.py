@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+"""Runs a large GAQL report as several parallel search_stream shards.
+
+The query is split by segments.date ranges or by campaign ID ranges. Each
+shard is streamed on its own thread, and a shard that fails with a transient
+error is retried on its own without re-running the others. The rows are
+merged back in the order of the query's ORDER BY clause, or in shard order if
+it has none, and the query's LIMIT applies to the whole report.
+"""
+
+import argparse
+import collections
+import datetime
+import heapq
+import itertools
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+
+import retries
+
+
+_DATE_FORMAT = "%Y-%m-%d"
+_DEFAULT_MAX_WORKERS = 4
+_DEFAULT_MAX_ATTEMPTS = 3
+# The clauses of a GAQL query, in the order they must appear.
+_CLAUSES = ("SELECT", "FROM", "WHERE", "ORDER BY", "LIMIT", "PARAMETERS")
+# String literals are single tokens, so keywords inside them are not matched.
+_TOKEN = re.compile(
+    r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|\w+|\s+|.""", re.DOTALL
+)
+
+
+def parse_query(query):
+    """Splits a GAQL query into its clauses.
+
+    Args:
+        query: A GAQL query.
+
+    Returns:
+        A dict mapping the keywords of the clauses present in the query, such
+        as "SELECT", "WHERE" and "ORDER BY", to their bodies.
+
+    Raises:
+        ValueError: If a clause is repeated or out of order.
+    """
+    clauses = {}
+    keyword = None
+    body = []
+    previous = None
+    tokens = _TOKEN.findall(query)
+    position = 0
+    while position < len(tokens):
+        token = tokens[position]
+        word = token.upper()
+        following = tokens[position + 1:position + 3]
+        if (
+            word == "ORDER"
+            and len(following) == 2
+            and following[0].isspace()
+            and following[1].upper() == "BY"
+        ):
+            word = "ORDER BY"
+        # Field names such as campaign.limit are not keywords.
+        if word in _CLAUSES and previous != ".":
+            if keyword is not None:
+                clauses[keyword] = "".join(body).strip()
+            if word in clauses or (
+                keyword is not None
+                and _CLAUSES.index(word) < _CLAUSES.index(keyword)
+            ):
+                raise ValueError(
+                    f"The {word} clause of the query is repeated or out of "
+                    "order."
+                )
+            keyword = word
+            body = []
+            position += 3 if word == "ORDER BY" else 1
+        else:
+            body.append(token)
+            position += 1
+        if not token.isspace():
+            previous = token
+    if keyword is not None:
+        clauses[keyword] = "".join(body).strip()
+    return clauses
+
+
+def format_query(clauses):
+    """Joins clauses as returned by parse_query back into a GAQL query."""
+    return " ".join(
+        f"{keyword} {clauses[keyword]}"
+        for keyword in _CLAUSES
+        if keyword in clauses
+    )
+
+
+def add_condition(query, condition):
+    """Adds a condition to the WHERE clause of a GAQL query.
+
+    Args:
+        query: A GAQL query.
+        condition: A GAQL condition, for example
+            "segments.date BETWEEN '2023-01-01' AND '2023-01-31'".
+
+    Returns:
+        The query with the condition ANDed into its WHERE clause.
+    """
+    clauses = parse_query(query)
+    where = clauses.get("WHERE")
+    clauses["WHERE"] = f"{where} AND {condition}" if where else condition
+    return format_query(clauses)
+
+
+def date_range_conditions(start_date, end_date, days_per_shard):
+    """Splits a date range into segments.date conditions.
+
+    Args:
+        start_date: The first date, as a datetime.date.
+        end_date: The last date, as a datetime.date, inclusive.
+        days_per_shard: The number of days covered by each shard.
+
+    Returns:
+        A list of GAQL conditions in date order.
+
+    Raises:
+        ValueError: If days_per_shard is not positive.
+    """
+    if days_per_shard < 1:
+        raise ValueError(
+            f"The number of days per shard must be positive, got "
+            f"{days_per_shard}."
+        )
+    conditions = []
+    shard_start = start_date
+    while shard_start <= end_date:
+        shard_end = min(
+            shard_start + datetime.timedelta(days=days_per_shard - 1),
+            end_date,
+        )
+        conditions.append(
+            "segments.date BETWEEN "
+            f"'{shard_start.strftime(_DATE_FORMAT)}' AND "
+            f"'{shard_end.strftime(_DATE_FORMAT)}'"
+        )
+        shard_start = shard_end + datetime.timedelta(days=1)
+    return conditions
+
+
+def campaign_id_range_conditions(campaign_ids, num_shards):
+    """Splits a set of campaign IDs into contiguous campaign.id ranges.
+
+    Args:
+        campaign_ids: An iterable of campaign IDs.
+        num_shards: The number of shards to split the IDs into.
+
+    Returns:
+        A list of GAQL conditions in campaign ID order.
+    """
+    campaign_ids = sorted(set(int(campaign_id) for campaign_id in campaign_ids))
+    if not campaign_ids:
+        return []
+    shard_size = -(-len(campaign_ids) // max(num_shards, 1))
+    conditions = []
+    for i in range(0, len(campaign_ids), shard_size):
+        shard = campaign_ids[i:i + shard_size]
+        conditions.append(
+            f"campaign.id >= {shard[0]} AND campaign.id <= {shard[-1]}"
+        )
+    return conditions
+
+
+def _field_value(row, field):
+    value = row
+    for name in field.split("."):
+        # Fields such as type are named type_ in the generated messages.
+        if not hasattr(value, name):
+            name = f"{name}_"
+        value = getattr(value, name)
+    return value
+
+
+class _OrderKey:
+    """Compares rows by the fields of an ORDER BY clause."""
+
+    __slots__ = ("values", "descending")
+
+    def __init__(self, values, descending):
+        self.values = values
+        self.descending = descending
+
+    def __lt__(self, other):
+        for value, other_value, descending in zip(
+            self.values, other.values, self.descending
+        ):
+            if value != other_value:
+                if descending:
+                    return value > other_value
+                return value < other_value
+        return False
+
+
+def _order_key(order_by):
+    """Returns a key function sorting rows like an ORDER BY clause body."""
+    fields = []
+    descending = []
+    for ordering in order_by.split(","):
+        field, *direction = ordering.split()
+        fields.append(field)
+        descending.append(bool(direction) and direction[0].upper() == "DESC")
+    return lambda row: _OrderKey(
+        [_field_value(row, field) for field in fields], descending
+    )
+
+
+def _rows_in_shard_order(submit, shard_queries, max_buffered):
+    pending = collections.deque()
+    try:
+        for shard_query in shard_queries:
+            pending.append(submit(shard_query))
+            if len(pending) >= max_buffered:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _run_shard(client, customer_id, query, max_attempts):
+    """Streams one shard, retrying it as a whole on transient errors."""
+    googleads_service = client.get_service("GoogleAdsService")
+    for attempt in range(1, max_attempts + 1):
+        try:
+            rows = []
+            stream = googleads_service.search_stream(
+                customer_id=customer_id, query=query
+            )
+            for batch in stream:
+                rows.extend(batch.results)
+            return rows
+        except (GoogleAdsException, grpc.RpcError) as ex:
+            if attempt == max_attempts or not retries.is_retryable(ex):
+                raise
+            time.sleep(2 ** attempt)
+
+
+def run_sharded_report(
+    client,
+    customer_id,
+    query,
+    shard_conditions,
+    max_workers=_DEFAULT_MAX_WORKERS,
+    max_attempts=_DEFAULT_MAX_ATTEMPTS,
+):
+    """Runs a report as parallel shards and merges their rows.
+
+    Without an ORDER BY clause, the rows are yielded shard by shard, and at
+    most max_workers * 2 shards are in flight or buffered at a time, so memory
+    is bounded by a few shards rather than the whole report. With one, every
+    shard is kept until the shards are merged in that order.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The Google Ads customer ID.
+        query: The GAQL query of the report.
+        shard_conditions: A list of GAQL conditions, one per shard, for
+            example from date_range_conditions. The conditions should not
+            overlap.
+        max_workers: The maximum number of concurrent streams.
+        max_attempts: The maximum number of attempts per shard.
+
+    Yields:
+        GoogleAdsRow messages, in the order of the query's ORDER BY clause,
+        or else shard by shard in the order of shard_conditions. Rows of
+        different shards that compare equal keep the shard order. The
+        query's LIMIT applies to the whole report.
+
+    Raises:
+        ValueError: If the query cannot be parsed, see parse_query.
+    """
+    clauses = parse_query(query)
+    limit = int(clauses["LIMIT"]) if "LIMIT" in clauses else None
+    # A LIMIT stays in every shard query, since with an ORDER BY the first
+    # rows of the report are among the first rows of the shards.
+    shard_queries = [
+        add_condition(query, condition) for condition in shard_conditions
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def submit(shard_query):
+            return executor.submit(
+                _run_shard, client, customer_id, shard_query, max_attempts
+            )
+
+        if "ORDER BY" in clauses:
+            futures = [submit(shard_query) for shard_query in shard_queries]
+            rows = heapq.merge(
+                *(future.result() for future in futures),
+                key=_order_key(clauses["ORDER BY"]),
+            )
+        else:
+            futures = []
+            rows = _rows_in_shard_order(submit, shard_queries, max_workers * 2)
+        try:
+            yield from itertools.islice(rows, limit)
+        finally:
+            rows.close()
+            for future in futures:
+                future.cancel()
+
+
+def main(client, customer_id, start_date, end_date, days_per_shard):
+    query = """
+        SELECT
+          campaign.id,
+          segments.date,
+          metrics.impressions,
+          metrics.clicks,
+          metrics.cost_micros
+        FROM campaign
+        ORDER BY campaign.id"""
+
+    conditions = date_range_conditions(start_date, end_date, days_per_shard)
+    for row in run_sharded_report(client, customer_id, query, conditions):
+        print(
+            f"Campaign with ID {row.campaign.id} on {row.segments.date} had "
+            f"{row.metrics.impressions} impressions, {row.metrics.clicks} "
+            f"clicks and cost {row.metrics.cost_micros} micros."
+        )
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Lists daily campaign metrics for specified customer, streaming "
+            "the date range as parallel shards."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-c",
+        "--customer_id",
+        type=str,
+        required=True,
+        help="The Google Ads customer ID.",
+    )
+    parser.add_argument(
+        "-s",
+        "--start_date",
+        type=datetime.date.fromisoformat,
+        required=True,
+        help="The first date of the report, in YYYY-MM-DD format.",
+    )
+    parser.add_argument(
+        "-e",
+        "--end_date",
+        type=datetime.date.fromisoformat,
+        required=True,
+        help="The last date of the report, in YYYY-MM-DD format.",
+    )
+    parser.add_argument(
+        "-d",
+        "--days_per_shard",
+        type=int,
+        default=7,
+        help="The number of days covered by each shard.",
+    )
+    args = parser.parse_args()
+
+    try:
+        main(
+            googleads_client,
+            args.customer_id,
+            args.start_date,
+            args.end_date,
+            args.days_per_shard,
+        )
+    except GoogleAdsException as ex:
+        print(
+            f'Request with ID "{ex.request_id}" failed with status '
+            f'"{ex.error.code().name}" and includes the following errors:'
+        )
+        for error in ex.failure.errors:
+            print(f'\tError with message "{error.message}".')
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
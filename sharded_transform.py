@@ -0,0 +1,189 @@
+"""Builds Customer Match contact-info operations across a process pool.
+
+Records are split into batches and each batch is normalized, hashed and turned
+into serialized OfflineUserDataJobOperation messages in a worker process. Only
+the compact serialized bytes travel back to the parent, which sends them as
+pre-encoded requests without parsing them again (see preencoded_requests.py).
+"""
+
+import collections
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    OfflineUserDataJobOperation,
+)
+
+from identifier_hashing import normalize_and_digest
+from identifier_dedup import identifier_keys
+
+
+# The raw protobuf class is used instead of the proto-plus wrapper, since
+# workers only need to build and serialize messages.
+_OPERATION_PB = OfflineUserDataJobOperation.pb()
+
+_DEFAULT_BATCH_SIZE = 5000
+_ADDRESS_KEYS = ("first_name", "last_name", "country_code", "postal_code")
+
+
+def _digest(record, key, remove_all_whitespace, prehashed_keys):
+    if key in prehashed_keys:
+        # Pre-hashed values skip normalization and hashing entirely.
+        return bytes.fromhex(record[key])
+    return normalize_and_digest(record[key], remove_all_whitespace)
+
+
+def hash_contact_info_record(record, prehashed_keys=frozenset()):
+    """Normalizes and hashes the identifiers of a single raw record.
+
+    Args:
+        record: A dict that may contain the keys "email", "phone",
+            "first_name", "last_name", "country_code", and "postal_code".
+        prehashed_keys: Keys whose values are already SHA-256 hashed, as
+            64-character lowercase hex strings, for example as checked by
+            contact_validation.validate_records. These pass straight through.
+
+    Returns:
+        A dict with any of the keys "email", "phone" and "address". Hashed
+        values are raw 32-byte SHA-256 digests. The address value is a tuple
+        of (first_name_digest, last_name_digest, country_code, postal_code)
+        and is only present when all four address elements are in the record.
+    """
+    hashed = {}
+    if record.get("email"):
+        hashed["email"] = _digest(record, "email", True, prehashed_keys)
+    if record.get("phone"):
+        hashed["phone"] = _digest(record, "phone", True, prehashed_keys)
+    if record.get("first_name") and all(
+        record.get(key) for key in _ADDRESS_KEYS
+    ):
+        hashed["address"] = (
+            _digest(record, "first_name", False, prehashed_keys),
+            _digest(record, "last_name", False, prehashed_keys),
+            record["country_code"],
+            record["postal_code"],
+        )
+    return hashed
+
+
+def build_contact_info_operation(hashed_record):
+    """Creates an OfflineUserDataJobOperation from a hashed record.
+
+    Args:
+        hashed_record: A dict as returned by hash_contact_info_record.
+
+    Returns:
+        A protobuf OfflineUserDataJobOperation, or None if the record has no
+        identifiers.
+    """
+    if not hashed_record:
+        return None
+
+    operation = _OPERATION_PB()
+    user_identifiers = operation.create.user_identifiers
+    # Each identifier goes into a SEPARATE UserIdentifier since the identifier
+    # attribute of UserIdentifier is a oneof. Digests are only converted to
+    # the hex strings the API expects here, at encode time.
+    if "email" in hashed_record:
+        user_identifiers.add().hashed_email = hashed_record["email"].hex()
+    if "phone" in hashed_record:
+        user_identifiers.add().hashed_phone_number = hashed_record[
+            "phone"
+        ].hex()
+    if "address" in hashed_record:
+        first_name, last_name, country_code, postal_code = hashed_record[
+            "address"
+        ]
+        address_info = user_identifiers.add().address_info
+        address_info.hashed_first_name = first_name.hex()
+        address_info.hashed_last_name = last_name.hex()
+        address_info.country_code = country_code
+        address_info.postal_code = postal_code
+    return operation
+
+
+def serialize_contact_info_records(
+    records, with_keys=False, prehashed_keys=frozenset()
+):
+    """Normalizes, hashes and serializes a batch of raw records.
+
+    This is the unit of work executed by each worker process.
+
+    Args:
+        records: A list of raw record dicts.
+        with_keys: If true, each serialized operation is paired with the
+            deduplication keys of its identifiers.
+        prehashed_keys: Keys whose values are already SHA-256 hashed.
+
+    Returns:
+        A list of serialized OfflineUserDataJobOperation messages, or of
+        (keys, serialized operation) tuples if with_keys is set. Records
+        without any identifiers are skipped.
+    """
+    serialized = []
+    for record in records:
+        hashed_record = hash_contact_info_record(record, prehashed_keys)
+        operation = build_contact_info_operation(hashed_record)
+        if operation is None:
+            continue
+        if with_keys:
+            serialized.append(
+                (identifier_keys(hashed_record), operation.SerializeToString())
+            )
+        else:
+            serialized.append(operation.SerializeToString())
+    return serialized
+
+
+def _batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def transform_records_sharded(
+    records,
+    processes=None,
+    batch_size=_DEFAULT_BATCH_SIZE,
+    with_keys=False,
+    prehashed_keys=frozenset(),
+):
+    """Serializes contact-info operations for records using a process pool.
+
+    Batches are submitted with a bounded window so that the input can be a
+    lazy iterable, and results are yielded in input order.
+
+    Args:
+        records: An iterable of raw record dicts.
+        processes: The number of worker processes. Defaults to the number of
+            CPUs.
+        batch_size: The number of records sent to a worker at a time.
+        with_keys: If true, yields (keys, serialized operation) tuples so that
+            the parent can deduplicate without parsing the operations.
+        prehashed_keys: Keys whose values are already SHA-256 hashed.
+
+    Yields:
+        Serialized OfflineUserDataJobOperation messages, or (keys, serialized
+        operation) tuples if with_keys is set.
+    """
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = collections.deque()
+        for batch in _batched(records, batch_size):
+            pending.append(
+                executor.submit(
+                    serialize_contact_info_records,
+                    batch,
+                    with_keys,
+                    prehashed_keys,
+                )
+            )
+            if len(pending) >= processes * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+"""Aggregates search_stream results per key while they stream.
+
+Reports are often pulled row by row only to be totalled per campaign or per
+customer. StreamingAggregator consumes the batches of a search_stream as they
+arrive and keeps, for every key, a row count, running sums of metric fields
+and the top K rows by one field. The rows themselves are dropped once they
+are counted, so memory grows with the number of keys rather than the number
+of rows:
+
+    aggregator = StreamingAggregator(
+        ["campaign.id"], ["metrics.clicks", "metrics.cost_micros"]
+    )
+    aggregator.consume(
+        googleads_service.search_stream(customer_id=customer_id, query=query)
+    )
+    for result in aggregator.results():
+        ...
+
+Fields are named by their path in GoogleAdsRow, as in the SELECT clause.
+"""
+
+import argparse
+import array
+import heapq
+import itertools
+import operator
+import sys
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+
+
+def _getter(field_paths):
+    """Returns a function reading the fields of a row as a tuple."""
+    if not field_paths:
+        return lambda row: ()
+    getter = operator.attrgetter(*field_paths)
+    if len(field_paths) == 1:
+        return lambda row: (getter(row),)
+    return getter
+
+
+class StreamingAggregator:
+    """Keeps running counts, sums and top K rows per key."""
+
+    def __init__(
+        self,
+        key_fields,
+        sum_fields,
+        top_k=0,
+        rank_field=None,
+        top_k_fields=(),
+    ):
+        """Initializes the aggregator.
+
+        Args:
+            key_fields: The paths of the fields rows are grouped by, for
+                example ["customer.id", "campaign.id"].
+            sum_fields: The paths of the numeric fields summed per key, for
+                example ["metrics.clicks", "metrics.cost_micros"].
+            top_k: The number of rows with the highest rank_field kept per
+                key, or 0 to keep none.
+            rank_field: The path of the field the top rows are ranked by.
+                Required if top_k is set.
+            top_k_fields: The paths of the fields kept for each top row, for
+                example ["segments.date"].
+
+        Raises:
+            ValueError: If top_k is set without a rank_field.
+        """
+        if top_k and not rank_field:
+            raise ValueError("A rank_field is required to keep top rows.")
+        self.key_fields = tuple(key_fields)
+        self.sum_fields = tuple(sum_fields)
+        self.top_k = top_k
+        self.rank_field = rank_field
+        self.top_k_fields = tuple(top_k_fields)
+        self.num_rows = 0
+        self._get_key = _getter(self.key_fields)
+        self._get_sums = _getter(self.sum_fields)
+        self._get_rank = operator.attrgetter(rank_field) if top_k else None
+        self._get_top_k_values = _getter(self.top_k_fields)
+        # Maps keys to their slot in the counts, sums and tops.
+        self._slots = {}
+        self._counts = array.array("q")
+        # One array per sum field. The type code is chosen from the first
+        # value, so integer metrics such as cost_micros are summed exactly.
+        self._sums = None
+        self._tops = []
+        # Breaks ties between top rows with equal ranks, so the row values
+        # are never compared.
+        self._sequence = itertools.count()
+
+    def _slot(self, key):
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = len(self._counts)
+            self._counts.append(0)
+            for sums in self._sums:
+                sums.append(0)
+            if self.top_k:
+                self._tops.append([])
+        return slot
+
+    def add_row(self, row):
+        """Adds one GoogleAdsRow."""
+        values = self._get_sums(row)
+        if self._sums is None:
+            self._sums = [
+                array.array("d" if isinstance(value, float) else "q")
+                for value in values
+            ]
+        slot = self._slot(self._get_key(row))
+        self._counts[slot] += 1
+        for sums, value in zip(self._sums, values):
+            sums[slot] += value
+        if self.top_k:
+            top = self._tops[slot]
+            entry = (
+                self._get_rank(row),
+                next(self._sequence),
+                self._get_top_k_values(row),
+            )
+            # The heap keeps the top rows with the lowest rank first, so it
+            # can be replaced in place.
+            if len(top) < self.top_k:
+                heapq.heappush(top, entry)
+            elif entry > top[0]:
+                heapq.heapreplace(top, entry)
+        self.num_rows += 1
+
+    def add_rows(self, rows):
+        """Adds an iterable of GoogleAdsRow messages."""
+        for row in rows:
+            self.add_row(row)
+
+    def consume(self, stream):
+        """Adds every row of a search_stream response.
+
+        Args:
+            stream: An iterable of SearchGoogleAdsStreamResponse batches.
+
+        Returns:
+            This aggregator.
+        """
+        for batch in stream:
+            self.add_rows(batch.results)
+        return self
+
+    def results(self):
+        """Returns the aggregate of every key.
+
+        Returns:
+            A list of dicts in the order the keys were first seen. Each has
+            the key fields, "count", the sum fields and, if top_k is set,
+            "top", a list of (rank, {field: value}) tuples, highest rank
+            first.
+        """
+        results = []
+        for key, slot in self._slots.items():
+            result = dict(zip(self.key_fields, key))
+            result["count"] = self._counts[slot]
+            for field, sums in zip(self.sum_fields, self._sums):
+                result[field] = sums[slot]
+            if self.top_k:
+                result["top"] = [
+                    (rank, dict(zip(self.top_k_fields, values)))
+                    for rank, _, values in sorted(
+                        self._tops[slot], reverse=True
+                    )
+                ]
+            results.append(result)
+        return results
+
+
+def main(client, customer_id, date_range, top_k):
+    googleads_service = client.get_service("GoogleAdsService")
+    query = f"""
+        SELECT
+          campaign.id,
+          segments.date,
+          metrics.impressions,
+          metrics.clicks,
+          metrics.cost_micros
+        FROM campaign
+        WHERE segments.date DURING {date_range}"""
+
+    aggregator = StreamingAggregator(
+        ["campaign.id"],
+        ["metrics.impressions", "metrics.clicks", "metrics.cost_micros"],
+        top_k=top_k,
+        rank_field="metrics.cost_micros",
+        top_k_fields=["segments.date"],
+    )
+    aggregator.consume(
+        googleads_service.search_stream(customer_id=customer_id, query=query)
+    )
+    print(f"Aggregated {aggregator.num_rows} rows.")
+    for result in aggregator.results():
+        top_days = ", ".join(
+            f"{values['segments.date']} ({cost_micros} micros)"
+            for cost_micros, values in result.get("top", [])
+        )
+        print(
+            f"Campaign with ID {result['campaign.id']} had "
+            f"{result['metrics.impressions']} impressions, "
+            f"{result['metrics.clicks']} clicks and cost "
+            f"{result['metrics.cost_micros']} micros over {result['count']} "
+            f"days. Most expensive days: {top_days or 'none'}."
+        )
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Totals campaign metrics for specified customer while the report "
+            "streams."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-c",
+        "--customer_id",
+        type=str,
+        required=True,
+        help="The Google Ads customer ID.",
+    )
+    parser.add_argument(
+        "-d",
+        "--date_range",
+        type=str,
+        default="LAST_30_DAYS",
+        help="A GAQL date range, for example LAST_7_DAYS.",
+    )
+    parser.add_argument(
+        "-k",
+        "--top_k",
+        type=int,
+        default=3,
+        help="The number of most expensive days reported per campaign.",
+    )
+    args = parser.parse_args()
+
+    try:
+        main(googleads_client, args.customer_id, args.date_range, args.top_k)
+    except GoogleAdsException as ex:
+        print(
+            f'Request with ID "{ex.request_id}" failed with status '
+            f'"{ex.error.code().name}" and includes the following errors:'
+        )
+        for error in ex.failure.errors:
+            print(f'\tError with message "{error.message}".')
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
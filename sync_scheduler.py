@@ -0,0 +1,565 @@
+#!/usr/bin/env python
+"""Schedules recurring user list syncs and reports on the worker job queue.
+
+Schedules are kept in the SQLite database of the worker_daemon.py job queue.
+When a schedule is due, the scheduler submits its job to the queue, and a
+running worker picks it up:
+
+    python sync_scheduler.py add nightly_sync sync_user_list \\
+        '{"customer_id": "1234", "user_list_id": "5678", ...}' -i 24
+    python sync_scheduler.py run
+    python worker_daemon.py serve
+
+The scheduler never submits a job for a user list while another one is in
+flight: neither while the list's previous job is pending or running in the
+queue, nor while the API reports a PENDING or RUNNING OfflineUserDataJob for
+the list. A job that was created but never run stays PENDING, and blocks its
+list until it is run.
+
+Each schedule runs at a fixed offset within its interval, derived from its
+name, so schedules with the same interval are spread across the day instead
+of all starting at once. An hourly job limit keeps bursts within quota. Due
+schedules are submitted by priority, then by the size of their user list,
+largest first, so the longest uploads start earliest.
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+
+import grpc
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+
+import user_list_sizes
+import worker_daemon
+
+
+# The scheduler shares the database of the worker job queue.
+_DEFAULT_DATABASE_PATH = "./worker_jobs.sqlite"
+_DEFAULT_POLL_INTERVAL = 60
+_IN_FLIGHT_STATUSES = ("PENDING", "RUNNING")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS schedule (
+        name TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        arguments TEXT NOT NULL,
+        user_list_resource_name TEXT,
+        interval_seconds INTEGER NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 0,
+        next_run_at REAL NOT NULL,
+        last_job_id INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS schedule_run (
+        schedule_name TEXT NOT NULL,
+        job_id INTEGER NOT NULL,
+        submitted_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS schedule_run_submitted_at
+        ON schedule_run (submitted_at);
+"""
+
+
+def spread_offset(name, interval_seconds):
+    """Returns the fixed offset of a schedule within its interval.
+
+    Args:
+        name: The name of the schedule.
+        interval_seconds: The interval of the schedule.
+
+    Returns:
+        A number of seconds from 0 to interval_seconds - 1, derived from a
+        hash of the name, so offsets are spread evenly and never change.
+    """
+    digest = hashlib.sha256(name.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % interval_seconds
+
+
+def next_slot(name, interval_seconds, after):
+    """Returns the first time after a point in time a schedule is due.
+
+    Args:
+        name: The name of the schedule.
+        interval_seconds: The interval of the schedule.
+        after: A Unix time.
+
+    Returns:
+        The Unix time of the next slot, which is later than after.
+    """
+    offset = spread_offset(name, interval_seconds)
+    slot = (after - offset) // interval_seconds * interval_seconds + offset
+    while slot <= after:
+        slot += interval_seconds
+    return slot
+
+
+def _user_list_resource_name(arguments):
+    customer_id = arguments.get("customer_id")
+    user_list_id = arguments.get("user_list_id")
+    if customer_id and user_list_id:
+        return f"customers/{customer_id}/userLists/{user_list_id}"
+    return None
+
+
+def _describe_error(exception):
+    if isinstance(exception, GoogleAdsException):
+        return (
+            f"request {exception.request_id} failed with status "
+            f"{exception.error.code().name}"
+        )
+    return f"the call failed with status {exception.code().name}"
+
+
+def fetch_in_flight_user_lists(client, customer_ids):
+    """Returns the user lists with an OfflineUserDataJob in flight.
+
+    Args:
+        client: The Google Ads client.
+        customer_ids: The IDs of the customers to check, one query each.
+
+    Returns:
+        A set of user list resource names with a PENDING or RUNNING Customer
+        Match job.
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    query = """
+        SELECT
+          offline_user_data_job.resource_name,
+          offline_user_data_job.customer_match_user_list_metadata.user_list
+        FROM offline_user_data_job
+        WHERE offline_user_data_job.status IN ('PENDING', 'RUNNING')
+          AND offline_user_data_job.type = 'CUSTOMER_MATCH_USER_LIST'"""
+    user_lists = set()
+    for customer_id in customer_ids:
+        stream = googleads_service.search_stream(
+            customer_id=customer_id, query=query
+        )
+        for batch in stream:
+            for row in batch.results:
+                job = row.offline_user_data_job
+                user_lists.add(job.customer_match_user_list_metadata.user_list)
+    return user_lists
+
+
+class SyncScheduler:
+    """Submits due schedules to a worker_daemon.JobQueue."""
+
+    def __init__(
+        self,
+        client,
+        queue,
+        database_path=_DEFAULT_DATABASE_PATH,
+        max_jobs_per_hour=None,
+        size_history=None,
+    ):
+        """Opens or creates the schedules.
+
+        Args:
+            client: The Google Ads client, used to look up the jobs in flight.
+            queue: The worker_daemon.JobQueue jobs are submitted to.
+            database_path: The path of the SQLite database file, usually the
+                one of the queue.
+            max_jobs_per_hour: If set, the maximum number of jobs submitted in
+                any hour.
+            size_history: If set, a user_list_sizes.UserListSizeHistory whose
+                latest sizes order schedules of equal priority.
+        """
+        self.client = client
+        self.queue = queue
+        self.max_jobs_per_hour = max_jobs_per_hour
+        self.size_history = size_history
+        self.connection = sqlite3.connect(database_path, timeout=30)
+        self.connection.executescript(_SCHEMA)
+        self._stopped = threading.Event()
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+    def add_schedule(
+        self,
+        name,
+        kind,
+        arguments,
+        interval_seconds,
+        priority=0,
+        user_list_resource_name=None,
+    ):
+        """Adds or replaces a schedule.
+
+        Args:
+            name: The unique name of the schedule.
+            kind: The kind of the job, a key of worker_daemon.JOB_HANDLERS.
+            arguments: A dict of JSON-serializable keyword arguments for the
+                job's handler.
+            interval_seconds: How often the job runs.
+            priority: Due schedules with a higher priority are submitted
+                first.
+            user_list_resource_name: The user list the job uploads to, if
+                any. Defaults to the list named by the "customer_id" and
+                "user_list_id" arguments.
+
+        Returns:
+            The Unix time at which the schedule is first due.
+
+        Raises:
+            ValueError: If the kind is unknown, the interval is not
+                positive, or the user list is not a user list resource name.
+        """
+        if kind not in worker_daemon.JOB_HANDLERS:
+            raise ValueError(
+                f"Unknown job kind '{kind}', expected one of "
+                f"{sorted(worker_daemon.JOB_HANDLERS)}."
+            )
+        if interval_seconds <= 0:
+            raise ValueError("The interval must be positive.")
+        user_list_resource_name = (
+            user_list_resource_name or _user_list_resource_name(arguments)
+        )
+        if user_list_resource_name:
+            # Raises ValueError for a malformed resource name, which would
+            # otherwise fail every tick.
+            user_list_sizes.group_by_customer([user_list_resource_name])
+        next_run_at = next_slot(name, interval_seconds, time.time())
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO schedule VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, NULL)",
+                (
+                    name,
+                    kind,
+                    json.dumps(arguments),
+                    user_list_resource_name,
+                    interval_seconds,
+                    priority,
+                    next_run_at,
+                ),
+            )
+        return next_run_at
+
+    def remove_schedule(self, name):
+        """Removes a schedule. Its jobs already submitted still run."""
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM schedule WHERE name = ?", (name,)
+            )
+
+    def list_schedules(self):
+        """Returns every schedule as a dict, ordered by next run."""
+        cursor = self.connection.execute(
+            "SELECT * FROM schedule ORDER BY next_run_at"
+        )
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def _remaining_submissions(self, now):
+        if self.max_jobs_per_hour is None:
+            return None
+        (submitted,) = self.connection.execute(
+            "SELECT COUNT(*) FROM schedule_run WHERE submitted_at > ?",
+            (now - 60 * 60,),
+        ).fetchone()
+        return max(self.max_jobs_per_hour - submitted, 0)
+
+    def _is_job_in_flight(self, job_id):
+        if job_id is None:
+            return False
+        job = self.queue.get(job_id)
+        return job is not None and job["status"] in _IN_FLIGHT_STATUSES
+
+    def tick(self, now=None):
+        """Submits the due schedules whose user lists are idle.
+
+        Schedules that are skipped stay due and are tried again on the next
+        tick. This includes the schedules of every user list if the jobs in
+        flight cannot be looked up, for example after a transient API error.
+
+        Args:
+            now: The current Unix time. Defaults to the time of the call.
+
+        Returns:
+            A tuple of a list of (schedule name, job ID) tuples for the
+            submitted jobs, and a dict mapping the names of skipped due
+            schedules to the reason.
+        """
+        now = time.time() if now is None else now
+        schedules = self.list_schedules()
+        if not any(schedule["next_run_at"] <= now for schedule in schedules):
+            return [], {}
+
+        skipped = {}
+        candidates = []
+        busy_user_lists = set()
+        for schedule in schedules:
+            in_flight = self._is_job_in_flight(schedule["last_job_id"])
+            if in_flight and schedule["user_list_resource_name"]:
+                # Another schedule of the same list may be due.
+                busy_user_lists.add(schedule["user_list_resource_name"])
+            if schedule["next_run_at"] > now:
+                continue
+            if in_flight:
+                skipped[schedule["name"]] = "its previous job is in flight"
+            else:
+                candidates.append(schedule)
+        customer_ids = set()
+        for schedule in list(candidates):
+            user_list = schedule["user_list_resource_name"]
+            if not user_list:
+                continue
+            try:
+                customer_ids.update(
+                    user_list_sizes.group_by_customer([user_list])
+                )
+            except ValueError as ex:
+                # Only schedules added before names were validated.
+                skipped[schedule["name"]] = str(ex).rstrip(".")
+                candidates.remove(schedule)
+        unchecked_error = None
+        if customer_ids:
+            try:
+                busy_user_lists |= fetch_in_flight_user_lists(
+                    self.client, sorted(customer_ids)
+                )
+            except (GoogleAdsException, grpc.RpcError) as ex:
+                unchecked_error = _describe_error(ex)
+
+        sizes = {}
+        if self.size_history is not None:
+            sizes = self.size_history.get_latest_sizes()
+        candidates.sort(
+            key=lambda schedule: (
+                -schedule["priority"],
+                -sizes.get(schedule["user_list_resource_name"], 0),
+                schedule["next_run_at"],
+            )
+        )
+        remaining = self._remaining_submissions(now)
+        submitted = []
+        for schedule in candidates:
+            user_list = schedule["user_list_resource_name"]
+            if user_list and unchecked_error:
+                skipped[schedule["name"]] = (
+                    "the jobs in flight could not be checked: "
+                    f"{unchecked_error}"
+                )
+                continue
+            if user_list and user_list in busy_user_lists:
+                skipped[schedule["name"]] = (
+                    f"user list '{user_list}' has a job in flight"
+                )
+                continue
+            if remaining is not None and remaining <= 0:
+                skipped[schedule["name"]] = "the hourly job limit is reached"
+                continue
+            job_id = self.queue.submit(
+                schedule["kind"], json.loads(schedule["arguments"])
+            )
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE schedule SET last_job_id = ?, next_run_at = ? "
+                    "WHERE name = ?",
+                    (
+                        job_id,
+                        next_slot(
+                            schedule["name"],
+                            schedule["interval_seconds"],
+                            now,
+                        ),
+                        schedule["name"],
+                    ),
+                )
+                self.connection.execute(
+                    "INSERT INTO schedule_run VALUES (?, ?, ?)",
+                    (schedule["name"], job_id, now),
+                )
+            if user_list:
+                # Two schedules may sync the same list.
+                busy_user_lists.add(user_list)
+            if remaining is not None:
+                remaining -= 1
+            submitted.append((schedule["name"], job_id))
+        return submitted, skipped
+
+    def stop(self):
+        """Asks run to return."""
+        self._stopped.set()
+
+    def run(self, poll_interval=_DEFAULT_POLL_INTERVAL):
+        """Submits due schedules every poll_interval seconds until stopped."""
+        while not self._stopped.is_set():
+            submitted, skipped = self.tick()
+            for name, job_id in submitted:
+                print(f"Submitted job {job_id} for schedule '{name}'.")
+            for name, reason in skipped.items():
+                print(f"Skipped schedule '{name}', since {reason}.")
+            self._stopped.wait(poll_interval)
+
+
+def main(
+    client,
+    database_path,
+    max_jobs_per_hour,
+    size_database_path,
+    poll_interval,
+):
+    queue = worker_daemon.JobQueue(database_path)
+    size_history = (
+        user_list_sizes.UserListSizeHistory(size_database_path)
+        if size_database_path
+        else None
+    )
+    scheduler = SyncScheduler(
+        client, queue, database_path, max_jobs_per_hour, size_history
+    )
+    print(f"Scheduling jobs in '{database_path}'.")
+    try:
+        scheduler.run(poll_interval)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        scheduler.close()
+        if size_history:
+            size_history.close()
+        queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Submits recurring user list syncs and reports to the worker job "
+            "queue."
+        )
+    )
+    parser.add_argument(
+        "--database_path",
+        type=str,
+        default=_DEFAULT_DATABASE_PATH,
+        help="The path of the SQLite database of the worker job queue.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="Submits due schedules until interrupted."
+    )
+    run_parser.add_argument(
+        "--max_jobs_per_hour",
+        type=int,
+        required=False,
+        help="The maximum number of jobs submitted in any hour.",
+    )
+    run_parser.add_argument(
+        "--size_database_path",
+        type=str,
+        required=False,
+        help=(
+            "The path of a user_list_sizes.py database. If set, larger user "
+            "lists are submitted first."
+        ),
+    )
+    run_parser.add_argument(
+        "--poll_interval",
+        type=float,
+        default=_DEFAULT_POLL_INTERVAL,
+        help="The number of seconds between checks for due schedules.",
+    )
+
+    add_parser = subparsers.add_parser("add", help="Adds a schedule.")
+    add_parser.add_argument("name", help="The unique name of the schedule.")
+    add_parser.add_argument(
+        "kind",
+        choices=sorted(worker_daemon.JOB_HANDLERS),
+        help="The kind of the job.",
+    )
+    add_parser.add_argument(
+        "arguments",
+        type=json.loads,
+        help="The keyword arguments of the job as a JSON object.",
+    )
+    add_parser.add_argument(
+        "-i",
+        "--interval_hours",
+        type=float,
+        default=24,
+        help="How often the job runs, in hours.",
+    )
+    add_parser.add_argument(
+        "-p",
+        "--priority",
+        type=int,
+        default=0,
+        help="Due schedules with a higher priority are submitted first.",
+    )
+    add_parser.add_argument(
+        "-u",
+        "--user_list_resource_name",
+        type=str,
+        required=False,
+        help=(
+            "The user list the job uploads to. Defaults to the list named by "
+            "the customer_id and user_list_id arguments."
+        ),
+    )
+
+    subparsers.add_parser("list", help="Lists the schedules.")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        # GoogleAdsClient will read the google-ads.yaml configuration file in
+        # the home directory if none is specified.
+        googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+        try:
+            main(
+                googleads_client,
+                args.database_path,
+                args.max_jobs_per_hour,
+                args.size_database_path,
+                args.poll_interval,
+            )
+        except GoogleAdsException as ex:
+            print(
+                f'Request with ID "{ex.request_id}" failed with status '
+                f'"{ex.error.code().name}" and includes the following errors:'
+            )
+            for error in ex.failure.errors:
+                print(f'\tError with message "{error.message}".')
+                if error.location:
+                    for field_path_element in (
+                        error.location.field_path_elements
+                    ):
+                        print(f"\t\tOn field: {field_path_element.field_name}")
+            sys.exit(1)
+    else:
+        queue = worker_daemon.JobQueue(args.database_path)
+        # Adding and listing schedules needs no client.
+        scheduler = SyncScheduler(None, queue, args.database_path)
+        try:
+            if args.command == "add":
+                next_run_at = scheduler.add_schedule(
+                    args.name,
+                    args.kind,
+                    args.arguments,
+                    round(args.interval_hours * 60 * 60),
+                    args.priority,
+                    args.user_list_resource_name,
+                )
+                print(
+                    f"Added schedule '{args.name}', first due at "
+                    f"{time.ctime(next_run_at)}."
+                )
+            else:
+                for schedule in scheduler.list_schedules():
+                    print(
+                        f"Schedule '{schedule['name']}' runs "
+                        f"{schedule['kind']} every "
+                        f"{schedule['interval_seconds'] / 3600:g} hours with "
+                        f"priority {schedule['priority']}, next at "
+                        f"{time.ctime(schedule['next_run_at'])}."
+                    )
+        finally:
+            scheduler.close()
+            queue.close()
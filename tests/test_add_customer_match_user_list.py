@@ -0,0 +1,134 @@
+"""Tests for add_customer_match_user_list."""
+
+import grpc
+import pytest
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    AddOfflineUserDataJobOperationsRequest,
+    AddOfflineUserDataJobOperationsResponse,
+    OfflineUserDataJobOperation,
+)
+from google.auth.credentials import AnonymousCredentials
+
+import add_customer_match_user_list
+import operation_spool
+
+
+_CUSTOMER_ID = "1234567890"
+_RESOURCE_NAME = "customers/1234567890/offlineUserDataJobs/1"
+
+
+class _Error(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.INVALID_ARGUMENT
+
+
+class _Sender:
+    """Records the requests it is sent and fails the given request once."""
+
+    def __init__(self, failing_request=None):
+        self.failing_request = failing_request
+        self.requests = []
+
+    def send(self, resource_name, payload):
+        request = AddOfflineUserDataJobOperationsRequest.pb().FromString(
+            payload
+        )
+        if len(self.requests) == self.failing_request:
+            self.failing_request = None
+            raise _Error()
+        self.requests.append(
+            [
+                operation.create.user_identifiers[0].hashed_email
+                for operation in request.operations
+            ]
+        )
+        return AddOfflineUserDataJobOperationsResponse.pb()()
+
+
+def _client():
+    return GoogleAdsClient(
+        AnonymousCredentials(),
+        "developer-token",
+        use_proto_plus=False,
+        version="v14",
+    )
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    path = str(tmp_path / "spool")
+    with operation_spool.OperationSpoolWriter(
+        path, max_operations_per_request=2
+    ) as writer:
+        for hashed_email in "abcde":
+            operation = OfflineUserDataJobOperation.pb()()
+            operation.create.user_identifiers.add().hashed_email = hashed_email
+            writer.append(operation.SerializeToString())
+    return path
+
+
+def test_failed_upload_resumes_from_the_printed_request(capsys, spool_path):
+    sender = _Sender(failing_request=1)
+
+    with pytest.raises(_Error):
+        add_customer_match_user_list.upload_spooled_operations(
+            _client(), sender, _RESOURCE_NAME, spool_path
+        )
+    assert "--spool_start 1." in capsys.readouterr().out
+    add_customer_match_user_list.upload_spooled_operations(
+        _client(), sender, _RESOURCE_NAME, spool_path, start=1
+    )
+
+    assert sender.requests == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_start_past_the_spool_raises_value_error(spool_path):
+    with pytest.raises(ValueError, match="has 3 requests"):
+        add_customer_match_user_list.upload_spooled_operations(
+            _client(), _Sender(), _RESOURCE_NAME, spool_path, start=4
+        )
+
+
+def test_replay_skips_reading_the_records(capsys, monkeypatch, spool_path):
+    def fail():
+        raise AssertionError("The records were read.")
+
+    monkeypatch.setattr(add_customer_match_user_list, "get_raw_records", fail)
+
+    add_customer_match_user_list.main(
+        _client(),
+        _CUSTOMER_ID,
+        run_job=False,
+        user_list_id=None,
+        offline_user_data_job_id="1",
+        spool_path=spool_path,
+        dry_run_mode="offline",
+        spool_start=1,
+    )
+
+    output = capsys.readouterr().out
+    assert "Uploaded 2 requests from the spool" in output
+    assert "in 2 requests" in output
+
+
+@pytest.mark.parametrize(
+    "spool_path, spool_start, job_id, message",
+    [
+        (None, 0, "1", "needs its spool_path"),
+        ("spool", 1, None, "needs the offline user data job"),
+    ],
+)
+def test_invalid_replay_raises_value_error(
+    spool_path, spool_start, job_id, message
+):
+    with pytest.raises(ValueError, match=message):
+        add_customer_match_user_list.main(
+            _client(),
+            _CUSTOMER_ID,
+            run_job=False,
+            user_list_id=None,
+            offline_user_data_job_id=job_id,
+            spool_path=spool_path,
+            spool_start=spool_start,
+        )
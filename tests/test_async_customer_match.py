@@ -0,0 +1,113 @@
+"""Tests for async_customer_match."""
+
+import asyncio
+
+import pytest
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.v14.errors.types.errors import GoogleAdsFailure
+from google.ads.googleads.v14.services.services.google_ads_service.transports import (
+    grpc as google_ads_grpc,
+)
+from google.ads.googleads.v14.services.services.offline_user_data_job_service.transports import (
+    grpc as offline_user_data_job_grpc,
+)
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    AddOfflineUserDataJobOperationsResponse,
+    CreateOfflineUserDataJobResponse,
+)
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsResponse,
+)
+
+import async_customer_match
+
+
+_RESOURCE_NAME = "customers/1234567890/offlineUserDataJobs/1"
+
+
+class _FakeChannel:
+    """Answers every call with the response registered for its method."""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def unary_unary(self, method, request_serializer, response_deserializer):
+        async def call(request, metadata):
+            return self.responses[method]
+
+        return call
+
+
+def _client(responses, use_proto_plus=False):
+    return async_customer_match.AsyncCustomerMatchClient(
+        GoogleAdsClient(
+            None,
+            "developer-token",
+            use_proto_plus=use_proto_plus,
+            version="v14",
+        ),
+        _FakeChannel(responses),
+    )
+
+
+@pytest.mark.parametrize(
+    "transport, method",
+    [
+        (offline_user_data_job_grpc, async_customer_match._CREATE_JOB_METHOD),
+        (
+            offline_user_data_job_grpc,
+            async_customer_match._ADD_OPERATIONS_METHOD,
+        ),
+        (offline_user_data_job_grpc, async_customer_match._RUN_JOB_METHOD),
+        (google_ads_grpc, async_customer_match._SEARCH_METHOD),
+    ],
+)
+def test_method_paths_match_generated_transports(transport, method):
+    with open(transport.__file__) as f:
+        assert f'"{method}"' in f.read()
+
+
+def test_missing_job_raises_value_error():
+    client = _client(
+        {async_customer_match._SEARCH_METHOD: SearchGoogleAdsResponse.pb()()}
+    )
+
+    with pytest.raises(ValueError, match="was not found"):
+        asyncio.run(client.get_job_status("1234567890", _RESOURCE_NAME))
+
+
+@pytest.mark.parametrize("use_proto_plus", [False, True])
+def test_partial_failures_are_printed(capsys, use_proto_plus):
+    failure = GoogleAdsFailure.pb()()
+    error = failure.errors.add()
+    error.message = "The hashed email is invalid."
+    error.location.field_path_elements.add().index = 3
+    add_response = AddOfflineUserDataJobOperationsResponse.pb()()
+    add_response.partial_failure_error.code = 3
+    add_response.partial_failure_error.details.add().value = (
+        failure.SerializeToString()
+    )
+    create_response = CreateOfflineUserDataJobResponse.pb()()
+    create_response.resource_name = _RESOURCE_NAME
+    client = _client(
+        {
+            async_customer_match._CREATE_JOB_METHOD: create_response,
+            async_customer_match._ADD_OPERATIONS_METHOD: add_response,
+        },
+        use_proto_plus,
+    )
+
+    status = asyncio.run(
+        async_customer_match.upload_to_user_list(
+            client,
+            "1234567890",
+            "customers/1234567890/userLists/1",
+            [b""],
+            run_job=False,
+        )
+    )
+
+    assert status == "PENDING"
+    output = capsys.readouterr().out
+    assert "A partial failure at index 3 occurred." in output
+    assert "The hashed email is invalid." in output
@@ -0,0 +1,78 @@
+"""Tests for bulk_campaign_updates."""
+
+import json
+
+import pytest
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsStreamResponse,
+)
+
+import bulk_campaign_updates
+
+
+_BUDGET = "customers/1234567890/campaignBudgets/1"
+
+
+class _Client:
+    """Returns a GoogleAdsService answering with raw protobuf rows."""
+
+    def __init__(self, batch):
+        self.batch = batch
+
+    def get_service(self, name):
+        return self
+
+    def search_stream(self, customer_id, query):
+        return [self.batch]
+
+
+def test_valid_states_are_read(tmp_path):
+    path = tmp_path / "states.json"
+    states = {
+        "1234": {"status": "PAUSED"},
+        "5678": {"budget_amount_micros": 5000000},
+    }
+    path.write_text(json.dumps(states))
+
+    assert bulk_campaign_updates.read_desired_states(path) == states
+
+
+@pytest.mark.parametrize(
+    "states, message",
+    [
+        ({"1234": {"status": "PAUSE"}}, "Campaign 1234 has the unknown status"),
+        ({"1234": {"status": "UNKNOWN"}}, "unknown status 'UNKNOWN'"),
+        ({"1234": {"status": "REMOVED"}}, "unknown status 'REMOVED'"),
+        (
+            {"1234": {"budget_amount_micros": "5"}},
+            "Campaign 1234 has the invalid budget amount",
+        ),
+        ({"abc": {"status": "PAUSED"}}, "'abc' is not a campaign ID"),
+        ({"1234": "PAUSED"}, "campaign 1234 is not an object"),
+        ([], "must map campaign IDs"),
+    ],
+)
+def test_invalid_states_name_the_bad_entry(states, message):
+    with pytest.raises(ValueError, match=message):
+        bulk_campaign_updates.validate_desired_states(states)
+
+
+def test_current_states_are_read_from_raw_protobuf_rows():
+    batch = SearchGoogleAdsStreamResponse.pb()()
+    row = batch.results.add()
+    row.campaign.id = 1234
+    row.campaign.status = 3  # PAUSED
+    row.campaign.campaign_budget = _BUDGET
+    row.campaign_budget.amount_micros = 5000000
+
+    states = bulk_campaign_updates.read_current_states(
+        _Client(batch), "1234567890", ["1234"]
+    )
+
+    assert states == {
+        "1234": {
+            "status": "PAUSED",
+            "campaign_budget": _BUDGET,
+            "budget_amount_micros": 5000000,
+        }
+    }
@@ -0,0 +1,92 @@
+"""Tests for campaign_catalog."""
+
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsStreamResponse,
+)
+
+import campaign_catalog
+from entity_mirror import EntityMirror
+
+
+_CUSTOMER_ID = "1234567890"
+_BUDGET = "customers/1234567890/campaignBudgets/1"
+
+
+class _Client:
+    """Returns a GoogleAdsService answering with raw protobuf rows."""
+
+    def __init__(self, batch=None):
+        self.batch = batch
+
+    def get_service(self, name):
+        return self
+
+    def search_stream(self, customer_id, query):
+        return [self.batch]
+
+
+def _write_campaigns(database_path, campaigns):
+    mirror = EntityMirror(_Client(), database_path)
+    try:
+        with mirror.connection:
+            mirror.connection.execute("DELETE FROM campaign")
+            mirror.connection.executemany(
+                "INSERT INTO campaign (customer_id, id, name, status, "
+                "campaign_budget) VALUES (?, ?, ?, ?, ?)",
+                [(_CUSTOMER_ID,) + campaign for campaign in campaigns],
+            )
+    finally:
+        mirror.close()
+
+
+def test_search_prefix_ignores_case_and_orders_by_name():
+    catalog = campaign_catalog.CampaignCatalog(
+        lambda: [
+            (1, "summer sale", "ENABLED", _BUDGET),
+            (2, "Brand", "ENABLED", _BUDGET),
+            (3, "Summer Brand", "PAUSED", _BUDGET),
+            (4, "Winter", "ENABLED", _BUDGET),
+        ]
+    )
+
+    assert [c[0] for c in catalog.search_prefix("SUMMER")] == [3, 1]
+    assert [c[0] for c in catalog.search_prefix("")] == [2, 3, 1, 4]
+    assert [c[0] for c in catalog.search_prefix("s", limit=1)] == [3]
+    assert catalog.search_prefix("x") == []
+
+
+def test_refresh_rereads_the_mirror(tmp_path):
+    database_path = str(tmp_path / "mirror.sqlite")
+    _write_campaigns(database_path, [(1, "Brand", "ENABLED", _BUDGET)])
+    catalog = campaign_catalog.CampaignCatalog(
+        lambda: campaign_catalog.load_campaigns_from_mirror(
+            _Client(), _CUSTOMER_ID, database_path
+        )
+    )
+    _write_campaigns(
+        database_path,
+        [(1, "Brand", "PAUSED", _BUDGET), (2, "Sale", "ENABLED", _BUDGET)],
+    )
+
+    catalog.refresh()
+
+    assert len(catalog) == 2
+    assert catalog.get(1) == (1, "Brand", "PAUSED", _BUDGET)
+    assert catalog.find_by_name("Sale") == [(2, "Sale", "ENABLED", _BUDGET)]
+
+
+def test_campaigns_are_loaded_from_raw_protobuf_rows():
+    batch = SearchGoogleAdsStreamResponse.pb()()
+    row = batch.results.add()
+    row.campaign.id = 1
+    row.campaign.name = "Brand"
+    row.campaign.status = 2  # ENABLED
+    row.campaign.campaign_budget = _BUDGET
+
+    catalog = campaign_catalog.CampaignCatalog(
+        lambda: campaign_catalog.load_campaigns_from_api(
+            _Client(batch), _CUSTOMER_ID
+        )
+    )
+
+    assert catalog.get(1) == (1, "Brand", "ENABLED", _BUDGET)
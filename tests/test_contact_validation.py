@@ -0,0 +1,57 @@
+"""Tests for contact_validation."""
+
+import pytest
+
+import contact_validation
+from identifier_hashing import normalize_and_hash
+
+
+_HASH = normalize_and_hash("dana@example.com", True)
+
+
+def test_nan_and_blank_values_do_not_prevent_detection():
+    records = [
+        {"email": _HASH},
+        {"email": float("nan")},
+        {"email": None},
+        {"email": "  "},
+        {"email": _HASH.upper()},
+    ]
+
+    assert contact_validation.detect_prehashed_keys(records) == {"email"}
+
+
+def test_raw_columns_are_not_detected():
+    records = [{"email": "dana@example.com"}, {"email": float("nan")}]
+
+    assert contact_validation.detect_prehashed_keys(records) == frozenset()
+
+
+def test_mostly_hashed_column_raises():
+    records = [{"email": _HASH}] * 9 + [{"email": "dana@example.com"}]
+
+    with pytest.raises(ValueError, match="9 of 10 sampled 'email' values"):
+        contact_validation.detect_prehashed_keys(records)
+
+
+def test_nan_values_are_dropped_from_prehashed_records():
+    records = [
+        {"email": _HASH, "phone": float("nan")},
+        {"email": float("nan"), "phone": float("nan")},
+    ]
+
+    valid_records, counts = contact_validation.validate_prehashed_columns(
+        records, {"email", "phone"}
+    )
+
+    assert valid_records == [{"email": _HASH}]
+    assert counts == {"rows.rejected": 1}
+
+
+def test_nan_values_are_empty_in_validate_records():
+    records = [{"email": "Dana@Example.com", "phone": float("nan")}]
+
+    valid_records, counts = contact_validation.validate_records(records)
+
+    assert valid_records == [{"email": "dana@example.com"}]
+    assert counts == {"email.repaired": 1}
@@ -0,0 +1,95 @@
+"""Tests for credential_cache, with LocalSecretSource standing in for Secret
+Manager."""
+
+import datetime
+import json
+import os
+import stat
+
+import google.oauth2.credentials
+import pytest
+
+import credential_cache
+
+
+_SECRET_ID = "projects/1/secrets/refresh-token/versions/latest"
+
+
+class _CountingSource(credential_cache.LocalSecretSource):
+    def __init__(self, path):
+        super().__init__(path)
+        self.fetches = 0
+
+    def get(self, secret_id):
+        self.fetches += 1
+        return super().get(secret_id)
+
+
+@pytest.fixture
+def secret_source(tmp_path):
+    path = tmp_path / "secrets.json"
+    path.write_text(json.dumps({_SECRET_ID: "refresh-token"}))
+    return _CountingSource(str(path))
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_default_cache_dir_is_per_user(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+    assert credential_cache.default_cache_dir() == str(
+        tmp_path / "google-ads-credentials"
+    )
+
+
+def test_secrets_are_shared_between_caches(tmp_path, secret_source):
+    cache_dir = str(tmp_path / "cache")
+    first = credential_cache.CredentialCache(cache_dir, secret_source)
+    second = credential_cache.CredentialCache(cache_dir, secret_source)
+
+    assert first.get_secret(_SECRET_ID) == "refresh-token"
+    assert second.get_secret(_SECRET_ID) == "refresh-token"
+    assert secret_source.fetches == 1
+
+
+def test_permissions_of_an_existing_directory_are_fixed(
+    tmp_path, secret_source
+):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir(mode=0o755)
+    entry = cache_dir / "entry.json"
+    entry.write_text("{}")
+    entry.chmod(0o644)
+
+    cache = credential_cache.CredentialCache(str(cache_dir), secret_source)
+    cache.get_secret(_SECRET_ID)
+
+    assert _mode(cache_dir) == 0o700
+    for name in os.listdir(cache_dir):
+        assert _mode(cache_dir / name) == 0o600
+
+
+def test_access_token_is_refreshed_once(monkeypatch, tmp_path):
+    refreshes = []
+
+    def refresh(credentials, request):
+        refreshes.append(credentials.refresh_token)
+        credentials.token = "access-token"
+        credentials.expiry = datetime.datetime.utcnow() + datetime.timedelta(
+            hours=1
+        )
+
+    monkeypatch.setattr(
+        google.oauth2.credentials.Credentials, "refresh", refresh
+    )
+    cache_dir = str(tmp_path / "cache")
+
+    for _ in range(3):
+        credentials = credential_cache.CredentialCache(
+            cache_dir
+        ).get_credentials("client-id", "client-secret", "refresh-token")
+
+    assert credentials.token == "access-token"
+    assert refreshes == ["refresh-token"]
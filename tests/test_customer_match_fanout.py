@@ -0,0 +1,53 @@
+"""Tests for customer_match_fanout."""
+
+import asyncio
+
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    AddOfflineUserDataJobOperationsResponse,
+)
+
+import customer_match_fanout
+
+
+_FAILING_LIST = "customers/1/userLists/1"
+_TARGETS = [("1", _FAILING_LIST), ("2", "customers/2/userLists/2")]
+
+
+class _AsyncClient:
+    """Creates jobs and fails every request of the first target's job."""
+
+    def __init__(self):
+        self.requests = {}
+
+    async def create_job(self, customer_id, user_list_resource_name):
+        return f"customers/{customer_id}/offlineUserDataJobs/1"
+
+    async def send_encoded_request(self, resource_name, payload):
+        if resource_name.startswith("customers/1/"):
+            raise RuntimeError("The connection was reset.")
+        self.requests[resource_name] = self.requests.get(resource_name, 0) + 1
+        return AddOfflineUserDataJobOperationsResponse.pb()()
+
+
+def test_unexpected_error_stops_only_its_job():
+    async_client = _AsyncClient()
+
+    results = asyncio.run(
+        asyncio.wait_for(
+            customer_match_fanout.fan_out_upload(
+                async_client,
+                _TARGETS,
+                [b"operation"] * 5,
+                max_operations_per_request=1,
+                max_buffered_batches=1,
+            ),
+            timeout=10,
+        )
+    )
+
+    failed, succeeded = (results[target] for target in _TARGETS)
+    assert isinstance(failed["error"], RuntimeError)
+    assert failed["status"] is None
+    assert succeeded["error"] is None
+    assert succeeded["requests"] == 5
+    assert succeeded["status"] == "PENDING"
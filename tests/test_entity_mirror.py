@@ -0,0 +1,92 @@
+"""Tests for entity_mirror."""
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsStreamResponse,
+)
+from google.auth.credentials import AnonymousCredentials
+
+from entity_mirror import EntityMirror
+
+
+_CUSTOMER_ID = "1234567890"
+_BUDGET = "customers/1234567890/campaignBudgets/1"
+
+
+class _GoogleAdsService:
+    """Answers each query with the rows registered for its FROM clause."""
+
+    def __init__(self, rows_by_resource):
+        self.rows_by_resource = rows_by_resource
+
+    def search_stream(self, customer_id, query):
+        resource = query.split(" FROM ")[1].split()[0]
+        batch = SearchGoogleAdsStreamResponse.pb()()
+        for fill in self.rows_by_resource.get(resource, ()):
+            fill(batch.results.add())
+        return [batch]
+
+
+def _campaign(row):
+    row.campaign.id = 1
+    row.campaign.name = "Brand"
+    row.campaign.status = 3  # PAUSED
+    row.campaign.advertising_channel_type = 2  # SEARCH
+    row.campaign.campaign_budget = _BUDGET
+
+
+def _campaign_budget(row):
+    row.campaign_budget.resource_name = _BUDGET
+    row.campaign_budget.name = "Budget"
+    row.campaign_budget.amount_micros = 500000
+    row.campaign_budget.delivery_method = 2  # STANDARD
+    row.campaign_budget.status = 2  # ENABLED
+
+
+def _user_list(row):
+    row.user_list.id = 7
+    row.user_list.resource_name = "customers/1234567890/userLists/7"
+    row.user_list.name = "Customers"
+    row.user_list.membership_status = 2  # OPEN
+    row.user_list.crm_based_user_list.upload_key_type = 2  # CONTACT_INFO
+
+
+def _customer(row):
+    row.customer.time_zone = "America/New_York"
+
+
+def test_full_sync_stores_enum_names_without_proto_plus(tmp_path):
+    client = GoogleAdsClient(
+        AnonymousCredentials(),
+        "developer-token",
+        use_proto_plus=False,
+        version="v14",
+    )
+    mirror = EntityMirror(client, str(tmp_path / "mirror.sqlite"))
+    mirror._googleads_service = _GoogleAdsService(
+        {
+            "campaign": [_campaign],
+            "campaign_budget": [_campaign_budget],
+            "user_list": [_user_list],
+            "customer": [_customer],
+        }
+    )
+    try:
+        counts = mirror.sync(_CUSTOMER_ID)
+
+        assert counts == {"campaigns": 1, "campaign_budgets": 1, "user_lists": 1}
+        assert mirror.get_campaigns(_CUSTOMER_ID) == [
+            (1, "Brand", "PAUSED", _BUDGET)
+        ]
+        assert mirror.connection.execute(
+            "SELECT advertising_channel_type FROM campaign"
+        ).fetchall() == [("SEARCH",)]
+        assert mirror.get_campaign_budget(_CUSTOMER_ID, _BUDGET)[2:] == (
+            "STANDARD",
+            "ENABLED",
+        )
+        assert mirror.connection.execute(
+            "SELECT membership_status, upload_key_type FROM user_list"
+        ).fetchall() == [("OPEN", "CONTACT_INFO")]
+    finally:
+        mirror.close()
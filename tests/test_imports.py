@@ -0,0 +1,59 @@
+"""Checks that every module can be imported on its own.
+
+The scripts import each other's helpers, so an import cycle or a failing
+module-level lookup only shows up when a module is imported rather than run.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_MODULES = (
+    "account_hierarchy",
+    "add_campaigns",
+    "add_customer_match_user_list",
+    "async_customer_match",
+    "audience_file",
+    "bulk_campaign_updates",
+    "campaign_catalog",
+    "contact_validation",
+    "credential_cache",
+    "customer_match_fanout",
+    "digest_store",
+    "dry_run",
+    "entity_mirror",
+    "get_campaigns",
+    "identifier_dedup",
+    "identifier_hashing",
+    "main",
+    "operation_spool",
+    "preencoded_requests",
+    "profiling",
+    "retries",
+    "rpc_tracing",
+    "sharded_report",
+    "sharded_transform",
+    "stream_aggregation",
+    "sync_scheduler",
+    "transport_profiles",
+    "user_list_sizes",
+    "user_list_sync",
+    "worker_daemon",
+)
+
+
+@pytest.mark.parametrize("module", _MODULES)
+def test_module_imports_in_a_fresh_interpreter(module):
+    # A fresh interpreter, since a cycle only fails for the module imported
+    # first.
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=_REPO_DIR,
+    )
+    assert result.returncode == 0, result.stderr
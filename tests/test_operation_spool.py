@@ -0,0 +1,50 @@
+"""Tests for operation_spool."""
+
+import os
+
+import pytest
+
+import operation_spool
+
+
+def _write(path, operations, max_operations_per_request=2):
+    with operation_spool.OperationSpoolWriter(
+        path, max_operations_per_request
+    ) as writer:
+        writer.extend(operations)
+
+
+def test_completed_spool_reads_back(tmp_path):
+    path = str(tmp_path / "spool")
+    operations = [b"a", b"bb", b"ccc"]
+
+    _write(path, operations)
+
+    with operation_spool.OperationSpool(path) as spool:
+        assert len(spool) == 2
+        assert list(spool.iter_operations()) == operations
+
+
+def test_failed_spool_gets_no_index(tmp_path):
+    path = str(tmp_path / "spool")
+
+    def failing_operations():
+        yield b"a"
+        raise RuntimeError("transform failed")
+
+    with pytest.raises(RuntimeError):
+        _write(path, failing_operations())
+
+    assert not os.path.exists(path + ".idx")
+    with pytest.raises(FileNotFoundError):
+        operation_spool.OperationSpool(path)
+
+
+def test_rewriting_removes_the_old_index(tmp_path):
+    path = str(tmp_path / "spool")
+    _write(path, [b"a", b"b", b"c"])
+
+    writer = operation_spool.OperationSpoolWriter(path)
+
+    assert not os.path.exists(path + ".idx")
+    writer.close()
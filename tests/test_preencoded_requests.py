@@ -0,0 +1,57 @@
+"""Tests for preencoded_requests."""
+
+from google.ads.googleads.v14.services.services.offline_user_data_job_service.transports import (
+    grpc as offline_user_data_job_grpc,
+)
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    AddOfflineUserDataJobOperationsRequest,
+    OfflineUserDataJobOperation,
+)
+
+import preencoded_requests
+
+
+_RESOURCE_NAME = "customers/1234567890/offlineUserDataJobs/1"
+
+
+def _serialized_operation(hashed_email):
+    operation = OfflineUserDataJobOperation.pb()()
+    operation.create.user_identifiers.add().hashed_email = hashed_email
+    return operation.SerializeToString()
+
+
+def test_method_path_matches_generated_transport():
+    with open(offline_user_data_job_grpc.__file__) as f:
+        assert f'"{preencoded_requests._METHOD_PATH}"' in f.read()
+
+
+def test_encoded_request_parses_as_request():
+    operations = [_serialized_operation("a" * 64), _serialized_operation("b")]
+
+    (payload,) = preencoded_requests.iter_encoded_requests(
+        _RESOURCE_NAME, operations, validate_only=True
+    )
+
+    request = AddOfflineUserDataJobOperationsRequest.pb().FromString(payload)
+    assert request.resource_name == _RESOURCE_NAME
+    assert request.enable_partial_failure
+    assert request.validate_only
+    assert [
+        operation.create.user_identifiers[0].hashed_email
+        for operation in request.operations
+    ] == ["a" * 64, "b"]
+
+
+def test_requests_are_split_at_the_operation_limit():
+    operations = [_serialized_operation(str(i)) for i in range(5)]
+
+    payloads = list(
+        preencoded_requests.iter_encoded_requests(
+            _RESOURCE_NAME, operations, max_operations_per_request=2
+        )
+    )
+
+    assert [
+        len(AddOfflineUserDataJobOperationsRequest.pb().FromString(p).operations)
+        for p in payloads
+    ] == [2, 2, 1]
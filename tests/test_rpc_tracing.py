@@ -0,0 +1,77 @@
+"""Tests for rpc_tracing."""
+
+import argparse
+import collections
+import json
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsRequest,
+)
+from google.auth.credentials import AnonymousCredentials
+
+import rpc_tracing
+
+
+_CallDetails = collections.namedtuple("_CallDetails", "method")
+_METHOD = "/google.ads.googleads.v14.services.GoogleAdsService/Search"
+
+
+class _Response:
+    def trailing_metadata(self):
+        return (("request-id", "abc"),)
+
+
+def _call(tracer, request):
+    return tracer.interceptor.intercept_unary_unary(
+        lambda details, request: _Response(), _CallDetails(_METHOD), request
+    )
+
+
+def test_unpinned_client_uses_its_default_version():
+    client = GoogleAdsClient(
+        AnonymousCredentials(), "developer-token", use_proto_plus=False
+    )
+    traced_client = rpc_tracing.TracedClient(client, rpc_tracing.RpcTracer())
+
+    service = traced_client.get_service("GoogleAdsService")
+
+    assert type(service).__name__ == "GoogleAdsServiceClient"
+
+
+def test_span_log_records_message_and_encoded_request_sizes(tmp_path):
+    span_log_path = tmp_path / "spans.jsonl"
+    tracer = rpc_tracing.RpcTracer(str(span_log_path))
+    request = SearchGoogleAdsRequest.pb()(customer_id="1234567890")
+
+    _call(tracer, request)
+    _call(tracer, b"12345")
+    tracer.close()
+
+    spans = [json.loads(line) for line in span_log_path.read_text().splitlines()]
+    assert [span["request_bytes"] for span in spans] == [request.ByteSize(), 5]
+    assert spans[0]["customer_id"] == "1234567890"
+    assert spans[0]["request_id"] == "abc"
+
+
+def test_trace_argument_is_optional_and_takes_an_optional_path():
+    parser = argparse.ArgumentParser()
+    rpc_tracing.add_trace_argument(parser)
+
+    assert parser.parse_args([]).trace is None
+    assert parser.parse_args(["--trace"]).trace == ""
+    assert parser.parse_args(["--trace", "spans.jsonl"]).trace == "spans.jsonl"
+
+
+def test_trace_run_without_trace_yields_the_client():
+    client = object()
+
+    with rpc_tracing.trace_run(client, None) as traced_client:
+        assert traced_client is client
+
+
+def test_trace_run_prints_the_report(capsys):
+    with rpc_tracing.trace_run(object(), "") as traced_client:
+        _call(traced_client.tracer, b"")
+
+    assert f"Method {_METHOD}: 1 calls" in capsys.readouterr().out
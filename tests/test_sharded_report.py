@@ -0,0 +1,120 @@
+"""Tests for sharded_report."""
+
+import datetime
+
+import pytest
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsStreamResponse,
+)
+
+import sharded_report
+
+
+_QUERY = """
+    SELECT campaign.id, segments.date, metrics.clicks
+    FROM campaign
+    WHERE campaign.name = 'ORDER BY x LIMIT 1'
+    ORDER BY campaign.id DESC, segments.date"""
+
+
+class _Client:
+    """Answers each shard with the rows registered for its date condition."""
+
+    def __init__(self, rows_by_date):
+        self.rows_by_date = rows_by_date
+        self.queries = []
+
+    def get_service(self, name):
+        return self
+
+    def search_stream(self, customer_id, query):
+        self.queries.append(query)
+        batch = SearchGoogleAdsStreamResponse.pb()()
+        for date, campaign_ids in self.rows_by_date.items():
+            if f"'{date}' AND" in query:
+                for campaign_id in campaign_ids:
+                    row = batch.results.add()
+                    row.campaign.id = campaign_id
+                    row.segments.date = date
+        return [batch]
+
+
+def test_condition_is_added_to_the_where_clause_only():
+    query = sharded_report.add_condition(_QUERY, "campaign.id > 5")
+
+    assert sharded_report.parse_query(query) == {
+        "SELECT": "campaign.id, segments.date, metrics.clicks",
+        "FROM": "campaign",
+        "WHERE": "campaign.name = 'ORDER BY x LIMIT 1' AND campaign.id > 5",
+        "ORDER BY": "campaign.id DESC, segments.date",
+    }
+
+
+def test_where_clause_is_created_before_order_by():
+    assert sharded_report.add_condition(
+        "SELECT campaign.id FROM campaign ORDER BY campaign.id LIMIT 10",
+        "campaign.id > 5",
+    ) == (
+        "SELECT campaign.id FROM campaign WHERE campaign.id > 5 "
+        "ORDER BY campaign.id LIMIT 10"
+    )
+
+
+def test_repeated_clause_raises_value_error():
+    with pytest.raises(ValueError, match="WHERE clause"):
+        sharded_report.parse_query(
+            "SELECT campaign.id FROM campaign WHERE a = 1 WHERE b = 2"
+        )
+
+
+def test_non_positive_days_per_shard_raises_value_error():
+    with pytest.raises(ValueError, match="must be positive"):
+        sharded_report.date_range_conditions(
+            datetime.date(2023, 1, 1), datetime.date(2023, 1, 2), 0
+        )
+
+
+def _run(client, query):
+    conditions = sharded_report.date_range_conditions(
+        datetime.date(2023, 1, 1), datetime.date(2023, 1, 3), 1
+    )
+    return [
+        (row.campaign.id, row.segments.date)
+        for row in sharded_report.run_sharded_report(
+            client, "1234567890", query, conditions, max_workers=2
+        )
+    ]
+
+
+def test_shards_are_merged_in_order_by_order():
+    client = _Client(
+        {"2023-01-01": [3, 1], "2023-01-02": [2], "2023-01-03": [3, 2]}
+    )
+
+    assert _run(client, _QUERY) == [
+        (3, "2023-01-01"),
+        (3, "2023-01-03"),
+        (2, "2023-01-02"),
+        (2, "2023-01-03"),
+        (1, "2023-01-01"),
+    ]
+
+
+def test_limit_applies_to_the_whole_report():
+    client = _Client(
+        {"2023-01-01": [3, 1], "2023-01-02": [2], "2023-01-03": [3, 2]}
+    )
+
+    assert _run(client, f"{_QUERY} LIMIT 3") == [
+        (3, "2023-01-01"),
+        (3, "2023-01-03"),
+        (2, "2023-01-02"),
+    ]
+
+
+def test_without_order_by_shards_are_concatenated():
+    client = _Client({"2023-01-01": [3, 1], "2023-01-03": [2]})
+
+    assert _run(
+        client, "SELECT campaign.id, segments.date FROM campaign"
+    ) == [(3, "2023-01-01"), (1, "2023-01-01"), (2, "2023-01-03")]
@@ -0,0 +1,36 @@
+"""Tests for sharded_transform."""
+
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    OfflineUserDataJobOperation,
+)
+
+import sharded_transform
+from identifier_hashing import normalize_and_hash
+
+
+def test_operations_match_the_in_process_hashing():
+    record = {
+        "email": " Dana@Example.com ",
+        "phone": "+1 800 5550101",
+        "first_name": "Alex",
+        "last_name": "Quinn",
+        "country_code": "US",
+        "postal_code": "94045",
+    }
+
+    (serialized,) = sharded_transform.serialize_contact_info_records([record])
+
+    operation = OfflineUserDataJobOperation.pb().FromString(serialized)
+    email, phone, address = operation.create.user_identifiers
+    assert email.hashed_email == normalize_and_hash(record["email"], True)
+    assert phone.hashed_phone_number == normalize_and_hash(
+        record["phone"], True
+    )
+    assert address.address_info.hashed_first_name == normalize_and_hash(
+        "Alex", False
+    )
+    assert address.address_info.postal_code == "94045"
+
+
+def test_records_without_identifiers_are_skipped():
+    assert sharded_transform.serialize_contact_info_records([{}]) == []
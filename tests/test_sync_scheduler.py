@@ -0,0 +1,91 @@
+"""Tests for sync_scheduler."""
+
+import grpc
+import pytest
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsStreamResponse,
+)
+
+import sync_scheduler
+import worker_daemon
+
+
+_USER_LIST = "customers/1234567890/userLists/5678"
+_DAY = 24 * 60 * 60
+
+
+class _Unavailable(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+
+class _Client:
+    """Answers the in-flight job query, failing it while fail is set."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def get_service(self, name):
+        return self
+
+    def search_stream(self, customer_id, query):
+        if self.fail:
+            raise _Unavailable()
+        return [SearchGoogleAdsStreamResponse.pb()()]
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    database_path = str(tmp_path / "jobs.sqlite")
+    queue = worker_daemon.JobQueue(database_path)
+    scheduler = sync_scheduler.SyncScheduler(_Client(), queue, database_path)
+    yield scheduler
+    scheduler.close()
+    queue.close()
+
+
+def test_malformed_user_list_is_rejected_when_added(scheduler):
+    with pytest.raises(ValueError, match="not a user list resource name"):
+        scheduler.add_schedule(
+            "sync",
+            "get_campaigns",
+            {},
+            _DAY,
+            user_list_resource_name="userLists/5678",
+        )
+
+
+def test_api_error_leaves_user_list_schedules_due(scheduler):
+    scheduler.add_schedule(
+        "sync", "get_campaigns", {}, _DAY, user_list_resource_name=_USER_LIST
+    )
+    scheduler.add_schedule("report", "get_campaigns", {}, _DAY)
+    scheduler.client.fail = True
+    now = max(s["next_run_at"] for s in scheduler.list_schedules())
+
+    submitted, skipped = scheduler.tick(now)
+
+    assert [name for name, _ in submitted] == ["report"]
+    assert "UNAVAILABLE" in skipped["sync"]
+
+    scheduler.client.fail = False
+    submitted, skipped = scheduler.tick(now)
+
+    assert [name for name, _ in submitted] == ["sync"]
+    assert skipped == {}
+
+
+def test_stored_malformed_user_list_skips_only_its_schedule(scheduler):
+    scheduler.add_schedule("report", "get_campaigns", {}, _DAY)
+    with scheduler.connection:
+        scheduler.connection.execute(
+            "INSERT INTO schedule VALUES "
+            "('old', 'get_campaigns', '{}', 'userLists/1', ?, 0, 0, NULL)",
+            (_DAY,),
+        )
+    now = max(s["next_run_at"] for s in scheduler.list_schedules())
+
+    submitted, skipped = scheduler.tick(now)
+
+    assert [name for name, _ in submitted] == ["report"]
+    assert "not a user list resource name" in skipped["old"]
@@ -0,0 +1,97 @@
+"""Tests for transport_profiles."""
+
+import copy
+
+import pytest
+from google.ads.googleads import client as googleads_client_module
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.v14.services.services.google_ads_service.transports.grpc import (
+    GoogleAdsServiceGrpcTransport,
+)
+from google.auth.credentials import AnonymousCredentials
+
+import transport_profiles
+
+
+def _client(version=None):
+    return GoogleAdsClient(
+        AnonymousCredentials(),
+        "developer-token",
+        use_proto_plus=False,
+        version=version,
+    )
+
+
+def test_unpinned_client_uses_the_library_default_version():
+    client = transport_profiles.ProfiledClient(
+        _client(), transport_profiles.PROFILES["default"]
+    )
+
+    service = client.get_service("GoogleAdsService")
+
+    assert type(service).__module__.startswith(
+        f"google.ads.googleads.{googleads_client_module._DEFAULT_VERSION}."
+    )
+
+
+def test_pinned_client_version_takes_precedence():
+    client = transport_profiles.ProfiledClient(
+        _client("v14"), transport_profiles.PROFILES["default"]
+    )
+
+    service = client.get_service("GoogleAdsService", version="v13")
+
+    assert type(service).__module__.startswith("google.ads.googleads.v14.")
+
+
+def test_channels_use_the_profile_options_without_changing_the_library(
+    monkeypatch,
+):
+    library_options = copy.deepcopy(
+        googleads_client_module._GRPC_CHANNEL_OPTIONS
+    )
+    created_options = []
+    create_channel = GoogleAdsServiceGrpcTransport.create_channel
+
+    def record_options(*args, **kwargs):
+        created_options.append(kwargs["options"])
+        return create_channel(*args, **kwargs)
+
+    monkeypatch.setattr(
+        GoogleAdsServiceGrpcTransport, "create_channel", record_options
+    )
+    profile = transport_profiles.PROFILES["mutates"]
+    client = transport_profiles.ProfiledClient(_client("v14"), profile)
+
+    service = client.get_service("GoogleAdsService")
+
+    assert len(service.services) == profile.channels_per_service
+    assert created_options == [
+        profile.channel_options(library_options)
+    ] * profile.channels_per_service
+    assert googleads_client_module._GRPC_CHANNEL_OPTIONS == library_options
+
+
+def test_unknown_service_raises_value_error():
+    client = transport_profiles.ProfiledClient(
+        _client("v14"), transport_profiles.PROFILES["default"]
+    )
+
+    with pytest.raises(ValueError, match="does not exist"):
+        client.get_service("UnknownService")
+
+
+def test_benchmark_profile_sends_every_request():
+    server, address = transport_profiles.start_benchmark_server(max_workers=4)
+    try:
+        result = transport_profiles.benchmark_profile(
+            transport_profiles.PROFILES["bulk_upload"],
+            address,
+            transport_profiles.benchmark_payload(1024),
+            num_requests=8,
+            concurrency=4,
+        )
+    finally:
+        server.stop(None)
+
+    assert result["requests_per_second"] > 0
@@ -0,0 +1,56 @@
+"""Tests for user_list_sizes."""
+
+import pytest
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    SearchGoogleAdsStreamResponse,
+)
+
+import user_list_sizes
+
+
+class _Client:
+    """Returns a GoogleAdsService answering with raw protobuf rows."""
+
+    def __init__(self, batch):
+        self.batch = batch
+
+    def get_service(self, name):
+        return self
+
+    def search_stream(self, customer_id, query):
+        return [self.batch]
+
+
+def test_sizes_are_read_from_raw_protobuf_rows():
+    batch = SearchGoogleAdsStreamResponse.pb()()
+    row = batch.results.add()
+    row.user_list.id = 7
+    row.user_list.resource_name = "customers/1234567890/userLists/7"
+    row.user_list.name = "Customers"
+    row.user_list.membership_status = 2  # OPEN
+    row.user_list.crm_based_user_list.upload_key_type = 2  # CONTACT_INFO
+    row.user_list.size_for_display = 1000
+    row.user_list.size_for_search = 2000
+
+    (sizes,) = user_list_sizes.fetch_user_list_sizes(
+        _Client(batch), "1234567890", [7]
+    )
+
+    assert sizes["membership_status"] == "OPEN"
+    assert sizes["upload_key_type"] == "CONTACT_INFO"
+    assert sizes["size_for_search"] == 2000
+
+
+def test_resource_names_are_grouped_by_customer():
+    assert user_list_sizes.group_by_customer(
+        [
+            "customers/1/userLists/10",
+            "customers/2/userLists/3",
+            "customers/1/userLists/9",
+        ]
+    ) == {"1": ["9", "10"], "2": ["3"]}
+
+
+def test_invalid_resource_name_raises_value_error():
+    with pytest.raises(ValueError, match="not a user list resource name"):
+        user_list_sizes.group_by_customer(["customers/1/campaigns/2"])
@@ -0,0 +1,113 @@
+"""Tests for user_list_sync."""
+
+import json
+
+import pytest
+from google.ads.googleads.v14.enums.types.offline_user_data_job_status import (
+    OfflineUserDataJobStatusEnum,
+)
+from google.ads.googleads.v14.services.types.google_ads_service import (
+    GoogleAdsRow,
+)
+
+import user_list_sync
+
+
+_RESOURCE_NAME = "customers/1234567890/offlineUserDataJobs/1"
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "state")
+
+
+def _stage_pending_state(state_path, operations, run):
+    user_list_sync.spool_operations(operations, f"{state_path}.new")
+    with open(f"{state_path}.job", "w") as f:
+        json.dump({"resource_name": _RESOURCE_NAME, "run": run}, f)
+
+
+class _Client:
+    """Answers job status queries with raw protobuf rows."""
+
+    def __init__(self, status=None):
+        self.status = status
+
+    def get_service(self, name):
+        return self
+
+    def search(self, customer_id, query):
+        if self.status is None:
+            return []
+        row = GoogleAdsRow.pb()()
+        row.offline_user_data_job.status = (
+            OfflineUserDataJobStatusEnum.OfflineUserDataJobStatus[self.status]
+        )
+        return [row]
+
+
+def _state_operations(state_path):
+    spool, _ = user_list_sync.load_state(state_path)
+    if spool is None:
+        return None
+    with spool:
+        return list(spool.iter_operations())
+
+
+def test_without_pending_state_nothing_happens(state_path):
+    assert (
+        user_list_sync.resolve_pending_state(None, "1234567890", state_path)
+        is None
+    )
+
+
+def test_successful_job_promotes_the_pending_state(state_path):
+    _stage_pending_state(state_path, [b"a", b"b"], run=True)
+
+    status = user_list_sync.resolve_pending_state(
+        _Client("SUCCESS"), "1234567890", state_path
+    )
+
+    assert status == "SUCCESS"
+    assert _state_operations(state_path) == [b"a", b"b"]
+
+
+@pytest.mark.parametrize(
+    "status, run", [("FAILED", True), ("PENDING", False)]
+)
+def test_unapplied_job_keeps_the_previous_state(state_path, status, run):
+    user_list_sync.spool_operations([b"old"], f"{state_path}.new")
+    user_list_sync._promote(f"{state_path}.new", state_path)
+    _stage_pending_state(state_path, [b"new"], run)
+
+    assert (
+        user_list_sync.resolve_pending_state(
+            _Client(status), "1234567890", state_path
+        )
+        == status
+    )
+    assert _state_operations(state_path) == [b"old"]
+    assert (
+        user_list_sync.resolve_pending_state(None, "1234567890", state_path)
+        is None
+    )
+
+
+@pytest.mark.parametrize(
+    "status, run", [("RUNNING", True), ("PENDING", True)]
+)
+def test_running_job_blocks_the_next_sync(state_path, status, run):
+    _stage_pending_state(state_path, [b"a"], run)
+
+    with pytest.raises(RuntimeError, match="still running"):
+        user_list_sync.resolve_pending_state(
+            _Client(status), "1234567890", state_path
+        )
+    assert _state_operations(state_path) is None
+
+
+def test_missing_job_raises_value_error():
+    with pytest.raises(ValueError, match="was not found"):
+        user_list_sync.get_job_status(
+            _Client(), "1234567890", _RESOURCE_NAME
+        )
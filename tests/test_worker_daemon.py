@@ -0,0 +1,20 @@
+"""Tests for worker_daemon."""
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.auth.credentials import AnonymousCredentials
+
+import worker_daemon
+
+
+def test_unpinned_client_shares_services_of_its_default_version():
+    client = worker_daemon.SharedServiceClient(
+        GoogleAdsClient(
+            AnonymousCredentials(), "developer-token", use_proto_plus=False
+        )
+    )
+
+    service = client.get_service("GoogleAdsService")
+
+    assert type(service).__name__ == "GoogleAdsServiceClient"
+    assert client.get_service("GoogleAdsService") is service
+    assert client.get_service("GoogleAdsService", version="v14") is not service
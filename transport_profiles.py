@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+"""Tunes the gRPC channels of Google Ads services for different workloads.
+
+GoogleAdsClient.get_service opens one channel per service with fixed options.
+A TransportProfile sets the number of channels per service, keepalive pings,
+maximum message sizes and compression. ProfiledClient wraps a client so that
+every service it creates uses a profile:
+
+    client = ProfiledClient(client, PROFILES["bulk_upload"])
+    service = client.get_service("OfflineUserDataJobService")
+
+With more than one channel per service, calls are spread round-robin across
+the channels. Each channel gets its own connection, so large uploads do not
+queue behind each other on one HTTP/2 connection.
+
+Running this module starts a local gRPC server and measures the throughput of
+every profile for small and large requests, without calling the API:
+
+    python transport_profiles.py --num_requests 200
+"""
+
+import argparse
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from concurrent import futures
+
+import grpc
+from google.ads.googleads import client as googleads_client_module
+from google.ads.googleads.interceptors import (
+    ExceptionInterceptor,
+    LoggingInterceptor,
+    MetadataInterceptor,
+)
+
+
+_MIB = 2 ** 20
+_COMPRESSION = {
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+# The logger GoogleAdsClient.get_service passes to its LoggingInterceptor.
+_logger = logging.getLogger(googleads_client_module.__name__)
+_BENCHMARK_METHOD = "/transport_profiles.Benchmark/Call"
+_DEFAULT_PAYLOAD_SIZES = (2 * 1024, 8 * _MIB)
+
+
+class TransportProfile:
+    """The channel settings of the services created with a profile."""
+
+    def __init__(
+        self,
+        name,
+        channels_per_service=1,
+        keepalive_time_ms=None,
+        keepalive_timeout_ms=None,
+        max_send_message_length=None,
+        max_receive_message_length=None,
+        compression=None,
+    ):
+        """Initializes the profile.
+
+        Args:
+            name: The name of the profile.
+            channels_per_service: The number of channels opened for each
+                service. Calls are spread round-robin across them.
+            keepalive_time_ms: If set, the interval of keepalive pings, which
+                keep long streams and idle connections from being dropped.
+            keepalive_timeout_ms: How long to wait for a keepalive ping to be
+                acknowledged before the connection is considered dead.
+            max_send_message_length: If set, the largest request in bytes.
+            max_receive_message_length: If set, the largest response in bytes.
+                Otherwise the client library's default of 64 MiB is kept.
+            compression: None, "gzip" or "deflate", to compress requests.
+
+        Raises:
+            ValueError: If the compression is unknown.
+        """
+        if compression is not None and compression not in _COMPRESSION:
+            raise ValueError(
+                f"Unknown compression '{compression}', expected one of "
+                f"{sorted(_COMPRESSION)}."
+            )
+        self.name = name
+        self.channels_per_service = channels_per_service
+        self.keepalive_time_ms = keepalive_time_ms
+        self.keepalive_timeout_ms = keepalive_timeout_ms
+        self.max_send_message_length = max_send_message_length
+        self.max_receive_message_length = max_receive_message_length
+        self.compression = compression
+
+    def channel_options(self, base_options=()):
+        """Returns the gRPC channel options of the profile.
+
+        Args:
+            base_options: A sequence of (key, value) channel options that the
+                profile's settings are applied on top of.
+
+        Returns:
+            A list of (key, value) channel options.
+        """
+        options = dict(base_options)
+        if self.keepalive_time_ms is not None:
+            options["grpc.keepalive_time_ms"] = self.keepalive_time_ms
+        if self.keepalive_timeout_ms is not None:
+            options["grpc.keepalive_timeout_ms"] = self.keepalive_timeout_ms
+        if self.max_send_message_length is not None:
+            options["grpc.max_send_message_length"] = (
+                self.max_send_message_length
+            )
+        if self.max_receive_message_length is not None:
+            options["grpc.max_receive_message_length"] = (
+                self.max_receive_message_length
+            )
+        if self.compression is not None:
+            options["grpc.default_compression_algorithm"] = int(
+                _COMPRESSION[self.compression]
+            )
+        if self.channels_per_service > 1:
+            # Channels with equal options otherwise share their connections
+            # through the global subchannel pool.
+            options["grpc.use_local_subchannel_pool"] = 1
+        return list(options.items())
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        # The settings of GoogleAdsClient.get_service.
+        TransportProfile("default"),
+        # Long search_stream reports with large pages.
+        TransportProfile(
+            "reports",
+            keepalive_time_ms=60 * 1000,
+            keepalive_timeout_ms=20 * 1000,
+            max_receive_message_length=256 * _MIB,
+        ),
+        # Large AddOfflineUserDataJobOperations requests.
+        TransportProfile(
+            "bulk_upload",
+            channels_per_service=4,
+            keepalive_time_ms=60 * 1000,
+            keepalive_timeout_ms=20 * 1000,
+            max_send_message_length=64 * _MIB,
+        ),
+        # The same for slow links. Hex SHA-256 hashes compress to about half
+        # their size, but gzip costs far more CPU time than it saves on a
+        # fast link.
+        TransportProfile(
+            "bulk_upload_gzip",
+            channels_per_service=4,
+            keepalive_time_ms=60 * 1000,
+            keepalive_timeout_ms=20 * 1000,
+            max_send_message_length=64 * _MIB,
+            compression="gzip",
+        ),
+        # Many small concurrent mutate requests.
+        TransportProfile(
+            "mutates",
+            channels_per_service=8,
+            keepalive_time_ms=60 * 1000,
+            keepalive_timeout_ms=20 * 1000,
+        ),
+    )
+}
+
+
+class RoundRobinService:
+    """Spreads calls across several clients of the same service.
+
+    Every attribute lookup is answered by the next client in turn, so each
+    call goes to the next channel. Path helpers such as user_list_path return
+    the same result from any client.
+    """
+
+    def __init__(self, services):
+        """Initializes the service.
+
+        Args:
+            services: A list of service clients, each with its own channel.
+        """
+        self.services = services
+        self._next = itertools.cycle(services)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        with self._lock:
+            service = next(self._next)
+        return getattr(service, name)
+
+
+class ProfiledClient:
+    """Wraps a GoogleAdsClient so that every service uses a profile.
+
+    Every other attribute is taken from the wrapped client.
+    """
+
+    def __init__(self, client, profile):
+        """Initializes the wrapper.
+
+        Args:
+            client: The Google Ads client.
+            profile: A TransportProfile.
+        """
+        self._client = client
+        self.profile = profile
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _create_service(self, service_client_class, version, interceptors):
+        # Follows GoogleAdsClient.get_service, which takes no channel options.
+        client = self._client
+        transport_class = service_client_class.get_transport_class()
+        endpoint = client.endpoint or service_client_class.DEFAULT_ENDPOINT
+        channel = transport_class.create_channel(
+            host=endpoint,
+            credentials=client.credentials,
+            options=self.profile.channel_options(
+                googleads_client_module._GRPC_CHANNEL_OPTIONS
+            ),
+        )
+        channel = grpc.intercept_channel(
+            channel,
+            *(interceptors or []),
+            MetadataInterceptor(
+                client.developer_token,
+                client.login_customer_id,
+                client.linked_customer_id,
+                client.use_cloud_org_for_api_access,
+            ),
+            LoggingInterceptor(_logger, version, endpoint),
+            ExceptionInterceptor(
+                version, use_proto_plus=client.use_proto_plus
+            ),
+        )
+        transport = transport_class(
+            channel=channel, client_info=googleads_client_module._CLIENT_INFO
+        )
+        return service_client_class(transport=transport)
+
+    def get_service(self, name, version=None, interceptors=None):
+        """Returns a service client whose channels use the profile.
+
+        Args:
+            name: The name of the service, for example "GoogleAdsService".
+            version: The API version. As with GoogleAdsClient.get_service, the
+                version the client was created with takes precedence, and
+                the client library's default version is used if neither is
+                set.
+            interceptors: Additional interceptors of the service's calls.
+
+        Returns:
+            A service client, or a RoundRobinService if the profile opens
+            more than one channel per service.
+        """
+        version = (
+            self._client.version
+            or version
+            or googleads_client_module._DEFAULT_VERSION
+        )
+        api_module = self._client._get_api_services_by_version(version)
+        service_client_class = getattr(api_module, f"{name}Client", None)
+        if service_client_class is None:
+            raise ValueError(
+                f"Service '{name}' does not exist in Google Ads API {version}."
+            )
+        services = [
+            self._create_service(service_client_class, version, interceptors)
+            for _ in range(self.profile.channels_per_service)
+        ]
+        if len(services) == 1:
+            return services[0]
+        return RoundRobinService(services)
+
+
+def benchmark_payload(size):
+    """Returns a payload of hex SHA-256 hashes, like a hashed user list."""
+    hashes = []
+    total = 0
+    for index in itertools.count():
+        digest = hashlib.sha256(f"user{index}@example.com".encode())
+        hashes.append(digest.hexdigest().encode())
+        total += 64
+        if total >= size:
+            break
+    return b"".join(hashes)[:size]
+
+
+def start_benchmark_server(port=0, max_workers=32):
+    """Starts a local server that answers every call with an empty response.
+
+    Args:
+        port: The port to listen on, or 0 to pick a free one.
+        max_workers: The number of threads serving calls.
+
+    Returns:
+        A tuple of the started grpc.Server and its address.
+    """
+    service, method = _BENCHMARK_METHOD.lstrip("/").split("/")
+    handler = grpc.method_handlers_generic_handler(
+        service,
+        {
+            method: grpc.unary_unary_rpc_method_handler(
+                lambda request, context: b""
+            )
+        },
+    )
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max_workers),
+        handlers=[handler],
+        options=[("grpc.max_receive_message_length", -1)],
+    )
+    port = server.add_insecure_port(f"localhost:{port}")
+    server.start()
+    return server, f"localhost:{port}"
+
+
+def benchmark_profile(profile, address, payload, num_requests, concurrency):
+    """Measures the throughput of a profile against a benchmark server.
+
+    Args:
+        profile: A TransportProfile.
+        address: The address of a server from start_benchmark_server.
+        payload: The bytes sent with each request.
+        num_requests: The number of requests to send.
+        concurrency: The number of requests in flight at a time.
+
+    Returns:
+        A dict with the "seconds" taken, "requests_per_second" and
+        "megabytes_per_second" of uncompressed payload.
+    """
+    options = profile.channel_options(
+        googleads_client_module._GRPC_CHANNEL_OPTIONS
+    )
+    channels = [
+        grpc.insecure_channel(address, options=options)
+        for _ in range(profile.channels_per_service)
+    ]
+    try:
+        calls = itertools.cycle(
+            [channel.unary_unary(_BENCHMARK_METHOD) for channel in channels]
+        )
+        lock = threading.Lock()
+
+        def send(_):
+            with lock:
+                call = next(calls)
+            call(payload)
+
+        # Connects every channel before the clock starts.
+        for channel in channels:
+            grpc.channel_ready_future(channel).result(timeout=10)
+        start = time.perf_counter()
+        with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(send, range(num_requests)))
+        seconds = time.perf_counter() - start
+    finally:
+        for channel in channels:
+            channel.close()
+    return {
+        "seconds": seconds,
+        "requests_per_second": num_requests / seconds,
+        "megabytes_per_second": num_requests * len(payload) / _MIB / seconds,
+    }
+
+
+def main(profile_names, payload_sizes, num_requests, concurrency):
+    server, address = start_benchmark_server()
+    try:
+        for payload_size in payload_sizes:
+            payload = benchmark_payload(payload_size)
+            for name in profile_names:
+                result = benchmark_profile(
+                    PROFILES[name], address, payload, num_requests, concurrency
+                )
+                print(
+                    f"Profile {name} with {payload_size} byte requests: "
+                    f"{result['requests_per_second']:.1f} requests/s, "
+                    f"{result['megabytes_per_second']:.1f} MiB/s."
+                )
+    finally:
+        server.stop(None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Measures the throughput of every transport profile against a "
+            "local gRPC server."
+        )
+    )
+    parser.add_argument(
+        "--profiles",
+        choices=sorted(PROFILES),
+        nargs="+",
+        default=list(PROFILES),
+        help="The profiles to measure.",
+    )
+    parser.add_argument(
+        "--payload_sizes",
+        type=int,
+        nargs="+",
+        default=list(_DEFAULT_PAYLOAD_SIZES),
+        help="The request sizes to measure, in bytes.",
+    )
+    parser.add_argument(
+        "-n",
+        "--num_requests",
+        type=int,
+        default=200,
+        help="The number of requests sent per profile and size.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="The number of requests in flight at a time.",
+    )
+    args = parser.parse_args()
+
+    main(args.profiles, args.payload_sizes, args.num_requests, args.concurrency)
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+"""Reports the sizes of many Customer Match user lists with few queries.
+
+print_customer_match_user_list_info in add_customer_match_user_list.py issues
+one search per user list. Here the lists are grouped by customer, the sizes,
+membership status and upload key type of all lists of a customer are fetched
+with a single search_stream, and the customers are queried concurrently.
+
+Every fetch can be appended to a local SQLite time series, so list growth can
+be tracked from the history without querying the API again.
+"""
+
+import argparse
+import datetime
+import re
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v14.enums.types.customer_match_upload_key_type import CustomerMatchUploadKeyTypeEnum
+from google.ads.googleads.v14.enums.types.user_list_membership_status import UserListMembershipStatusEnum
+
+
+_DEFAULT_DATABASE_PATH = "./user_list_sizes.sqlite"
+_DEFAULT_MAX_WORKERS = 8
+_DATE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_USER_LIST_RESOURCE_NAME = re.compile(r"customers/(\d+)/userLists/(\d+)")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS user_list_size (
+        customer_id TEXT NOT NULL,
+        user_list_id INTEGER NOT NULL,
+        fetched_at TEXT NOT NULL,
+        name TEXT,
+        membership_status TEXT,
+        upload_key_type TEXT,
+        size_for_display INTEGER,
+        size_for_search INTEGER,
+        PRIMARY KEY (customer_id, user_list_id, fetched_at)
+    );
+"""
+
+
+def group_by_customer(user_list_resource_names):
+    """Groups user list resource names by customer.
+
+    Args:
+        user_list_resource_names: An iterable of resource names in the form
+            customers/{customer_id}/userLists/{user_list_id}.
+
+    Returns:
+        A dict mapping customer IDs to sorted lists of user list IDs.
+
+    Raises:
+        ValueError: If a resource name is not a user list resource name.
+    """
+    user_list_ids = {}
+    for resource_name in user_list_resource_names:
+        match = _USER_LIST_RESOURCE_NAME.fullmatch(resource_name)
+        if match is None:
+            raise ValueError(
+                f"'{resource_name}' is not a user list resource name."
+            )
+        user_list_ids.setdefault(match.group(1), set()).add(match.group(2))
+    return {
+        customer_id: sorted(ids, key=int)
+        for customer_id, ids in user_list_ids.items()
+    }
+
+
+def fetch_user_list_sizes(client, customer_id, user_list_ids=None):
+    """Fetches the sizes of the user lists of a customer in one query.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The ID for the customer that owns the user lists.
+        user_list_ids: The IDs of the user lists. If None, every Customer
+            Match user list of the customer is fetched.
+
+    Returns:
+        A list of dicts with the keys "customer_id", "user_list_id",
+        "resource_name", "name", "membership_status", "upload_key_type",
+        "size_for_display" and "size_for_search", ordered by user list ID.
+    """
+    if user_list_ids is None:
+        condition = "user_list.type = 'CRM_BASED'"
+    else:
+        if not user_list_ids:
+            return []
+        condition = f"user_list.id IN ({', '.join(map(str, user_list_ids))})"
+    query = f"""
+        SELECT
+          user_list.id,
+          user_list.resource_name,
+          user_list.name,
+          user_list.membership_status,
+          user_list.crm_based_user_list.upload_key_type,
+          user_list.size_for_display,
+          user_list.size_for_search
+        FROM user_list
+        WHERE {condition}
+        ORDER BY user_list.id"""
+
+    googleads_service = client.get_service("GoogleAdsService")
+    membership_status_enum = (
+        UserListMembershipStatusEnum.UserListMembershipStatus
+    )
+    upload_key_type_enum = (
+        CustomerMatchUploadKeyTypeEnum.CustomerMatchUploadKeyType
+    )
+    stream = googleads_service.search_stream(
+        customer_id=customer_id, query=query
+    )
+    sizes = []
+    for batch in stream:
+        for row in batch.results:
+            user_list = row.user_list
+            sizes.append(
+                {
+                    "customer_id": customer_id,
+                    "user_list_id": user_list.id,
+                    "resource_name": user_list.resource_name,
+                    "name": user_list.name,
+                    "membership_status": membership_status_enum(
+                        user_list.membership_status
+                    ).name,
+                    "upload_key_type": upload_key_type_enum(
+                        user_list.crm_based_user_list.upload_key_type
+                    ).name,
+                    "size_for_display": user_list.size_for_display,
+                    "size_for_search": user_list.size_for_search,
+                }
+            )
+    return sizes
+
+
+def fetch_sizes_for_resource_names(
+    client, user_list_resource_names, max_workers=_DEFAULT_MAX_WORKERS
+):
+    """Fetches the sizes of user lists across customers.
+
+    One query is issued per customer, and the queries run concurrently.
+
+    Args:
+        client: The Google Ads client. Its login customer ID must have access
+            to every customer.
+        user_list_resource_names: An iterable of user list resource names.
+        max_workers: The maximum number of concurrent queries.
+
+    Returns:
+        A list of dicts as returned by fetch_user_list_sizes, ordered by
+        customer ID and user list ID.
+    """
+    user_list_ids = group_by_customer(user_list_resource_names)
+    customer_ids = sorted(user_list_ids, key=int)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda customer_id: fetch_user_list_sizes(
+                client, customer_id, user_list_ids[customer_id]
+            ),
+            customer_ids,
+        )
+        return [size for sizes in results for size in sizes]
+
+
+class UserListSizeHistory:
+    """A local SQLite time series of user list sizes."""
+
+    def __init__(self, database_path=_DEFAULT_DATABASE_PATH):
+        """Opens or creates the history.
+
+        Args:
+            database_path: The path of the SQLite database file.
+        """
+        self.connection = sqlite3.connect(database_path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+    def record(self, sizes, fetched_at=None):
+        """Appends fetched sizes to the history.
+
+        Args:
+            sizes: A list of dicts as returned by fetch_user_list_sizes.
+            fetched_at: The datetime of the fetch. Defaults to now, in UTC.
+        """
+        fetched_at = (
+            fetched_at or datetime.datetime.now(datetime.timezone.utc)
+        ).strftime(_DATE_TIME_FORMAT)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO user_list_size "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        size["customer_id"],
+                        size["user_list_id"],
+                        fetched_at,
+                        size["name"],
+                        size["membership_status"],
+                        size["upload_key_type"],
+                        size["size_for_display"],
+                        size["size_for_search"],
+                    )
+                    for size in sizes
+                ],
+            )
+
+    def get_series(self, customer_id, user_list_id, since=None):
+        """Returns the recorded sizes of a user list in time order.
+
+        Args:
+            customer_id: The ID for the customer that owns the user list.
+            user_list_id: The ID of the user list.
+            since: An optional datetime, in UTC, of the earliest fetch.
+
+        Returns:
+            A list of (fetched_at, size_for_display, size_for_search) tuples.
+        """
+        query = (
+            "SELECT fetched_at, size_for_display, size_for_search "
+            "FROM user_list_size WHERE customer_id = ? AND user_list_id = ?"
+        )
+        parameters = [customer_id, user_list_id]
+        if since is not None:
+            query += " AND fetched_at >= ?"
+            parameters.append(since.strftime(_DATE_TIME_FORMAT))
+        return self.connection.execute(
+            query + " ORDER BY fetched_at", parameters
+        ).fetchall()
+
+    def get_latest_sizes(self):
+        """Returns the most recently recorded size of every user list.
+
+        Returns:
+            A dict mapping user list resource names to their latest
+            size_for_display.
+        """
+        rows = self.connection.execute(
+            """
+            SELECT customer_id, user_list_id, size_for_display
+            FROM user_list_size AS s
+            WHERE fetched_at = (
+                SELECT MAX(fetched_at)
+                FROM user_list_size
+                WHERE customer_id = s.customer_id
+                  AND user_list_id = s.user_list_id
+            )"""
+        ).fetchall()
+        return {
+            f"customers/{customer_id}/userLists/{user_list_id}": size
+            for customer_id, user_list_id, size in rows
+        }
+
+    def get_growth(self, since):
+        """Returns how much every user list grew since a point in time.
+
+        Args:
+            since: A datetime, in UTC. The first fetch at or after it is the
+                baseline of each list.
+
+        Returns:
+            A list of (customer_id, user_list_id, name,
+            size_for_display_change, size_for_search_change) tuples, ordered
+            by customer ID and user list ID.
+        """
+        return self.connection.execute(
+            """
+            WITH bounds AS (
+                SELECT
+                  customer_id,
+                  user_list_id,
+                  MIN(fetched_at) AS first_fetch,
+                  MAX(fetched_at) AS last_fetch
+                FROM user_list_size
+                WHERE fetched_at >= ?
+                GROUP BY customer_id, user_list_id
+            )
+            SELECT
+              b.customer_id,
+              b.user_list_id,
+              last.name,
+              last.size_for_display - first.size_for_display,
+              last.size_for_search - first.size_for_search
+            FROM bounds AS b
+            JOIN user_list_size AS first
+              ON first.customer_id = b.customer_id
+              AND first.user_list_id = b.user_list_id
+              AND first.fetched_at = b.first_fetch
+            JOIN user_list_size AS last
+              ON last.customer_id = b.customer_id
+              AND last.user_list_id = b.user_list_id
+              AND last.fetched_at = b.last_fetch
+            ORDER BY CAST(b.customer_id AS INTEGER), b.user_list_id""",
+            (since.strftime(_DATE_TIME_FORMAT),),
+        ).fetchall()
+
+
+def main(client, customer_ids, user_list_resource_names, database_path):
+    sizes = []
+    if user_list_resource_names:
+        sizes.extend(
+            fetch_sizes_for_resource_names(client, user_list_resource_names)
+        )
+    for customer_id in customer_ids or ():
+        sizes.extend(fetch_user_list_sizes(client, customer_id))
+
+    history = UserListSizeHistory(database_path)
+    try:
+        history.record(sizes)
+        for size in sizes:
+            print(
+                f"User list '{size['resource_name']}' ({size['name']}, "
+                f"{size['membership_status']}, {size['upload_key_type']}) "
+                f"has an estimated {size['size_for_display']} users for "
+                f"Display and {size['size_for_search']} for Search."
+            )
+        day_ago = datetime.datetime.now(
+            datetime.timezone.utc
+        ) - datetime.timedelta(days=1)
+        for customer_id, user_list_id, name, display_change, search_change in (
+            history.get_growth(day_ago)
+        ):
+            print(
+                f"In the last day, user list {user_list_id} of customer "
+                f"{customer_id} ({name}) changed by {display_change:+} users "
+                f"for Display and {search_change:+} for Search."
+            )
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Prints and records the sizes of many Customer Match user lists, "
+            "with one query per customer."
+        )
+    )
+    # At least one of the following arguments should be provided.
+    parser.add_argument(
+        "-c",
+        "--customer_ids",
+        type=str,
+        nargs="+",
+        required=False,
+        help="The IDs of customers whose Customer Match lists are reported.",
+    )
+    parser.add_argument(
+        "-u",
+        "--user_list_resource_names",
+        type=str,
+        nargs="+",
+        required=False,
+        help=(
+            "The resource names of user lists to report, in the form "
+            "customers/{customer_id}/userLists/{user_list_id}."
+        ),
+    )
+    parser.add_argument(
+        "--database_path",
+        type=str,
+        default=_DEFAULT_DATABASE_PATH,
+        help="The path of the SQLite database the sizes are recorded in.",
+    )
+    args = parser.parse_args()
+    if not args.customer_ids and not args.user_list_resource_names:
+        parser.error(
+            "one of --customer_ids or --user_list_resource_names is required"
+        )
+
+    try:
+        main(
+            googleads_client,
+            args.customer_ids,
+            args.user_list_resource_names,
+            args.database_path,
+        )
+    except GoogleAdsException as ex:
+        print(
+            f'Request with ID "{ex.request_id}" failed with status '
+            f'"{ex.error.code().name}" and includes the following errors:'
+        )
+        for error in ex.failure.errors:
+            print(f'\tError with message "{error.message}".')
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
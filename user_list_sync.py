@@ -0,0 +1,487 @@
+#!/usr/bin/env python
+"""Rebuilds or incrementally updates a Customer Match user list.
+
+Each sync keeps the operations it uploaded in an operation spool (see
+operation_spool.py), together with the SHA-256 digests of those operations in a
+DigestSet file. The next sync compares the new operations against this state
+and picks one of two modes:
+
+* replace sends a remove_all operation followed by a create operation for every
+  row, all in the same OfflineUserDataJob, so the list ends up holding exactly
+  the new rows.
+* diff sends a remove operation for every row that is no longer present and a
+  create operation for every new row, leaving unchanged rows alone.
+
+In auto mode, the churn is estimated from a sample of the new rows and the mode
+that needs fewer operations is used. Without a previous state, the list is
+always replaced.
+
+The new rows only become the state once the job that uploaded them succeeded.
+Until then they are kept as a pending state together with the resource name of
+the job, and every sync first checks that job: a successful job promotes the
+pending state, while a failed job, or one that was never run, is discarded, so
+the next diff is computed against the rows the list really holds.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from google.ads.googleads.client import GoogleAdsClient
+from google.ads.googleads.errors import GoogleAdsException
+from google.ads.googleads.v14.enums.types.offline_user_data_job_status import OfflineUserDataJobStatusEnum
+from google.ads.googleads.v14.services.types.offline_user_data_job_service import (
+    OfflineUserDataJobOperation,
+)
+
+import operation_spool
+import preencoded_requests
+from add_customer_match_user_list import (
+    check_job_status,
+    get_raw_records,
+    print_partial_failure,
+)
+from digest_store import DigestSet
+from sharded_transform import serialize_contact_info_records
+
+
+_OPERATION_PB = OfflineUserDataJobOperation.pb()
+_DIGESTS_SUFFIX = ".digests"
+_NEW_SUFFIX = ".new"
+_JOB_SUFFIX = ".job"
+_DELTA_SUFFIX = ".delta"
+_DEFAULT_SAMPLE_SIZE = 10000
+_SYNC_MODES = ("auto", "replace", "diff")
+
+
+def row_digest(serialized_operation):
+    """Returns the SHA-256 digest identifying the row of a create operation."""
+    return hashlib.sha256(serialized_operation).digest()
+
+
+def to_remove_operation(serialized_operation):
+    """Turns a serialized create operation into a remove of the same user."""
+    operation = _OPERATION_PB.FromString(serialized_operation)
+    return _OPERATION_PB(remove=operation.create).SerializeToString()
+
+
+def spool_operations(serialized_operations, spool_path):
+    """Writes create operations to a spool, dropping duplicate rows.
+
+    Args:
+        serialized_operations: An iterable of serialized create
+            OfflineUserDataJobOperations.
+        spool_path: The path of the spool file. The digests of the rows are
+            saved next to it.
+
+    Returns:
+        A DigestSet of the row digests in the spool.
+    """
+    digests = DigestSet()
+    with operation_spool.OperationSpoolWriter(spool_path) as writer:
+        for serialized_operation in serialized_operations:
+            if digests.add(row_digest(serialized_operation)):
+                writer.append(serialized_operation)
+    digests.save(f"{spool_path}{_DIGESTS_SUFFIX}")
+    return digests
+
+
+def load_state(state_path):
+    """Loads the state saved by the last successful sync.
+
+    Args:
+        state_path: The path of the state spool.
+
+    Returns:
+        A tuple of the OperationSpool and the DigestSet of its rows, or
+        (None, None) if there is no complete state.
+    """
+    if not (
+        os.path.exists(f"{state_path}{operation_spool.INDEX_SUFFIX}")
+        and os.path.exists(f"{state_path}{_DIGESTS_SUFFIX}")
+    ):
+        return None, None
+    return (
+        operation_spool.OperationSpool(state_path),
+        DigestSet.load(f"{state_path}{_DIGESTS_SUFFIX}"),
+    )
+
+
+def estimate_churn(
+    previous_digests, current_digests, sample_size=_DEFAULT_SAMPLE_SIZE
+):
+    """Estimates the number of added and removed rows from a sample.
+
+    Args:
+        previous_digests: The DigestSet of the rows in the list.
+        current_digests: The DigestSet of the rows the list should hold.
+        sample_size: The number of current rows to look up.
+
+    Returns:
+        A tuple of the estimated number of added and removed rows.
+    """
+    if not current_digests:
+        return 0, len(previous_digests)
+    # The digests are uniformly distributed, so the first ones in the set's
+    # table order form a random sample.
+    sampled = 0
+    added = 0
+    for digest in current_digests:
+        sampled += 1
+        added += digest not in previous_digests
+        if sampled == sample_size:
+            break
+    estimated_added = round(added / sampled * len(current_digests))
+    estimated_removed = max(
+        len(previous_digests) - (len(current_digests) - estimated_added), 0
+    )
+    return estimated_added, estimated_removed
+
+
+def choose_sync_mode(num_rows, estimated_added, estimated_removed):
+    """Picks the mode that needs fewer operations.
+
+    Args:
+        num_rows: The number of rows the list should hold.
+        estimated_added: The estimated number of new rows.
+        estimated_removed: The estimated number of rows to remove.
+
+    Returns:
+        "replace" or "diff".
+    """
+    # A replace sends one remove_all operation and then every row.
+    if num_rows + 1 <= estimated_added + estimated_removed:
+        return "replace"
+    return "diff"
+
+
+def iter_diff_operations(
+    previous_spool, previous_digests, current_spool, current_digests
+):
+    """Yields the operations that turn the previous rows into the current rows.
+
+    Removes come first, so that a user whose row changed is removed before
+    being added again.
+
+    Yields:
+        Serialized OfflineUserDataJobOperations.
+    """
+    for serialized_operation in previous_spool.iter_operations():
+        if row_digest(serialized_operation) not in current_digests:
+            yield to_remove_operation(serialized_operation)
+    for serialized_operation in current_spool.iter_operations():
+        if row_digest(serialized_operation) not in previous_digests:
+            yield serialized_operation
+
+
+def _create_job(client, customer_id, user_list_resource_name):
+    offline_user_data_job_service_client = client.get_service(
+        "OfflineUserDataJobService"
+    )
+    offline_user_data_job = client.get_type("OfflineUserDataJob")
+    offline_user_data_job.type_ = (
+        client.enums.OfflineUserDataJobTypeEnum.CUSTOMER_MATCH_USER_LIST
+    )
+    offline_user_data_job.customer_match_user_list_metadata.user_list = (
+        user_list_resource_name
+    )
+    response = offline_user_data_job_service_client.create_offline_user_data_job(
+        customer_id=customer_id, job=offline_user_data_job
+    )
+    print(
+        "Created an offline user data job with resource name: "
+        f"'{response.resource_name}'."
+    )
+    return response.resource_name
+
+
+def _upload(client, sender, resource_name, spool):
+    for _, response in operation_spool.upload_spool(
+        sender, resource_name, spool
+    ):
+        print_partial_failure(client, response)
+
+
+def _promote(new_path, state_path):
+    # The index is moved last, since load_state requires it.
+    for suffix in ("", _DIGESTS_SUFFIX, operation_spool.INDEX_SUFFIX):
+        os.replace(f"{new_path}{suffix}", f"{state_path}{suffix}")
+
+
+def get_job_status(client, customer_id, resource_name):
+    """Returns the status name of an offline user data job.
+
+    Raises:
+        ValueError: If the job was not found.
+    """
+    googleads_service = client.get_service("GoogleAdsService")
+    query = f"""
+        SELECT offline_user_data_job.status
+        FROM offline_user_data_job
+        WHERE offline_user_data_job.resource_name = '{resource_name}'
+        LIMIT 1"""
+    for row in googleads_service.search(customer_id=customer_id, query=query):
+        return OfflineUserDataJobStatusEnum.OfflineUserDataJobStatus(
+            row.offline_user_data_job.status
+        ).name
+    raise ValueError(f"Offline user data job '{resource_name}' was not found.")
+
+
+def resolve_pending_state(client, customer_id, state_path):
+    """Promotes or discards the pending state of the last sync.
+
+    The pending state is promoted once its job succeeded, and discarded if
+    the job failed or was never run, since its operations then never
+    reached the list. A job the sync did not run must therefore not be run
+    by hand after the next sync started.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The ID for the customer that owns the user list.
+        state_path: The path of the state spool of the user list.
+
+    Returns:
+        The status name of the pending job, or None if there was no pending
+        state.
+
+    Raises:
+        RuntimeError: If the pending job is still running, since a new sync
+            cannot know which rows the list will hold.
+    """
+    job_path = f"{state_path}{_JOB_SUFFIX}"
+    try:
+        with open(job_path) as f:
+            job = json.load(f)
+    except FileNotFoundError:
+        return None
+    resource_name = job["resource_name"]
+    status = get_job_status(client, customer_id, resource_name)
+    # A job that was run may still be PENDING until it starts.
+    if status == "RUNNING" or (status == "PENDING" and job["run"]):
+        raise RuntimeError(
+            f"Offline user data job '{resource_name}' of the last sync is "
+            "still running; sync again once it is done."
+        )
+    if status == "SUCCESS":
+        _promote(f"{state_path}{_NEW_SUFFIX}", state_path)
+        print(f"Job '{resource_name}' succeeded; its rows are now the state.")
+    else:
+        print(
+            f"Job '{resource_name}' is {status}; discarding its rows, which "
+            "never reached the list."
+        )
+    os.remove(job_path)
+    return status
+
+
+def sync_user_list(
+    client,
+    customer_id,
+    user_list_resource_name,
+    serialized_operations,
+    state_path,
+    mode="auto",
+    run_job=False,
+    sample_size=_DEFAULT_SAMPLE_SIZE,
+):
+    """Makes a user list hold exactly the given rows.
+
+    The new rows are kept as a pending state next to the state spool, and
+    only replace it once the job succeeded, as confirmed by
+    resolve_pending_state at the start of this or a later sync.
+
+    Args:
+        client: The Google Ads client.
+        customer_id: The ID for the customer that owns the user list.
+        user_list_resource_name: The resource name of the user list.
+        serialized_operations: An iterable of serialized create
+            OfflineUserDataJobOperations, one per row.
+        state_path: The path of the state spool of the user list.
+        mode: "auto", "replace" or "diff".
+        run_job: If true, runs the OfflineUserDataJob after adding operations.
+        sample_size: The number of rows sampled to estimate the churn.
+
+    Returns:
+        A dict with the chosen "mode", the number of "rows", the
+        "estimated_added" and "estimated_removed" rows, and the number of
+        "operations" sent.
+
+    Raises:
+        ValueError: If the mode is unknown.
+        RuntimeError: If the job of the last sync is still running.
+    """
+    if mode not in _SYNC_MODES:
+        raise ValueError(
+            f"Unknown sync mode '{mode}', expected one of {_SYNC_MODES}."
+        )
+    resolve_pending_state(client, customer_id, state_path)
+
+    new_path = f"{state_path}{_NEW_SUFFIX}"
+    current_digests = spool_operations(serialized_operations, new_path)
+    previous_spool, previous_digests = load_state(state_path)
+    if previous_spool is None:
+        mode = "replace"
+        estimated_added, estimated_removed = len(current_digests), None
+    else:
+        estimated_added, estimated_removed = estimate_churn(
+            previous_digests, current_digests, sample_size
+        )
+        if mode == "auto":
+            mode = choose_sync_mode(
+                len(current_digests), estimated_added, estimated_removed
+            )
+
+    resource_name = _create_job(client, customer_id, user_list_resource_name)
+    sender = preencoded_requests.EncodedRequestSender(client)
+    try:
+        with operation_spool.OperationSpool(new_path) as current_spool:
+            if mode == "replace":
+                # remove_all must be the first operation of the job.
+                remove_all = _OPERATION_PB(remove_all=True).SerializeToString()
+                for payload in preencoded_requests.iter_encoded_requests(
+                    resource_name, [remove_all]
+                ):
+                    print_partial_failure(
+                        client, sender.send(resource_name, payload)
+                    )
+                _upload(client, sender, resource_name, current_spool)
+                operations = len(current_digests) + 1
+            else:
+                delta_path = f"{state_path}{_DELTA_SUFFIX}"
+                with operation_spool.OperationSpoolWriter(delta_path) as writer:
+                    writer.extend(
+                        iter_diff_operations(
+                            previous_spool,
+                            previous_digests,
+                            current_spool,
+                            current_digests,
+                        )
+                    )
+                with operation_spool.OperationSpool(delta_path) as delta_spool:
+                    _upload(client, sender, resource_name, delta_spool)
+                operations = writer.num_operations
+    finally:
+        if previous_spool is not None:
+            previous_spool.close()
+    # The job is recorded once every operation was added, so that the next
+    # sync can promote the new rows when the job succeeded. It is recorded
+    # as run before it is run, since a job that may have been run must not
+    # be discarded.
+    with open(f"{state_path}{_JOB_SUFFIX}", "w") as f:
+        json.dump({"resource_name": resource_name, "run": run_job}, f)
+
+    if run_job:
+        client.get_service(
+            "OfflineUserDataJobService"
+        ).run_offline_user_data_job(resource_name=resource_name)
+        check_job_status(client, customer_id, resource_name)
+    else:
+        print(
+            f"Not running offline user data job '{resource_name}', as "
+            "requested."
+        )
+    return {
+        "mode": mode,
+        "rows": len(current_digests),
+        "estimated_added": estimated_added,
+        "estimated_removed": estimated_removed,
+        "operations": operations,
+    }
+
+
+def main(client, customer_id, user_list_id, state_path, mode, run_job):
+    googleads_service = client.get_service("GoogleAdsService")
+    result = sync_user_list(
+        client,
+        customer_id,
+        googleads_service.user_list_path(customer_id, user_list_id),
+        serialize_contact_info_records(get_raw_records()),
+        state_path,
+        mode,
+        run_job,
+    )
+    print(
+        f"Synced {result['rows']} rows in {result['mode']} mode with "
+        f"{result['operations']} operations (estimated "
+        f"{result['estimated_added']} added and "
+        f"{result['estimated_removed']} removed rows)."
+    )
+
+
+if __name__ == "__main__":
+    # GoogleAdsClient will read the google-ads.yaml configuration file in the
+    # home directory if none is specified.
+    googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+
+    parser = argparse.ArgumentParser(
+        description=(
+            "Makes a Customer Match user list hold exactly the example users, "
+            "by replacing it or by sending only the changes."
+        )
+    )
+    # The following argument(s) should be provided to run the example.
+    parser.add_argument(
+        "-c",
+        "--customer_id",
+        type=str,
+        required=True,
+        help="The ID for the customer that owns the user list.",
+    )
+    parser.add_argument(
+        "-u",
+        "--user_list_id",
+        type=str,
+        required=True,
+        help="The ID of an existing Customer Match user list.",
+    )
+    parser.add_argument(
+        "-s",
+        "--state_path",
+        type=str,
+        required=True,
+        help=(
+            "The path of the file that holds the rows uploaded by the last "
+            "sync of the user list."
+        ),
+    )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        choices=_SYNC_MODES,
+        default="auto",
+        help=(
+            "'replace' sends remove_all and every row, 'diff' sends only the "
+            "removed and added rows, and 'auto' picks the mode needing fewer "
+            "operations from the estimated churn."
+        ),
+    )
+    parser.add_argument(
+        "-r",
+        "--run_job",
+        action="store_true",
+        help="If set, runs the OfflineUserDataJob after adding operations.",
+    )
+    args = parser.parse_args()
+
+    try:
+        main(
+            googleads_client,
+            args.customer_id,
+            args.user_list_id,
+            args.state_path,
+            args.mode,
+            args.run_job,
+        )
+    except GoogleAdsException as ex:
+        print(
+            f"Request with ID '{ex.request_id}' failed with status "
+            f"'{ex.error.code().name}' and includes the following errors:"
+        )
+        for error in ex.failure.errors:
+            print(f"\tError with message '{error.message}'.")
+            if error.location:
+                for field_path_element in error.location.field_path_elements:
+                    print(f"\t\tOn field: {field_path_element.field_name}")
+        sys.exit(1)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+"""Runs report, upload and mutate jobs in a resident worker process.
+
+Running get_campaigns.py, add_campaigns.py, main.py or
+add_customer_match_user_list.py as scripts pays for imports, loading the YAML
+configuration, refreshing the OAuth token and opening a gRPC channel on every
+invocation. The worker pays for these once: it keeps one GoogleAdsClient whose
+services, and therefore channels, are created once and shared, and runs jobs
+on a thread pool.
+
+Jobs are queued in a SQLite table, so any process can submit them:
+
+    python worker_daemon.py serve
+    python worker_daemon.py submit get_campaigns '{"customer_id": "1234"}' -w
+
+The output the job printed and its return value are stored with the job.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from google.ads.googleads.client import GoogleAdsClient
+
+import add_campaigns
+import add_customer_match_user_list
+import bulk_campaign_updates
+import get_campaigns
+import main as get_customers
+import user_list_sizes
+import user_list_sync
+
+
+_DEFAULT_DATABASE_PATH = "./worker_jobs.sqlite"
+_DEFAULT_MAX_WORKERS = 8
+_DEFAULT_POLL_INTERVAL = 0.05
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS job (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        arguments TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'PENDING',
+        submitted_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        output TEXT,
+        result TEXT,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS job_status ON job (status, id);
+"""
+
+# Maps job kinds to functions called with the client and the job arguments.
+JOB_HANDLERS = {
+    "get_customers": get_customers.main,
+    "get_campaigns": get_campaigns.main,
+    "add_campaigns": add_campaigns.main,
+    "add_customer_match_user_list": add_customer_match_user_list.main,
+    "apply_desired_states": bulk_campaign_updates.apply_desired_states,
+    "sync_user_list": user_list_sync.main,
+    "report_user_list_sizes": user_list_sizes.main,
+}
+_FINAL_STATUSES = ("SUCCEEDED", "FAILED")
+
+
+class SharedServiceClient:
+    """Wraps a GoogleAdsClient so that each service is only created once.
+
+    GoogleAdsClient.get_service opens a new gRPC channel on every call. The
+    generated service clients are thread-safe, so one instance per service is
+    shared by all jobs. Every other attribute is taken from the wrapped
+    client.
+    """
+
+    def __init__(self, client):
+        """Initializes the wrapper.
+
+        Args:
+            client: The Google Ads client.
+        """
+        self._client = client
+        self._services = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def get_service(self, name, version=None, interceptors=None):
+        """Returns the shared service client, creating it on first use.
+
+        Without a version, the wrapped client's default version is used.
+        Services requested with interceptors are not shared.
+        """
+        kwargs = {} if version is None else {"version": version}
+        if interceptors:
+            return self._client.get_service(
+                name, interceptors=interceptors, **kwargs
+            )
+        key = (name, version)
+        with self._lock:
+            if key not in self._services:
+                self._services[key] = self._client.get_service(name, **kwargs)
+            return self._services[key]
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """Sends writes to a per-thread buffer if one is set, else to stdout."""
+
+    def __init__(self, stdout):
+        self._stdout = stdout
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def capture(self):
+        self._local.buffer = io.StringIO()
+        try:
+            yield self._local.buffer
+        finally:
+            self._local.buffer = None
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or self._stdout).write(text)
+
+    def flush(self):
+        self._stdout.flush()
+
+
+class JobQueue:
+    """A queue of worker jobs in a SQLite table."""
+
+    def __init__(self, database_path=_DEFAULT_DATABASE_PATH):
+        """Opens or creates the queue.
+
+        Args:
+            database_path: The path of the SQLite database file.
+        """
+        # The connection is shared by the worker threads, and every access
+        # is serialized by the lock.
+        self.connection = sqlite3.connect(
+            database_path, timeout=30, check_same_thread=False
+        )
+        self.connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+    def submit(self, kind, arguments):
+        """Adds a job to the queue.
+
+        Args:
+            kind: The kind of the job, a key of JOB_HANDLERS.
+            arguments: A dict of JSON-serializable keyword arguments for the
+                job's handler.
+
+        Returns:
+            The ID of the job.
+
+        Raises:
+            ValueError: If the kind is unknown.
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(
+                f"Unknown job kind '{kind}', expected one of "
+                f"{sorted(JOB_HANDLERS)}."
+            )
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO job (kind, arguments, submitted_at) "
+                "VALUES (?, ?, ?)",
+                (kind, json.dumps(arguments), time.time()),
+            )
+        return cursor.lastrowid
+
+    def claim(self):
+        """Marks the oldest pending job as running.
+
+        Returns:
+            A tuple of the job ID, kind and arguments dict, or None if no job
+            is pending.
+        """
+        with self._lock, self.connection:
+            # An immediate transaction keeps other workers sharing the
+            # database from claiming the same job.
+            self.connection.execute("BEGIN IMMEDIATE")
+            row = self.connection.execute(
+                "SELECT id, kind, arguments FROM job "
+                "WHERE status = 'PENDING' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE job SET status = 'RUNNING', started_at = ? "
+                "WHERE id = ?",
+                (time.time(), row[0]),
+            )
+        return row[0], row[1], json.loads(row[2])
+
+    def finish(self, job_id, status, output, result=None, error=None):
+        """Records the outcome of a job."""
+        with self._lock, self.connection:
+            self.connection.execute(
+                "UPDATE job SET status = ?, finished_at = ?, output = ?, "
+                "result = ?, error = ? WHERE id = ?",
+                (status, time.time(), output, result, error, job_id),
+            )
+
+    def requeue_running(self):
+        """Returns jobs left running by a stopped worker to the queue.
+
+        Returns:
+            The number of requeued jobs.
+        """
+        with self._lock, self.connection:
+            return self.connection.execute(
+                "UPDATE job SET status = 'PENDING', started_at = NULL "
+                "WHERE status = 'RUNNING'"
+            ).rowcount
+
+    def get(self, job_id):
+        """Returns a job as a dict, or None if it does not exist."""
+        with self._lock:
+            cursor = self.connection.execute(
+                "SELECT * FROM job WHERE id = ?", (job_id,)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip((column[0] for column in cursor.description), row))
+
+    def wait(self, job_id, timeout=None, poll_interval=_DEFAULT_POLL_INTERVAL):
+        """Waits for a job to succeed or fail.
+
+        Args:
+            job_id: The ID of the job.
+            timeout: The number of seconds after which to give up, or None to
+                wait indefinitely.
+            poll_interval: The number of seconds between checks.
+
+        Returns:
+            The job as a dict.
+
+        Raises:
+            TimeoutError: If the job is not done within timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job["status"] in _FINAL_STATUSES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"Job {job_id} is still {job['status']} after {timeout} "
+                    "seconds."
+                )
+            time.sleep(poll_interval)
+
+
+class WorkerDaemon:
+    """Runs queued jobs with one warm client on a thread pool."""
+
+    def __init__(
+        self,
+        client,
+        queue,
+        max_workers=_DEFAULT_MAX_WORKERS,
+        poll_interval=_DEFAULT_POLL_INTERVAL,
+    ):
+        """Initializes the worker.
+
+        Args:
+            client: The Google Ads client.
+            queue: A JobQueue.
+            max_workers: The maximum number of jobs run concurrently.
+            poll_interval: The number of seconds to wait when the queue is
+                empty.
+        """
+        self.client = SharedServiceClient(client)
+        self.queue = queue
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self._slots = threading.Semaphore(max_workers)
+        self._stopped = threading.Event()
+
+    def stop(self):
+        """Asks run to return once the running jobs are done."""
+        self._stopped.set()
+
+    def _run_job(self, stdout, job_id, kind, arguments):
+        try:
+            with stdout.capture() as output:
+                try:
+                    result = JOB_HANDLERS[kind](self.client, **arguments)
+                except BaseException:
+                    # Handlers written as scripts may call sys.exit on errors,
+                    # which must not stop the worker.
+                    print(traceback.format_exc())
+                    self.queue.finish(
+                        job_id,
+                        "FAILED",
+                        output.getvalue(),
+                        error=traceback.format_exc(limit=0).strip(),
+                    )
+                    return
+            self.queue.finish(
+                job_id,
+                "SUCCEEDED",
+                output.getvalue(),
+                result=json.dumps(result, default=str),
+            )
+        finally:
+            self._slots.release()
+
+    def run(self):
+        """Claims and runs jobs until stop is called."""
+        requeued = self.queue.requeue_running()
+        if requeued:
+            print(f"Requeued {requeued} jobs left running by a previous run.")
+        stdout = _ThreadLocalStdout(sys.stdout)
+        sys.stdout = stdout
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while not self._stopped.is_set():
+                    self._slots.acquire()
+                    job = self.queue.claim()
+                    if job is None:
+                        self._slots.release()
+                        self._stopped.wait(self.poll_interval)
+                        continue
+                    executor.submit(self._run_job, stdout, *job)
+        finally:
+            sys.stdout = stdout._stdout
+
+
+def serve(client, database_path, max_workers):
+    queue = JobQueue(database_path)
+    daemon = WorkerDaemon(client, queue, max_workers)
+    print(f"Waiting for jobs in '{database_path}'.")
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop()
+    finally:
+        queue.close()
+
+
+def submit(database_path, kind, arguments, wait):
+    queue = JobQueue(database_path)
+    try:
+        job_id = queue.submit(kind, arguments)
+        print(f"Submitted job {job_id}.")
+        if wait:
+            job = queue.wait(job_id)
+            print(job["output"], end="")
+            print(
+                f"Job {job_id} {job['status']} in "
+                f"{job['finished_at'] - job['started_at']:.3f} seconds, "
+                f"{job['started_at'] - job['submitted_at']:.3f} seconds "
+                "after it was submitted."
+            )
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Runs Google Ads jobs in a resident worker process."
+    )
+    parser.add_argument(
+        "--database_path",
+        type=str,
+        default=_DEFAULT_DATABASE_PATH,
+        help="The path of the SQLite database that holds the job queue.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Runs queued jobs until interrupted."
+    )
+    serve_parser.add_argument(
+        "-n",
+        "--max_workers",
+        type=int,
+        default=_DEFAULT_MAX_WORKERS,
+        help="The maximum number of jobs run concurrently.",
+    )
+
+    submit_parser = subparsers.add_parser("submit", help="Queues a job.")
+    submit_parser.add_argument(
+        "kind", choices=sorted(JOB_HANDLERS), help="The kind of the job."
+    )
+    submit_parser.add_argument(
+        "arguments",
+        type=json.loads,
+        help=(
+            "The keyword arguments of the job as a JSON object, for example "
+            '\'{"customer_id": "1234567890"}\'.'
+        ),
+    )
+    submit_parser.add_argument(
+        "-w",
+        "--wait",
+        action="store_true",
+        help="If set, waits for the job and prints its output.",
+    )
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        # GoogleAdsClient will read the google-ads.yaml configuration file in
+        # the home directory if none is specified.
+        googleads_client = GoogleAdsClient.load_from_storage(version="v14")
+        serve(googleads_client, args.database_path, args.max_workers)
+    else:
+        submit(args.database_path, args.kind, args.arguments, args.wait)